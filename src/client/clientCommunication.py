@@ -1,9 +1,13 @@
 import zmq
 import time
-from src.common.crdt.improved.ShoppingList import ShoppingList
 from src.common.messages.messages import Message, MessageType
+from src.common.codec.binary_codec import BINARY, encode_list, decode_list
 import random
 
+# Encoding used for the lists this client ships; servers and proxies answer
+# in the encoding of the request
+LIST_CODEC = BINARY
+
 class Proxy():
     def __init__(self, port):
         self.port = port
@@ -96,6 +100,8 @@ class ClientCommunicator():
                 if reply.msg_type == MessageType.SENT_FULL_LIST_ACK:
                     socket.close(linger=0)
                     #print(f"[Network] ACK received from proxy {proxy.port}")
+                    if not reply.payload.get("quorum_met", True):
+                        print("[Network] List stored, but fewer replicas than the write quorum acknowledged it")
                     return reply.payload
                 if reply.msg_type == MessageType.SENT_FULL_LIST_NACK:
                     socket.close(linger=0)
@@ -128,7 +134,7 @@ class ClientCommunicator():
         message = Message(
             msg_type=MessageType.SENT_FULL_LIST,
             payload={
-                "shopping_list": shopping_list.to_json()
+                "shopping_list": encode_list(shopping_list, LIST_CODEC)
             }
         )
 
@@ -148,7 +154,7 @@ class ClientCommunicator():
                 #    f"[Network] Full list '{list_uuid}' successfully sent "
                 #    f"via proxy {proxy.port}"
                 #)
-                crdt_obj = ShoppingList.from_json(result["shopping_list"])
+                crdt_obj = decode_list(result["shopping_list"])
                 self.storage.save_list(crdt_obj, not_sent=False, name=crdt_obj.name)
                 return
 
@@ -160,6 +166,73 @@ class ClientCommunicator():
         #)
         self.storage.save_list(shopping_list, not_sent=True, name=shopping_list.name)
     
+    def _try_send_delta_to_proxy(self, proxy, message, retries=3, base_timeout=1000):
+        """
+        Attempt to send a delta to a single proxy with retries.
+        Returns True on ACK, False otherwise.
+        """
+        socket = self.context.socket(zmq.DEALER)
+        socket.connect(f"tcp://localhost:{proxy.port}")
+        poller = zmq.Poller()
+        poller.register(socket, zmq.POLLIN)
+
+        timeout = base_timeout
+
+        for attempt in range(1, retries + 1):
+            socket.send(message.serialize())
+
+            socks = dict(poller.poll(timeout))
+
+            if socket in socks and socks[socket] == zmq.POLLIN:
+                reply = Message(json_str=socket.recv())
+
+                if reply.msg_type == MessageType.SENT_DELTA_ACK:
+                    socket.close(linger=0)
+                    if not reply.payload.get("quorum_met", True):
+                        print("[Network] Delta stored, but fewer replicas than the write quorum acknowledged it")
+                    return True
+                if reply.msg_type == MessageType.SENT_DELTA_NACK:
+                    socket.close(linger=0)
+                    return False
+                else:
+                    print(
+                        f"[Network] Unexpected reply from {proxy.port}: "
+                        f"{reply.msg_type}"
+                    )
+            else:
+                print(f"[Network] No reply from {proxy.port}, retrying...")
+
+            timeout = min(8000, timeout * 2)
+
+        socket.close(linger=0)
+        return False
+
+    def send_delta(self, delta):
+        """
+        Sends only the state touched by one edit to proxies.
+        If no proxy accepts it, the list is marked as not sent so the
+        heartbeat falls back to shipping the full list.
+        """
+        if not delta.items:
+            return
+
+        message = Message(
+            msg_type=MessageType.SENT_DELTA,
+            payload={
+                "list_id": delta.uuid,
+                "delta": encode_list(delta, LIST_CODEC)
+            }
+        )
+
+        proxies = self.proxies[:]
+        random.shuffle(proxies)
+
+        for proxy in proxies:
+            if self._try_send_delta_to_proxy(proxy, message):
+                return
+
+        self.storage.save_list(delta, not_sent=True, name=delta.name)
+
     def _try_request_full_list_from_proxy(self,proxy,message,retries=3,base_timeout=1000):
         """
         Request a full shopping list from a single proxy with retries.
@@ -214,7 +287,7 @@ class ClientCommunicator():
         """
         message = Message(
             msg_type=MessageType.REQUEST_FULL_LIST,
-            payload={"list_id": list_uuid}
+            payload={"list_id": list_uuid, "codec": LIST_CODEC}
         )
 
         #print(f"[Network] Requesting full list '{list_uuid}'")
@@ -232,7 +305,7 @@ class ClientCommunicator():
                 #    f"[Network] Full list '{list_uuid}' received "
                 #    f"via proxy {proxy.port}"
                 #)
-                crdt = ShoppingList.from_json(result["shopping_list"])
+                crdt = decode_list(result["shopping_list"])
                 self.storage.save_list(crdt, not_sent=False, name=crdt.name)
                 self.subscribe_to_list(list_uuid)
                 return 
@@ -268,7 +341,7 @@ class ClientCommunicator():
 
     def _handle_list_update(self, payload):
         crdt_json = payload['shopping_list']
-        crdt_json_obj = ShoppingList.from_json(crdt_json)
+        crdt_json_obj = decode_list(crdt_json)
         #print(f"[Network] Received LIST_UPDATE for list {crdt_json_obj.uuid}")
 
         self.storage.save_list(crdt_json_obj, name=crdt_json_obj.name)
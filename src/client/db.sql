@@ -16,4 +16,7 @@ CREATE TABLE IF NOT EXISTS ShoppingListItem (
 );
 
 CREATE INDEX IF NOT EXISTS idx_shopping_list_uuid 
-ON ShoppingListItem (shopping_list_uuid);
\ No newline at end of file
+ON ShoppingListItem (shopping_list_uuid);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_shopping_list_item_name
+ON ShoppingListItem (shopping_list_uuid, name);
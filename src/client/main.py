@@ -66,7 +66,7 @@ def main():
         except Exception as e:
             print(f"[Warning] Could not read known proxies file: {e}")
 
-    storage = ShoppingListStorage(db_config)
+    storage = ShoppingListStorage(db_config, replica_name=args.id)
     storage.initialize_schema()
 
     comm = ClientCommunicator(db_config, known_proxy_ports, storage)
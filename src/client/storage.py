@@ -1,12 +1,14 @@
 import psycopg2
 from psycopg2 import DataError 
 import json
-from src.common.crdt.improved.ShoppingList import ShoppingList, PNCounter, ORSet
+from src.common.crdt.improved.ShoppingList import ShoppingList, item_changes
 from src.common.readWriteLock.read_write_lock import ReadWriteLock
 
 class ShoppingListStorage:
-    def __init__(self, db_config):
+    def __init__(self, db_config, replica_name=None):
         self.db_config = db_config
+        # Client id this copy acknowledges list versions under (see server storage)
+        self.replica_name = replica_name
         try:
             conn = self._get_conn()
             conn.close()
@@ -32,54 +34,11 @@ class ShoppingListStorage:
             conn.close()
 
     def _crdt_to_dict(self, obj):
-        """Recursively converts CRDT objects to a dictionary for JSON storage."""
-        if hasattr(obj, "__dict__"):
-            data = {}
-            for key, val in obj.__dict__.items():
-                data[key] = self._crdt_to_dict(val)
-            return data
-        elif isinstance(obj, set):
-            return list(obj)
-        elif isinstance(obj, dict):
-            return {k: self._crdt_to_dict(v) for k, v in obj.items()}
-        else:
-            return obj
+        """Converts a ShoppingList to a dict for JSON storage."""
+        return obj.to_dict()
 
     def _reconstruct_crdt(self, data):
-        sl = ShoppingList(data['uuid'])
-        sl.clock = data['clock']
-        sl.name = data.get('name', None)
-        
-        if 'uuid' in data:
-            sl.uuid = data['uuid']
-
-        for name, item_data in data.get('items', {}).items():
-            
-            needed = PNCounter()
-            if 'positive' in item_data['needed']:
-                needed.positive.counts = item_data['needed']['positive']['counts']
-            if 'negative' in item_data['needed']:
-                needed.negative.counts = item_data['needed']['negative']['counts']
-
-            acquired = PNCounter()
-            if 'positive' in item_data['acquired']:
-                acquired.positive.counts = item_data['acquired']['positive']['counts']
-            if 'negative' in item_data['acquired']:
-                acquired.negative.counts = item_data['acquired']['negative']['counts']
-
-            existence = ORSet()
-            if 'elements' in item_data['existence']:
-                existence.elements = {tuple(x) for x in item_data['existence']['elements']}
-            if 'tombstones' in item_data['existence']:
-                existence.tombstones = {tuple(x) for x in item_data['existence']['tombstones']}
-
-            sl.items[name] = {
-                "needed": needed,
-                "acquired": acquired,
-                "existence": existence
-            }
-
-        return sl
+        return ShoppingList.from_dict(data)
 
     def save_list(self, shop_list, name=None, not_sent=False):
         self.lock.acquire_write()
@@ -94,6 +53,7 @@ class ShoppingListStorage:
                         (list_uuid,)
                     )
                     row = cursor.fetchone()
+                    stored_items = {}
 
                     if row:
                         db_crdt_json = row[0]
@@ -105,9 +65,14 @@ class ShoppingListStorage:
                             db_crdt_json = json.loads(db_crdt_json)
                         
                         db_list = self._reconstruct_crdt(db_crdt_json)
+                        stored_items = db_list.stored_items()
                         #print(f"[Storage] Merging local list '{list_uuid}' with database version.")
                         shop_list.merge(db_list)
 
+                    if self.replica_name is not None:
+                        shop_list.acknowledge(self.replica_name)
+                        shop_list.collect_garbage()
+
                     crdt_blob = json.dumps(self._crdt_to_dict(shop_list))
                     
                     cursor.execute(
@@ -122,32 +87,32 @@ class ShoppingListStorage:
                         """,
                         (list_uuid, name, crdt_blob, shop_list.clock, not_sent)
                     )
-                    cursor.execute("DELETE FROM ShoppingListItem WHERE shopping_list_uuid=%s", (list_uuid,))
-                    
-                    visible_items = shop_list.get_visible_items()
-                    items_to_insert = []
-                    
-                    for item_name, counts in visible_items.items():
 
-                        raw_needed = counts['needed']
-                        raw_acquired = counts['acquired']
-
-                        display_needed = max(0, raw_needed)
-                        display_acquired = max(0, raw_acquired)
-
-                        items_to_insert.append((
-                            list_uuid,
-                            item_name,
-                            display_needed,
-                            display_acquired,
-                            0 
-                        ))
-                        
-                    if items_to_insert:
-                        cursor.executemany(
-                            "INSERT INTO ShoppingListItem (shopping_list_uuid, name, quantityNeeded, quantityAcquired, position) "
-                            "VALUES (%s, %s, %s, %s, %s)",
-                            items_to_insert
+                    # Only the item rows this save changed: removed names are
+                    # deleted and changed ones upserted, in one statement
+                    upserts, removed = item_changes(stored_items, shop_list.stored_items())
+                    if upserts or removed:
+                        cursor.execute(
+                            """
+                            WITH removed AS (
+                                DELETE FROM ShoppingListItem
+                                WHERE shopping_list_uuid=%s AND name = ANY(%s::text[])
+                            )
+                            INSERT INTO ShoppingListItem (shopping_list_uuid, name, quantityNeeded, quantityAcquired, position)
+                            SELECT %s::uuid, item.name, item.needed, item.acquired, 0
+                            FROM unnest(%s::text[], %s::integer[], %s::integer[]) AS item(name, needed, acquired)
+                            ON CONFLICT (shopping_list_uuid, name) DO UPDATE SET
+                                quantityNeeded = excluded.quantityNeeded,
+                                quantityAcquired = excluded.quantityAcquired
+                            """,
+                            (
+                                list_uuid,
+                                removed,
+                                list_uuid,
+                                [row[0] for row in upserts],
+                                [row[1] for row in upserts],
+                                [row[2] for row in upserts]
+                            )
                         )
         except Exception as e:
             print(f"[Storage] Error saving list: {e}")
@@ -0,0 +1,376 @@
+import json
+import struct
+
+from src.common.crdt.improved.ShoppingList import ShoppingList
+from src.common.crdt.improved.PNCounter import PNCounter
+from src.common.crdt.improved.IndexedORSet import IndexedORSet
+from src.common.crdt.improved.ShoppingItem import ShoppingItem
+
+# Compact binary encoding for ShoppingList CRDTs and Message payloads.
+#
+# A list blob is   LIST_MAGIC | version | string table | list body
+# where every string (uuid, item names, client ids) is written once in the
+# table and referenced by its varint index afterwards. Dot tags are written
+# as two varints: actor index + 1 and counter (0 marks a legacy string tag).
+#
+# A message frame is   MESSAGE_MAGIC | version | msg_type | payload value
+# and payload values are tagged (None, bool, int, str, bytes, list, dict),
+# so a list blob travels inside a message as raw bytes, not as an escaped
+# JSON string.
+
+JSON = "json"
+BINARY = "binary"
+
+LIST_MAGIC = b"\xb5L"
+MESSAGE_MAGIC = b"\xb5M"
+LIST_VERSION = 3
+MESSAGE_VERSION = 1
+
+_NONE, _FALSE, _TRUE, _INT, _STR, _BYTES, _LIST, _DICT, _FLOAT = range(9)
+
+
+def _write_varint(out, value):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _read_varint(data, pos):
+    byte = data[pos]
+    if byte < 0x80:
+        return byte, pos + 1
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _write_sint(out, value):
+    _write_varint(out, value << 1 if value >= 0 else ((-value) << 1) - 1)
+
+
+def _read_sint(data, pos):
+    value, pos = _read_varint(data, pos)
+    return (value >> 1) ^ -(value & 1), pos
+
+
+def _write_raw(out, raw):
+    _write_varint(out, len(raw))
+    out += raw
+
+
+def _read_raw(data, pos):
+    length, pos = _read_varint(data, pos)
+    return bytes(data[pos:pos + length]), pos + length
+
+
+# --- ShoppingList ---
+#
+# After the string table the list body is one flat stream of varints, so it
+# can be decoded in a single tight loop instead of one call per number.
+
+class _StringTable:
+    def __init__(self):
+        self.index = {}
+
+    def ref(self, value):
+        value = str(value)
+        ref = self.index.get(value)
+        if ref is None:
+            ref = self.index[value] = len(self.index)
+        return ref
+
+
+def _pack_varints(out, values):
+    for value in values:
+        if value < 0x80:
+            out.append(value)
+        else:
+            _write_varint(out, value)
+
+
+def _unpack_varints(data):
+    values = []
+    append = values.append
+    result = 0
+    shift = 0
+    for byte in data:
+        if byte < 0x80:
+            append(result | (byte << shift))
+            result = 0
+            shift = 0
+        else:
+            result |= (byte & 0x7F) << shift
+            shift += 7
+    return values
+
+
+def _emit_counts(body, ref, counts):
+    body.append(len(counts))
+    for client_id, value in counts.items():
+        body.append(ref(client_id))
+        body.append(value)
+
+
+def _take_counts(nxt, strings):
+    return {strings[nxt()]: nxt() for _ in range(nxt())}
+
+
+def _emit_tag(body, ref, tag):
+    if isinstance(tag, tuple):
+        body.append(tag[0] + 1)
+        body.append(tag[1])
+    else:
+        body.append(0)
+        body.append(ref(tag))
+
+
+def _take_tag(nxt, strings):
+    actor = nxt()
+    if actor:
+        return (actor - 1, nxt())
+    return strings[nxt()]
+
+
+def encode_list(shop_list, codec=BINARY):
+    """Encodes a ShoppingList as a JSON string or as binary bytes."""
+    if codec == JSON:
+        return shop_list.to_json()
+
+    shop_list.digest()
+    strings = _StringTable()
+    ref = strings.ref
+    body = []
+
+    body.append(ref(shop_list.uuid))
+    body.append(0 if shop_list.name is None else ref(shop_list.name) + 1)
+    body.append(shop_list.clock)
+    _emit_counts(body, ref, shop_list.version)
+    _emit_counts(body, ref, shop_list.base)
+    body.append(len(shop_list.actors))
+    body.extend(ref(actor) for actor in shop_list.actors)
+
+    body.append(len(shop_list.summaries))
+    for replica, summary in shop_list.summaries.items():
+        body.append(ref(replica))
+        if summary is None:
+            body.append(0)
+        else:
+            body.append(1)
+            _emit_counts(body, ref, summary)
+
+    body.append(len(shop_list.items))
+    for name, item in shop_list.items.items():
+        body.append(ref(name))
+        body.append(0 if item.cached_digest is None else item.cached_digest + 1)
+        for counter in (item.needed, item.acquired):
+            _emit_counts(body, ref, counter.positive.counts)
+            _emit_counts(body, ref, counter.negative.counts)
+
+        ors = item.existence
+        body.append(len(ors.entries))
+        for element, tags in ors.entries.items():
+            body.append(ref(element))
+            body.append(len(tags))
+            for tag in tags:
+                _emit_tag(body, ref, tag)
+        body.append(len(ors.tombstones))
+        for element, tag in ors.tombstones:
+            body.append(ref(element))
+            _emit_tag(body, ref, tag)
+        body.append(len(ors.removed_at))
+        for tag, dot in ors.removed_at.items():
+            _emit_tag(body, ref, tag)
+            _emit_tag(body, ref, tuple(dot))
+
+    encoded = [value.encode('utf-8') for value in strings.index]
+    out = bytearray(LIST_MAGIC)
+    out.append(LIST_VERSION)
+    _write_varint(out, len(encoded))
+    _pack_varints(out, (len(raw) for raw in encoded))
+    for raw in encoded:
+        out += raw
+    _pack_varints(out, body)
+    return bytes(out)
+
+
+def _read_list_header(data):
+    if data[:2] != LIST_MAGIC:
+        raise ValueError("Not a binary ShoppingList blob")
+    if data[2] != LIST_VERSION:
+        raise ValueError(f"Unsupported ShoppingList blob version {data[2]}")
+
+    count, pos = _read_varint(data, 3)
+    lengths = []
+    for _ in range(count):
+        length, pos = _read_varint(data, pos)
+        lengths.append(length)
+
+    strings = []
+    for length in lengths:
+        strings.append(str(data[pos:pos + length], 'utf-8'))
+        pos += length
+    return strings, pos
+
+
+def decode_list(blob):
+    """Decodes a ShoppingList from either a JSON string or binary bytes."""
+    if codec_of(blob) == JSON:
+        return ShoppingList.from_json(blob)
+
+    data = memoryview(blob)
+    strings, pos = _read_list_header(data)
+    nxt = iter(_unpack_varints(data[pos:])).__next__
+
+    uuid_ref = nxt()
+    name_ref = nxt()
+    sl = ShoppingList(strings[uuid_ref], strings[name_ref - 1] if name_ref else None)
+    sl.clock = nxt()
+    sl.version = _take_counts(nxt, strings)
+    sl.base = _take_counts(nxt, strings)
+    sl._set_actors([strings[nxt()] for _ in range(nxt())])
+
+    for _ in range(nxt()):
+        replica = strings[nxt()]
+        sl.summaries[replica] = _take_counts(nxt, strings) if nxt() else None
+
+    for _ in range(nxt()):
+        name = strings[nxt()]
+        digest = nxt()
+        needed = PNCounter()
+        needed.positive.counts = _take_counts(nxt, strings)
+        needed.negative.counts = _take_counts(nxt, strings)
+        acquired = PNCounter()
+        acquired.positive.counts = _take_counts(nxt, strings)
+        acquired.negative.counts = _take_counts(nxt, strings)
+
+        existence = IndexedORSet()
+        for _ in range(nxt()):
+            element = strings[nxt()]
+            existence.entries[element] = {_take_tag(nxt, strings) for _ in range(nxt())}
+        existence.tombstones = {(strings[nxt()], _take_tag(nxt, strings)) for _ in range(nxt())}
+        for _ in range(nxt()):
+            tag = _take_tag(nxt, strings)
+            existence.removed_at[tag] = list(_take_tag(nxt, strings))
+
+        item = sl.items[name] = ShoppingItem(needed, acquired, existence)
+        if digest:
+            item.cached_digest = digest - 1
+    sl._touch_all()
+    return sl
+
+
+def list_uuid(blob):
+    """Reads only the list uuid, without decoding the CRDT."""
+    if codec_of(blob) == JSON:
+        return json.loads(blob)['uuid']
+    data = memoryview(blob)
+    strings, pos = _read_list_header(data)
+    ref, pos = _read_varint(data, pos)
+    return strings[ref]
+
+
+def codec_of(blob):
+    return BINARY if isinstance(blob, (bytes, bytearray, memoryview)) else JSON
+
+
+# --- Message payloads ---
+
+def _write_value(out, value):
+    if value is None:
+        out.append(_NONE)
+    elif value is True:
+        out.append(_TRUE)
+    elif value is False:
+        out.append(_FALSE)
+    elif isinstance(value, int):
+        out.append(_INT)
+        _write_sint(out, value)
+    elif isinstance(value, float):
+        out.append(_FLOAT)
+        out += struct.pack(">d", value)
+    elif isinstance(value, str):
+        out.append(_STR)
+        _write_raw(out, value.encode('utf-8'))
+    elif isinstance(value, (bytes, bytearray)):
+        out.append(_BYTES)
+        _write_raw(out, value)
+    elif isinstance(value, (list, tuple)):
+        out.append(_LIST)
+        _write_varint(out, len(value))
+        for item in value:
+            _write_value(out, item)
+    elif isinstance(value, dict):
+        out.append(_DICT)
+        _write_varint(out, len(value))
+        for key, item in value.items():
+            _write_raw(out, str(key).encode('utf-8'))
+            _write_value(out, item)
+    else:
+        raise TypeError(f"Cannot encode {type(value).__name__} in a binary message")
+
+
+def _read_value(data, pos):
+    kind = data[pos]
+    pos += 1
+    if kind == _NONE:
+        return None, pos
+    if kind == _TRUE:
+        return True, pos
+    if kind == _FALSE:
+        return False, pos
+    if kind == _INT:
+        return _read_sint(data, pos)
+    if kind == _FLOAT:
+        return struct.unpack_from(">d", data, pos)[0], pos + 8
+    if kind == _STR:
+        raw, pos = _read_raw(data, pos)
+        return raw.decode('utf-8'), pos
+    if kind == _BYTES:
+        return _read_raw(data, pos)
+    if kind == _LIST:
+        count, pos = _read_varint(data, pos)
+        items = []
+        for _ in range(count):
+            item, pos = _read_value(data, pos)
+            items.append(item)
+        return items, pos
+    if kind == _DICT:
+        count, pos = _read_varint(data, pos)
+        items = {}
+        for _ in range(count):
+            key, pos = _read_raw(data, pos)
+            items[key.decode('utf-8')], pos = _read_value(data, pos)
+        return items, pos
+    raise ValueError(f"Unknown value tag {kind}")
+
+
+def is_binary_message(raw):
+    return raw[:2] == MESSAGE_MAGIC
+
+
+def encode_message(msg_type_value, payload):
+    out = bytearray(MESSAGE_MAGIC)
+    out.append(MESSAGE_VERSION)
+    _write_varint(out, msg_type_value)
+    _write_value(out, payload)
+    return bytes(out)
+
+
+def decode_message(raw):
+    data = memoryview(raw)
+    if data[2] != MESSAGE_VERSION:
+        raise ValueError(f"Unsupported message frame version {data[2]}")
+    msg_type_value, pos = _read_varint(data, 3)
+    payload, _ = _read_value(data, pos)
+    return msg_type_value, payload
@@ -1,5 +1,6 @@
-
 class GCounter:
+    __slots__ = ("counts",)
+
     def __init__(self):
         self.counts = {}
 
@@ -9,15 +10,35 @@ class GCounter:
         current = self.counts.get(client_id, 0)
         self.counts[client_id] = current + amount
 
+        delta = GCounter()
+        delta.counts[client_id] = self.counts[client_id]
+        return delta
+
     def get_value(self):
         return sum(self.counts.values())
 
     def merge(self, other):
-        all_keys = set(self.counts.keys()) | set(other.counts.keys())
-        #print(f"Merging GCounter: self={self.counts}, other={other.counts}")
-        #print(f"All keys for merge: {all_keys}")
-        for key in all_keys:
-            self.counts[key] = max(
-                self.counts.get(key, 0),
-                other.counts.get(key, 0)
-            )
\ No newline at end of file
+        counts = self.counts
+        for key, value in other.counts.items():
+            if value > counts.get(key, 0):
+                counts[key] = value
+
+    def merge_many(self, others):
+        counts = self.counts
+        for other in others:
+            other_counts = other.counts
+            # Replicas usually agree, and dict equality is checked in C
+            if other_counts == counts:
+                continue
+            for key, value in other_counts.items():
+                if value > counts.get(key, 0):
+                    counts[key] = value
+
+    def to_dict(self):
+        return {"counts": dict(self.counts)}
+
+    @staticmethod
+    def from_dict(data):
+        counter = GCounter()
+        counter.counts = dict(data.get('counts', {}))
+        return counter
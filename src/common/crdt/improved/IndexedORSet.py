@@ -0,0 +1,177 @@
+import uuid
+
+def _tag(tag):
+    # JSON turns dot tags into lists; sets and dict keys need tuples
+    return tuple(tag) if isinstance(tag, list) else tag
+
+class IndexedORSet:
+    """
+    ORSet keyed by element: each element maps to the set of its live tags,
+    so contains() is a dict lookup and remove() only touches that element.
+    Serializes to the same JSON as ORSet.
+    """
+    __slots__ = ("entries", "tombstones", "removed_at")
+
+    def __init__(self):
+        self.entries = {}
+        self.tombstones = set()
+        self.removed_at = {}
+
+    @property
+    def elements(self):
+        return {(element, tag) for element, tags in self.entries.items() for tag in tags}
+
+    @elements.setter
+    def elements(self, entries):
+        self.entries = {}
+        for element, tag in entries:
+            self.entries.setdefault(element, set()).add(tag)
+
+    def add(self, element, tag=None):
+        if tag is None:
+            tag = str(uuid.uuid4())
+        if (element, tag) not in self.tombstones:
+            self.entries.setdefault(element, set()).add(tag)
+
+        delta = IndexedORSet()
+        delta.entries[element] = {tag}
+        return delta
+
+    def remove(self, element, dot=None):
+        tags = self.entries.pop(element, set())
+        removed = {(element, tag) for tag in tags}
+        self.tombstones |= removed
+
+        delta = IndexedORSet()
+        delta.tombstones = removed
+        if dot is not None:
+            for tag in tags:
+                self.removed_at[tag] = list(dot)
+                delta.removed_at[tag] = list(dot)
+        return delta
+
+    def contains(self, element):
+        return element in self.entries
+
+    def merge(self, other, self_seen=None, other_seen=None):
+        # Same rules as ORSet.merge, applied per element
+        for element, other_tags in other.entries.items():
+            tags = self.entries.get(element, set())
+            for tag in other_tags - tags:
+                if (element, tag) in self.tombstones:
+                    continue
+                if self_seen is not None and self_seen(tag):
+                    continue
+                tags.add(tag)
+            self._store(element, tags)
+
+        if other_seen is not None:
+            for element in list(self.entries):
+                other_tags = other.entries.get(element, ())
+                stale = {tag for tag in self.entries[element] if tag not in other_tags and other_seen(tag)}
+                if stale:
+                    self._store(element, self.entries[element] - stale)
+
+        # Only tombstones new to this replica can hide live tags
+        for element, tag in other.tombstones - self.tombstones:
+            tags = self.entries.get(element)
+            if tags and tag in tags:
+                tags.discard(tag)
+                self._store(element, tags)
+            self.tombstones.add((element, tag))
+
+        for tag, dot in other.removed_at.items():
+            current = self.removed_at.get(tag)
+            if current is None or tuple(dot) < tuple(current):
+                self.removed_at[tag] = list(dot)
+
+    def merge_many(self, others, self_seen=None, others_seen=None):
+        """
+        K-way merge: same outcome as ORSet.merge, with every side's context
+        checked at once. A tag survives if no side holds its tombstone and
+        every side lacking it has not seen its add.
+        """
+        if others_seen is None:
+            others_seen = [None] * len(others)
+        sides = [(self, self_seen)] + list(zip(others, others_seen))
+
+        tombstones = set(self.tombstones)
+        for other in others:
+            if other.tombstones != tombstones:
+                tombstones |= other.tombstones
+
+        elements = set(self.entries)
+        for other in others:
+            elements.update(other.entries)
+
+        for element in elements:
+            held = [ors.entries.get(element, ()) for ors, _ in sides]
+            first = held[0]
+            if all(tags == first for tags in held):
+                # Every side agrees: only tombstones can drop tags
+                tags = {tag for tag in first if (element, tag) not in tombstones}
+            else:
+                tags = set()
+                for candidate in set().union(*held):
+                    if (element, candidate) in tombstones:
+                        continue
+                    if any(seen is not None and candidate not in side_tags and seen(candidate)
+                           for side_tags, (_, seen) in zip(held, sides)):
+                        continue
+                    tags.add(candidate)
+            self._store(element, tags)
+
+        self.tombstones = tombstones
+        for other in others:
+            for tag, dot in other.removed_at.items():
+                current = self.removed_at.get(tag)
+                if current is None or tuple(dot) < tuple(current):
+                    self.removed_at[tag] = list(dot)
+
+    def _store(self, element, tags):
+        if tags:
+            self.entries[element] = tags
+        else:
+            self.entries.pop(element, None)
+
+    def purge_stable(self, stable_version):
+        """Drops tombstones whose remove has been seen by every replica."""
+        stable_tags = {
+            tag for tag, (actor, counter) in self.removed_at.items()
+            if stable_version.get(actor, 0) >= counter
+        }
+        if not stable_tags:
+            return 0
+
+        purged = {entry for entry in self.tombstones if entry[1] in stable_tags}
+        self.tombstones -= purged
+        for tag in stable_tags:
+            del self.removed_at[tag]
+        return len(purged)
+
+    def translate(self, convert):
+        """Copy with every tag and remove dot rewritten by `convert`."""
+        ors = IndexedORSet()
+        ors.entries = {element: {convert(tag) for tag in tags} for element, tags in self.entries.items()}
+        ors.tombstones = {(element, convert(tag)) for element, tag in self.tombstones}
+        ors.removed_at = {convert(tag): list(convert(tuple(dot))) for tag, dot in self.removed_at.items()}
+        return ors
+
+    def to_dict(self):
+        return {
+            "elements": [[element, tag] for element, tags in self.entries.items() for tag in tags],
+            "tombstones": [list(entry) for entry in self.tombstones],
+            # Pairs rather than a dict: dot tags cannot be JSON keys
+            "removed_at": [[tag, list(dot)] for tag, dot in self.removed_at.items()]
+        }
+
+    @staticmethod
+    def from_dict(data):
+        ors = IndexedORSet()
+        ors.elements = ((element, _tag(tag)) for element, tag in data.get('elements', []))
+        ors.tombstones = {(element, _tag(tag)) for element, tag in data.get('tombstones', [])}
+        removed_at = data.get('removed_at', [])
+        if isinstance(removed_at, dict):
+            removed_at = removed_at.items()
+        ors.removed_at = {_tag(tag): list(dot) for tag, dot in removed_at}
+        return ors
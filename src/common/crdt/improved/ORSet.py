@@ -1,26 +1,91 @@
 import uuid
 
+def _tag(tag):
+    return tuple(tag) if isinstance(tag, list) else tag
+
 class ORSet:
     def __init__(self):
         self.elements = set()
         self.tombstones = set()
+        # tag -> [actor, counter] of the remove that produced the tombstone,
+        # used to purge tombstones once every replica has seen the remove
+        self.removed_at = {}
 
     def add(self, element, tag=None):
         if tag is None:
-            tag = str(uuid.uuid4()) 
+            tag = str(uuid.uuid4())
         self.elements.add((element, tag))
 
-    def remove(self, element):
+        delta = ORSet()
+        delta.elements.add((element, tag))
+        return delta
+
+    def remove(self, element, dot=None):
         items_to_remove = {entry for entry in self.elements if entry[0] == element}
         self.elements -= items_to_remove
         self.tombstones |= items_to_remove
 
+        delta = ORSet()
+        delta.tombstones = set(items_to_remove)
+        if dot is not None:
+            for _, tag in items_to_remove:
+                self.removed_at[tag] = list(dot)
+                delta.removed_at[tag] = list(dot)
+        return delta
+
     def contains(self, element):
         return any(entry[0] == element and entry not in self.tombstones for entry in self.elements)
 
-    def merge(self, other):
-        combined_elements = self.elements | other.elements
+    def merge(self, other, self_seen=None, other_seen=None):
+        # self_seen/other_seen tell whether a side has already seen the add
+        # behind a tag. An element missing from a side that saw its add was
+        # removed there, even if that tombstone has since been purged.
+        combined_elements = self.elements & other.elements
+        for entry in self.elements - other.elements:
+            if other_seen is None or not other_seen(entry[1]):
+                combined_elements.add(entry)
+        for entry in other.elements - self.elements:
+            if self_seen is None or not self_seen(entry[1]):
+                combined_elements.add(entry)
         combined_tombstones = self.tombstones | other.tombstones
-        
+
         self.elements = combined_elements - combined_tombstones
-        self.tombstones = combined_tombstones
\ No newline at end of file
+        self.tombstones = combined_tombstones
+
+        for tag, dot in other.removed_at.items():
+            current = self.removed_at.get(tag)
+            if current is None or tuple(dot) < tuple(current):
+                self.removed_at[tag] = list(dot)
+
+    def purge_stable(self, stable_version):
+        """Drops tombstones whose remove has been seen by every replica."""
+        stable_tags = {
+            tag for tag, (actor, counter) in self.removed_at.items()
+            if stable_version.get(actor, 0) >= counter
+        }
+        if not stable_tags:
+            return 0
+
+        purged = {entry for entry in self.tombstones if entry[1] in stable_tags}
+        self.tombstones -= purged
+        for tag in stable_tags:
+            del self.removed_at[tag]
+        return len(purged)
+
+    def to_dict(self):
+        return {
+            "elements": [list(entry) for entry in self.elements],
+            "tombstones": [list(entry) for entry in self.tombstones],
+            "removed_at": [[tag, list(dot)] for tag, dot in self.removed_at.items()]
+        }
+
+    @staticmethod
+    def from_dict(data):
+        ors = ORSet()
+        ors.elements = {(element, _tag(tag)) for element, tag in data.get('elements', [])}
+        ors.tombstones = {(element, _tag(tag)) for element, tag in data.get('tombstones', [])}
+        removed_at = data.get('removed_at', [])
+        if isinstance(removed_at, dict):
+            removed_at = removed_at.items()
+        ors.removed_at = {_tag(tag): list(dot) for tag, dot in removed_at}
+        return ors
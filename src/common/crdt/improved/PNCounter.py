@@ -1,25 +1,47 @@
 from src.common.crdt.improved.GCounter import GCounter
 
 class PNCounter:
+    __slots__ = ("positive", "negative")
+
     def __init__(self):
         self.positive = GCounter()
         self.negative = GCounter()
 
     def change(self, client_id, amount):
+        delta = PNCounter()
         if amount > 0:
-            self.positive.increment(client_id, amount)
+            delta.positive = self.positive.increment(client_id, amount)
         elif amount < 0:
-            self.negative.increment(client_id, abs(amount))
+            delta.negative = self.negative.increment(client_id, abs(amount))
+        return delta
 
     def increase(self, client_id, amount=1):
-        self.positive.increment(client_id, amount)
+        delta = PNCounter()
+        delta.positive = self.positive.increment(client_id, amount)
+        return delta
 
     def decrease(self, client_id, amount=1):
-        self.negative.increment(client_id, amount)
+        delta = PNCounter()
+        delta.negative = self.negative.increment(client_id, amount)
+        return delta
 
     def get_value(self):
         return self.positive.get_value() - self.negative.get_value()
 
     def merge(self, other):
         self.positive.merge(other.positive)
-        self.negative.merge(other.negative)
\ No newline at end of file
+        self.negative.merge(other.negative)
+
+    def merge_many(self, others):
+        self.positive.merge_many([other.positive for other in others])
+        self.negative.merge_many([other.negative for other in others])
+
+    def to_dict(self):
+        return {"positive": self.positive.to_dict(), "negative": self.negative.to_dict()}
+
+    @staticmethod
+    def from_dict(data):
+        counter = PNCounter()
+        counter.positive = GCounter.from_dict(data.get('positive', {}))
+        counter.negative = GCounter.from_dict(data.get('negative', {}))
+        return counter
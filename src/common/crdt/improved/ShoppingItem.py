@@ -0,0 +1,86 @@
+from hashlib import blake2b
+from src.common.crdt.improved.PNCounter import PNCounter
+from src.common.crdt.improved.IndexedORSet import IndexedORSet
+
+def _sorted(values):
+    try:
+        return sorted(values)
+    except TypeError:
+        # Legacy string tags mixed with dot tags
+        return sorted(values, key=repr)
+
+class ShoppingItem:
+    """
+    CRDT state of one list item. Slotted to keep per-item overhead low;
+    item["needed"] style access still works for older callers.
+    """
+    __slots__ = ("needed", "acquired", "existence", "cached_digest")
+    FIELDS = ("needed", "acquired", "existence")
+
+    def __init__(self, needed=None, acquired=None, existence=None):
+        self.needed = needed if needed is not None else PNCounter()
+        self.acquired = acquired if acquired is not None else PNCounter()
+        self.existence = existence if existence is not None else IndexedORSet()
+        # 64-bit digest of the state, None until computed or after a change
+        self.cached_digest = None
+
+    def __getitem__(self, field):
+        if field not in self.FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __setitem__(self, field, value):
+        if field not in self.FIELDS:
+            raise KeyError(field)
+        setattr(self, field, value)
+
+    def digest(self, name):
+        """Stable across processes: tags are dots, everything else is sorted."""
+        if self.cached_digest is None:
+            existence = self.existence
+            state = (
+                name,
+                _sorted(self.needed.positive.counts.items()),
+                _sorted(self.needed.negative.counts.items()),
+                _sorted(self.acquired.positive.counts.items()),
+                _sorted(self.acquired.negative.counts.items()),
+                _sorted((element, tuple(_sorted(tags))) for element, tags in existence.entries.items()),
+                _sorted(existence.tombstones),
+                _sorted((tag, tuple(dot)) for tag, dot in existence.removed_at.items())
+            )
+            raw = blake2b(repr(state).encode('utf-8'), digest_size=8).digest()
+            self.cached_digest = int.from_bytes(raw, 'big')
+        return self.cached_digest
+
+    def merge(self, other, self_seen=None, other_seen=None):
+        self.cached_digest = None
+        self.needed.merge(other.needed)
+        self.acquired.merge(other.acquired)
+        self.existence.merge(other.existence, self_seen, other_seen)
+
+    def merge_many(self, others, self_seen=None, others_seen=None):
+        self.cached_digest = None
+        self.needed.merge_many([other.needed for other in others])
+        self.acquired.merge_many([other.acquired for other in others])
+        self.existence.merge_many([other.existence for other in others], self_seen, others_seen)
+
+    def to_dict(self):
+        data = {
+            "needed": self.needed.to_dict(),
+            "acquired": self.acquired.to_dict(),
+            "existence": self.existence.to_dict()
+        }
+        if self.cached_digest is not None:
+            data["digest"] = f"{self.cached_digest:016x}"
+        return data
+
+    @staticmethod
+    def from_dict(data):
+        item = ShoppingItem(
+            PNCounter.from_dict(data.get('needed', {})),
+            PNCounter.from_dict(data.get('acquired', {})),
+            IndexedORSet.from_dict(data.get('existence', {}))
+        )
+        if 'digest' in data:
+            item.cached_digest = int(data['digest'], 16)
+        return item
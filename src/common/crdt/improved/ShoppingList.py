@@ -1,93 +1,447 @@
-from src.common.crdt.improved.PNCounter import PNCounter
-from src.common.crdt.improved.ORSet import ORSet
+from src.common.crdt.improved.ShoppingItem import ShoppingItem
+from types import MappingProxyType
 import json
 
+def item_changes(before, after):
+    """
+    Rows to upsert and names to delete to turn the stored items `before`
+    into `after` (both as returned by stored_items). Unchanged items are
+    left out, so an edit touches only the rows it changed.
+    """
+    upserts = [(name, needed, acquired) for name, (needed, acquired) in after.items() if before.get(name) != (needed, acquired)]
+    removed = [name for name in before if name not in after]
+    return upserts, removed
+
+
 class ShoppingList:
     def __init__(self, list_uuid,name=None):
         self.uuid = list_uuid        
         self.clock = 0
         self.name = name            
         self.items = {} 
+        # actor -> highest event counter incorporated. A delta only covers
+        # the events after base[actor]; full states have an empty base.
+        self.version = {}
+        self.base = {}
+        # replica -> version it acknowledged (None once the replica retired)
+        self.summaries = {}
+        # Tags are (actor index, counter) dots; the index points into this
+        # per-list table so a tag never repeats the actor name. The table is
+        # kept sorted, so replicas that know the same actors agree on the
+        # indices and merge without translating tags.
+        self.actors = []
+        self._actor_ids = {}
+        # Materialized get_visible_items(); names in _dirty were touched
+        # since the last read and are recomputed on the next one.
+        self._visible = {}
+        self._view = MappingProxyType(self._visible)
+        self._dirty = set()
+        # XOR of the item digests (None until computed); items in _stale
+        # changed since and are not part of it yet.
+        self._digest = None
+        self._stale = set()
 
     def _tick(self):
         self.clock += 1
         return self.clock
 
+    def _actor_index(self, actor):
+        if actor not in self._actor_ids:
+            self._add_actors([actor])
+        return self._actor_ids[actor]
+
+    def _add_actors(self, actors):
+        names = sorted(set(self.actors).union(actors))
+        if names == self.actors:
+            return
+        # A new actor shifts the indices: rewrite our own tags once
+        old = self.actors
+        self._set_actors(names)
+        if old:
+            convert = self._tag_converter(old)
+            for item in self.items.values():
+                item.existence = item.existence.translate(convert)
+                item.cached_digest = None
+            self._digest = None
+            self._stale.clear()
+
+    def _tag_converter(self, actors):
+        """Maps dots indexed into `actors` (or naming their actor) to our table."""
+        ids = self._actor_ids
+        def convert(tag):
+            if not isinstance(tag, tuple):
+                return tag
+            actor, counter = tag
+            return (ids[actors[actor] if isinstance(actor, int) else actor], counter)
+        return convert
+
+    def _set_actors(self, actors):
+        self.actors = list(actors)
+        self._actor_ids = {actor: index for index, actor in enumerate(self.actors)}
+
+    def _stamp(self, client_id, delta):
+        index = self._actor_index(client_id)
+        counter = self.version.get(client_id, 0) + 1
+        self.version[client_id] = counter
+        # The acting replica has seen everything in its own state
+        self.summaries[client_id] = dict(self.version)
+
+        delta.version = {client_id: counter}
+        delta.base = {client_id: counter - 1}
+        delta.summaries = {client_id: dict(self.version)}
+        # The delta carries the whole table so its tags keep our indices
+        delta._set_actors(self.actors)
+        return (index, counter)
+
+
+    def _new_item(self):
+        return ShoppingItem()
+
+    def new_delta(self):
+        # A delta is a ShoppingList holding only the state touched by one
+        # mutation, so it can be shipped and merged like a full list.
+        delta = ShoppingList(self.uuid, self.name)
+        delta.clock = self.clock
+        return delta
 
     def add_item(self, name,client_id ,needed_amount=1, acquired_amount=0 ):
         self._tick()
-        tag = f"{self.uuid}:{self.clock}"
 
         if name not in self.items:
-            self.items[name] = {
-                "needed": PNCounter(),
-                "acquired": PNCounter(),
-                "existence": ORSet() 
-            }
-        self.items[name]["needed"].change(client_id, needed_amount)
-        self.items[name]["acquired"].change(client_id, acquired_amount)
+            self.items[name] = self._new_item()
+        self._touch(name)
 
-        self.items[name]["existence"].add(name, tag)
+        delta = self.new_delta()
+        tag = self._stamp(client_id, delta)
+        item = self.items[name]
+        delta.items[name] = ShoppingItem(
+            item.needed.change(client_id, needed_amount),
+            item.acquired.change(client_id, acquired_amount),
+            item.existence.add(name, tag)
+        )
+        return delta
 
     def remove_item(self, name, client_id):
         self._tick()
+        delta = self.new_delta()
+        dot = self._stamp(client_id, delta)
         if name in self.items:
-            self.items[name]["existence"].remove(name)
+            self._touch(name)
+            item = self.items[name]
+            existence = item.existence.remove(name, dot)
             # Reset counts to zero upon removal
-            self.items[name]["needed"].change(client_id, -self.items[name]["needed"].get_value())
-            self.items[name]["acquired"].change(client_id, -self.items[name]["acquired"].get_value())
+            needed = item.needed.change(client_id, -item.needed.get_value())
+            acquired = item.acquired.change(client_id, -item.acquired.get_value())
+            delta.items[name] = ShoppingItem(needed, acquired, existence)
+        return delta
 
 
     def update_needed(self, name, amount, client_id):
         self._tick()
+        delta = self.new_delta()
+        self._stamp(client_id, delta)
         if name in self.items:
-            self.items[name]["needed"].change(client_id, amount)
+            self._touch(name)
+            delta.items[name] = ShoppingItem(needed=self.items[name].needed.change(client_id, amount))
+        return delta
 
     def update_acquired(self, name, amount, client_id):
         self._tick()
+        delta = self.new_delta()
+        self._stamp(client_id, delta)
         #print(f"Updating acquired for items: {self.items.keys()}")
         if name in self.items:
-            self.items[name]["acquired"].change(client_id, amount)
+            self._touch(name)
+            delta.items[name] = ShoppingItem(acquired=self.items[name].acquired.change(client_id, amount))
+        return delta
 
     def get_visible_items(self):
-        visible_list = {}
-        for name, data in self.items.items():
-            if data["existence"].contains(name):
-                visible_list[name] = {
-                    "needed": data["needed"].get_value(),
-                    "acquired": data["acquired"].get_value()
+        """Read-only view of the visible items; only touched items are recomputed."""
+        if self._dirty:
+            for name in self._dirty:
+                item = self.items.get(name)
+                if item is not None and item.existence.contains(name):
+                    self._visible[name] = {
+                        "needed": item.needed.get_value(),
+                        "acquired": item.acquired.get_value()
+                    }
+                else:
+                    self._visible.pop(name, None)
+            self._dirty.clear()
+        return self._view
+
+    def stored_items(self):
+        """Visible items as ShoppingListItem rows store them: {name: (needed, acquired)}, clamped at zero."""
+        return {
+            name: (max(0, counts['needed']), max(0, counts['acquired']))
+            for name, counts in self.get_visible_items().items()
+        }
+
+    def _touch(self, name):
+        """Must run before item `name` changes, so its old digest can be XORed out."""
+        self._dirty.add(name)
+        item = self.items.get(name)
+        if self._digest is not None and name not in self._stale:
+            if item is not None and item.cached_digest is not None:
+                self._digest ^= item.cached_digest
+            self._stale.add(name)
+        if item is not None:
+            item.cached_digest = None
+
+    def _touch_all(self):
+        """Resets the view and list digest after items were replaced wholesale."""
+        self._dirty.update(self.items)
+        self._digest = 0
+        self._stale = set()
+        for name, item in self.items.items():
+            if item.cached_digest is None:
+                self._stale.add(name)
+            else:
+                self._digest ^= item.cached_digest
+
+    def digest(self):
+        """XOR of the item digests; only items touched since the last call are rehashed."""
+        if self._digest is None:
+            self._digest = 0
+            self._stale = set(self.items)
+        for name in self._stale:
+            item = self.items.get(name)
+            if item is not None:
+                self._digest ^= item.digest(name)
+        self._stale.clear()
+        return self._digest
+
+    def _join_version(self, other):
+        # Each side covers the contiguous range (base, version] per actor.
+        # Overlapping ranges are joined; if there is a gap only the range
+        # starting lower is kept, so the version never claims missed events.
+        for actor in set(self.version) | set(other.version):
+            lo1, hi1 = self.base.get(actor, 0), self.version.get(actor, 0)
+            lo2, hi2 = other.base.get(actor, 0), other.version.get(actor, 0)
+
+            if hi2 <= lo2:
+                continue
+            if hi1 <= lo1 or (lo2 <= hi1 and lo1 <= hi2):
+                lo, hi = (lo2, hi2) if hi1 <= lo1 else (min(lo1, lo2), max(hi1, hi2))
+            elif lo2 < lo1:
+                lo, hi = lo2, hi2
+            else:
+                continue
+
+            self.version[actor] = hi
+            if lo > 0:
+                self.base[actor] = lo
+            else:
+                self.base.pop(actor, None)
+
+        for replica, summary in other.summaries.items():
+            current = self.summaries.get(replica, {})
+            if summary is None or current is None:
+                self.summaries[replica] = None
+                continue
+            for actor, counter in summary.items():
+                if counter > current.get(actor, 0):
+                    current[actor] = counter
+            self.summaries[replica] = current
+
+    def _seen_dot(self, actor, counter):
+        return self.base.get(actor, 0) < counter <= self.version.get(actor, 0)
+
+    def _has_seen(self, tag):
+        if not isinstance(tag, tuple):
+            return False
+        return self._seen_dot(self.actors[tag[0]], tag[1])
+
+    @staticmethod
+    def _legacy_dot(tag):
+        # "actor:n" string tags from before the actor table -> (actor, n)
+        if isinstance(tag, str):
+            actor, _, counter = tag.rpartition(":")
+            if actor and counter.isdigit():
+                return (actor, int(counter))
+        return tag
+
+    def acknowledge(self, replica):
+        """Records that `replica` has incorporated this state."""
+        if self.summaries.get(replica, {}) is None:
+            return
+        self.summaries[replica] = {
+            actor: counter for actor, counter in self.version.items()
+            if actor not in self.base
+        }
+
+    def retire(self, replica):
+        """Stops waiting on `replica`, e.g. after it handed its copy off."""
+        self.summaries[replica] = None
+
+    def stable_version(self):
+        live = [summary for summary in self.summaries.values() if summary is not None]
+        if not live:
+            return {}
+        actors = set().union(*live)
+        return {actor: min(summary.get(actor, 0) for summary in live) for actor in actors}
+
+    def collect_garbage(self):
+        """Purges tombstones of removes that every known replica has seen."""
+        stable = self.stable_version()
+        if not stable:
+            return 0
+        stable = {self._actor_ids[actor]: counter for actor, counter in stable.items() if actor in self._actor_ids}
+        purged = 0
+        for name, item in self.items.items():
+            count = item.existence.purge_stable(stable)
+            if count:
+                self._touch(name)
+                purged += count
+        return purged
+
+    def _incoming_items(self, other):
+        """
+        Items of `other` that can change ours, with tags in our actor table,
+        and a callback telling whether `other` has seen one of our tags.
+        """
+        other_items = other.items
+        if other.actors != self.actors:
+            # The other side knows fewer actors: bring its tags into our table
+            convert = self._tag_converter(other.actors)
+            other_items = {
+                name: ShoppingItem(item.needed, item.acquired, item.existence.translate(convert))
+                for name, item in other.items.items()
+            }
+        elif not other.base:
+            # Digests are only comparable within one actor table, and deltas
+            # (non-empty base) only hold part of an item
+            if self.digest() == other.digest():
+                other_items = {}
+            else:
+                other_items = {
+                    name: item for name, item in other_items.items()
+                    if name not in self.items or self.items[name].cached_digest != item.digest(name)
                 }
-        return visible_list
+
+        actors = self.actors
+        other_seen = lambda tag: isinstance(tag, tuple) and other._seen_dot(actors[tag[0]], tag[1])
+        return other_items, other_seen
+
+    def delta_for(self, other):
+        """
+        What `other`, a replica already merged into this state, is missing:
+        a delta covering the events after other's version, holding the items
+        whose state differs or that hold a tag from those events. None if
+        other has seen every event.
+        Falls back to the whole state when either side is itself a delta,
+        since a partial range cannot be diffed against.
+        """
+        if all(other.version.get(actor, 0) >= counter for actor, counter in self.version.items()):
+            return None
+        if self.base or other.base:
+            return self
+
+        # Bring other's tags into our table so item digests are comparable
+        convert = None if other.actors == self.actors else self._tag_converter(other.actors)
+        delta = self.new_delta()
+        delta._set_actors(self.actors)
+        delta.version = dict(self.version)
+        delta.base = {actor: other.version[actor] for actor in self.version if other.version.get(actor, 0) > 0}
+        delta.summaries = {
+            replica: (dict(summary) if summary is not None else None)
+            for replica, summary in self.summaries.items()
+        }
+
+        actors = self.actors
+        # The delta claims every event in its range: an item it left out would
+        # read as removed to whoever merges a copy into the delta. Other may
+        # hold such a tag already if it got a later delta before an earlier one.
+        def unseen(tag):
+            return isinstance(tag, tuple) and tag[1] > other.version.get(actors[tag[0]], 0)
+
+        for name, item in self.items.items():
+            theirs = other.items.get(name)
+            if theirs is not None:
+                if convert is not None:
+                    theirs = ShoppingItem(theirs.needed, theirs.acquired, theirs.existence.translate(convert))
+                if theirs.digest(name) == item.digest(name) and not any(map(unseen, item.existence.entries.get(name, ()))):
+                    continue
+            # Shared, not copied: the delta is meant to be encoded and dropped
+            delta.items[name] = item
+        delta._touch_all()
+        return delta
 
     def merge(self, other):
         self.clock = max(self.clock, other.clock)
-        all_keys = set(self.items.keys()) | set(other.items.keys())
-        #print(f"[ShoppingList] Merging shoppiing lists. all_keys: {all_keys}")
+        if other.actors != self.actors:
+            self._add_actors(other.actors)
+        other_items, other_seen = self._incoming_items(other)
+
+        # Items only we hold are unaffected, so only the other side's are visited
         #print(f"[ShoppingList] Self items before merge: {self.items.keys()}")
         #print(f"[ShoppingList] Other items to merge: {other.items.keys()}")
-        for name in all_keys:
-    
+        for name, other_item in other_items.items():
             if name not in self.items:
-                self.items[name] = {
-                    "needed": PNCounter(),
-                    "acquired": PNCounter(),
-                    "existence": ORSet()
-                }
-            if name in other.items:
-                #print(f"[ShoppingList] Merging item '{name}'")
-                other_data = other.items[name]
-                #print(f"[ShoppingList] Self data: {self.items[name]}")
-                #print(f"[ShoppingList] Other data: {other_data}")
-                self.items[name]["needed"].merge(other_data["needed"])
-                self.items[name]["acquired"].merge(other_data["acquired"])
-                self.items[name]["existence"].merge(other_data["existence"])
+                self.items[name] = self._new_item()
+            self._touch(name)
+            #print(f"[ShoppingList] Merging item '{name}'")
+            self.items[name].merge(other_item, self._has_seen, other_seen)
+
+        # Versions are joined last: the ORSet merges above need both sides'
+        # contexts as they were before the merge.
+        self._join_version(other)
+
+    def merge_many(self, others):
+        """
+        Merges several replicas of this list in one pass: each distinct item
+        is merged once against every replica holding it, so the cost follows
+        the number of distinct items rather than replicas x list size.
+        """
+        others = [other for other in others if other is not self]
+        if len(others) <= 1:
+            for other in others:
+                self.merge(other)
+            return
+
+        self.clock = max([self.clock] + [other.clock for other in others])
+        self._add_actors(set().union(*(other.actors for other in others)))
+
+        # Full states identical to ours or to an earlier replica add no items
+        digests = None
+        sources = []
+        for other in others:
+            if not other.base and other.actors == self.actors:
+                if digests is None:
+                    digests = {self.digest()}
+                digest = other.digest()
+                if digest in digests:
+                    continue
+                digests.add(digest)
+            sources.append(self._incoming_items(other))
+
+        names = set()
+        for other_items, _ in sources:
+            names.update(other_items)
+
+        for name in names:
+            present = [(other_items[name], other_seen) for other_items, other_seen in sources if name in other_items]
+            if name not in self.items:
+                self.items[name] = self._new_item()
+            self._touch(name)
+            self.items[name].merge_many(
+                [item for item, _ in present], self._has_seen, [other_seen for _, other_seen in present]
+            )
+
+        for other in others:
+            self._join_version(other)
 
     def to_dict(self):
+        # Item digests travel with the state, so receivers need not rehash
+        self.digest()
+
         def recursive_serialize(obj):
             if isinstance(obj, set):
                 return list(obj)
+            elif isinstance(obj, ShoppingItem):
+                return obj.to_dict()
             elif hasattr(obj, "__dict__"):
-                return {k: recursive_serialize(v) for k, v in obj.__dict__.items()}
+                return {k: recursive_serialize(v) for k, v in obj.__dict__.items() if not k.startswith("_")}
             elif isinstance(obj, dict):
                 return {k: recursive_serialize(v) for k, v in obj.items()}
             else:
@@ -99,33 +453,39 @@ class ShoppingList:
         return json.dumps(self.to_dict())
     
     @staticmethod
-    def from_json(json_str):
-        def recursive_deserialize(data):
-            if isinstance(data, dict):
-                if 'positive' in data and 'negative' in data:
-                    pc = PNCounter()
-                    pc.positive.counts = data['positive']['counts']
-                    pc.negative.counts = data['negative']['counts']
-                    return pc
-                elif 'elements' in data and 'tombstones' in data:
-                    ors = ORSet()
-                    ors.elements = {tuple(x) for x in data['elements']}
-                    ors.tombstones = {tuple(x) for x in data['tombstones']}
-                    return ors
-                else:
-                    return {k: recursive_deserialize(v) for k, v in data.items()}
-            else:
-                return data
-        
-        data = json.loads(json_str)
+    def from_dict(data):
         sl = ShoppingList(list_uuid=data['uuid'], name=data.get('name'))
-        sl.clock = data['clock']
-        
+        sl.clock = data.get('clock', 0)
+        sl.version = dict(data.get('version', {}))
+        sl.base = dict(data.get('base', {}))
+        sl.summaries = {
+            replica: (dict(summary) if summary is not None else None)
+            for replica, summary in data.get('summaries', {}).items()
+        }
+
+        sl._set_actors(data.get('actors', []))
+
         for name, item_data in data.get('items', {}).items():
-            sl.items[name] = {
-                "needed": recursive_deserialize(item_data['needed']),
-                "acquired": recursive_deserialize(item_data['acquired']),
-                "existence": recursive_deserialize(item_data['existence'])
-            }
-        
-        return sl
\ No newline at end of file
+            sl.items[name] = ShoppingItem.from_dict(item_data)
+
+        if 'actors' not in data:
+            # Stored before dot tags: convert the "actor:n" string tags
+            names = set()
+            def parse(tag):
+                tag = ShoppingList._legacy_dot(tag)
+                if isinstance(tag, tuple):
+                    names.add(tag[0])
+                return tag
+            for item in sl.items.values():
+                item.existence = item.existence.translate(parse)
+            sl._set_actors(sorted(names))
+            convert = sl._tag_converter(sl.actors)
+            for item in sl.items.values():
+                item.existence = item.existence.translate(convert)
+
+        sl._touch_all()
+        return sl
+
+    @staticmethod
+    def from_json(json_str):
+        return ShoppingList.from_dict(json.loads(json_str))
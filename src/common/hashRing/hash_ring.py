@@ -0,0 +1,98 @@
+import hashlib
+from bisect import bisect_left
+
+# Tokens per physical server. Every proxy and server must use the same value,
+# otherwise they disagree on where a list lives.
+VIRTUAL_NODES = 16
+
+
+def key_hash(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class HashRing:
+    """
+    Consistent-hash ring over nodes exposing `.hash` (a sha256 hex digest).
+    Token 0 of a node is its own hash, so with one virtual node placement is
+    the same as scanning the servers sorted by hash.
+    """
+    def __init__(self, nodes, vnodes=VIRTUAL_NODES):
+        points = []
+        for node in nodes:
+            points.append((node.hash, node))
+            for i in range(1, vnodes):
+                points.append((key_hash(f"{node.hash}#{i}"), node))
+        points.sort(key=lambda point: point[0])
+
+        self.tokens = [token for token, _ in points]
+        self.owners = [node for _, node in points]
+        self.size = len({id(node) for node in self.owners})
+        # token index -> distinct nodes clockwise from it, built on demand
+        self._walks = {}
+
+    def __len__(self):
+        return self.size
+
+    def _walk(self, index):
+        walk = self._walks.get(index)
+        if walk is None:
+            walk = []
+            seen = set()
+            count = len(self.owners)
+            for offset in range(count):
+                node = self.owners[(index + offset) % count]
+                if id(node) not in seen:
+                    seen.add(id(node))
+                    walk.append(node)
+                    if len(walk) == self.size:
+                        break
+            self._walks[index] = walk
+        return walk
+
+    def lookup(self, key):
+        """First node clockwise from the key, or None on an empty ring."""
+        if not self.tokens:
+            return None
+        return self.owners[bisect_left(self.tokens, key_hash(key)) % len(self.tokens)]
+
+    def token_range(self, key):
+        """Token closing the arc the key falls in; names that range on every node."""
+        if not self.tokens:
+            return None
+        return self.tokens[bisect_left(self.tokens, key_hash(key)) % len(self.tokens)]
+
+    def range_bounds(self, token):
+        """(low, high] hash interval of the range a token closes."""
+        index = bisect_left(self.tokens, token)
+        return self.tokens[index - 1], token
+
+    def replica_ranges(self, port, count):
+        """Tokens of the ranges whose first `count` nodes include the node on `port`."""
+        return {
+            token for index, token in enumerate(self.tokens)
+            if any(str(node.port) == str(port) for node in self._walk(index)[:count])
+        }
+
+    def preference_list(self, key, count=None):
+        """Distinct nodes clockwise from the key: the primary, then the replicas."""
+        if not self.tokens:
+            return []
+        walk = self._walk(bisect_left(self.tokens, key_hash(key)) % len(self.tokens))
+        return walk[:count]
+
+
+class RingCache:
+    """Keeps the ring built for the current hash_ring_version."""
+    def __init__(self, vnodes=VIRTUAL_NODES):
+        self.vnodes = vnodes
+        self._cached = (None, None)
+
+    def get(self, version, nodes):
+        # Membership is part of the key: gossip bumps the version before it
+        # edits the server list, so the version alone can name an older ring
+        key = (version, frozenset((str(node.port), node.hash) for node in nodes))
+        cached_key, ring = self._cached
+        if cached_key != key:
+            ring = HashRing(list(nodes), self.vnodes)
+            self._cached = (key, ring)
+        return ring
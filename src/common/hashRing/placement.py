@@ -0,0 +1,145 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from src.common.hashRing.hash_ring import key_hash
+
+
+class PlacementIndex:
+    """
+    Tracks which stored rows belong on another server.
+
+    A row (list_id, replica_id) is owned by slot 0 of the list's preference
+    list when it is a primary, and by slot replica_id when it is a replica.
+    Owners are recorded when a row is written. When the ring changes only
+    the arcs whose owners moved are recomputed, so the heartbeat never has
+    to decode the whole table to find lists to hand off.
+    """
+    def __init__(self, slots=3):
+        self.slots = slots
+        # list_id -> {replica_id: is_replica}
+        self.lists = {}
+        self.row_count = 0
+        # Sorted key hashes of the stored lists, and the list each belongs to
+        self.hashes = []
+        self.by_hash = {}
+        # (list_id, replica_id) -> port of the server the row belongs on
+        self.misplaced = {}
+        self.ring = None
+        self.ring_key = None
+        self.port = None
+        self.recomputed = 0
+        self.lock = threading.Lock()
+
+    def _place(self, list_id, rows, index):
+        # Without a ring every row is assumed to be in the right place
+        walk = self.ring._walk(index) if index is not None else None
+        for replica_id, is_replica in rows.items():
+            row = (list_id, replica_id)
+            owner = str(walk[replica_id % len(walk) if is_replica else 0].port) if walk else self.port
+            if owner != self.port:
+                self.misplaced[row] = owner
+            else:
+                self.misplaced.pop(row, None)
+
+    def _index_of(self, list_hash):
+        if self.ring is None or not self.ring.tokens:
+            return None
+        return bisect_left(self.ring.tokens, list_hash) % len(self.ring.tokens)
+
+    def record(self, list_id, replica_id, is_replica):
+        list_id = str(list_id)
+        with self.lock:
+            rows = self.lists.get(list_id)
+            list_hash = key_hash(list_id)
+            if rows is None:
+                rows = self.lists[list_id] = {}
+                insort(self.hashes, list_hash)
+                self.by_hash[list_hash] = list_id
+            if replica_id not in rows:
+                self.row_count += 1
+                self.slots = max(self.slots, replica_id + 1)
+            rows[replica_id] = is_replica
+            self._place(list_id, {replica_id: is_replica}, self._index_of(list_hash))
+
+    def forget(self, list_id, replica_id):
+        list_id = str(list_id)
+        with self.lock:
+            rows = self.lists.get(list_id)
+            if rows is None or replica_id not in rows:
+                return
+            del rows[replica_id]
+            self.row_count -= 1
+            self.misplaced.pop((list_id, replica_id), None)
+            if not rows:
+                del self.lists[list_id]
+                list_hash = key_hash(list_id)
+                del self.hashes[bisect_left(self.hashes, list_hash)]
+                del self.by_hash[list_hash]
+
+    def _signature(self, ring, index):
+        walk = ring._walk(index)
+        return tuple(str(walk[slot % len(walk)].port) for slot in range(self.slots))
+
+    def _changed_arcs(self, old, new):
+        """
+        (low, high] hash intervals whose owners differ between two rings.
+        Between consecutive tokens of either ring both rings map every key
+        to one token, so the merged token list splits the circle into arcs
+        with constant owners.
+        """
+        bounds = sorted(set(old.tokens) | set(new.tokens))
+        changed = []
+        for i, high in enumerate(bounds):
+            old_index = bisect_left(old.tokens, high) % len(old.tokens)
+            new_index = bisect_left(new.tokens, high) % len(new.tokens)
+            if self._signature(old, old_index) != self._signature(new, new_index):
+                changed.append((bounds[i - 1] if i else bounds[-1], high))
+        return changed
+
+    def _hashes_in(self, low, high):
+        if low < high:
+            return self.hashes[bisect_right(self.hashes, low):bisect_right(self.hashes, high)]
+        # The arc through the top of the hash space
+        return self.hashes[bisect_right(self.hashes, low):] + self.hashes[:bisect_right(self.hashes, high)]
+
+    def set_ring(self, ring, key, port):
+        """Moves to a new ring, recomputing only the rows on arcs that changed owners."""
+        with self.lock:
+            if key == self.ring_key and str(port) == self.port:
+                return
+            old, self.ring, self.ring_key = self.ring, ring, key
+            moved_port = str(port) != self.port
+            self.port = str(port)
+
+            if moved_port or old is None or not old.tokens or not ring.tokens:
+                affected = self.hashes
+            else:
+                affected = []
+                for low, high in self._changed_arcs(old, ring):
+                    affected.extend(self._hashes_in(low, high))
+
+            self.recomputed = 0
+            for list_hash in affected:
+                list_id = self.by_hash[list_hash]
+                self._place(list_id, self.lists[list_id], self._index_of(list_hash))
+                self.recomputed += len(self.lists[list_id])
+
+    def preferred_row(self, list_id):
+        """replicaID a read of the list is served from: its primary row if held, else the lowest."""
+        with self.lock:
+            rows = self.lists.get(str(list_id))
+            if not rows:
+                return None
+            primaries = [replica_id for replica_id, is_replica in rows.items() if not is_replica]
+            return min(primaries or rows)
+
+    def handoff_candidates(self):
+        """{port: [(list_id, replica_id)]} of the rows that belong elsewhere."""
+        with self.lock:
+            candidates = {}
+            for row, port in self.misplaced.items():
+                candidates.setdefault(port, []).append(row)
+            return candidates
+
+    def metrics(self):
+        with self.lock:
+            return {"rows": self.row_count, "misplaced": len(self.misplaced), "recomputed": self.recomputed}
@@ -0,0 +1,167 @@
+import threading
+from hashlib import blake2b
+from src.common.hashRing.hash_ring import key_hash
+
+# 2^LEAF_BITS leaves per token range
+LEAF_BITS = 6
+
+
+def fingerprint(list_id, states):
+    """
+    64-bit hash of a list id and the (version, base) of its stored rows.
+    Replicas that saw the same events have the same version vectors, so
+    this is independent of actor-table order and of which replicaID slot
+    holds the row.
+    """
+    canonical = sorted({(tuple(sorted(version.items())), tuple(sorted(base.items()))) for version, base in states})
+    raw = blake2b(repr((list_id, canonical)).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(raw, 'big')
+
+
+class MerkleTree:
+    """
+    Hash tree over the lists of one token range. Lists are bucketed into
+    leaves by their key hash and every node is the XOR of the fingerprints
+    below it, so adding, changing or dropping a list rewrites one path.
+    Nodes are stored heap-style: 1 is the root, 2n and 2n+1 the children.
+    """
+    __slots__ = ("depth", "nodes", "buckets")
+
+    def __init__(self, depth=LEAF_BITS):
+        self.depth = depth
+        self.nodes = [0] * (2 << depth)
+        self.buckets = [dict() for _ in range(1 << depth)]
+
+    def leaf_of(self, list_id):
+        # The low bits of the key hash: the high ones pick the token range
+        return int(key_hash(list_id)[-8:], 16) & ((1 << self.depth) - 1)
+
+    def _apply(self, leaf, delta):
+        node = (1 << self.depth) + leaf
+        while node:
+            self.nodes[node] ^= delta
+            node >>= 1
+
+    def put(self, list_id, value):
+        leaf = self.leaf_of(list_id)
+        old = self.buckets[leaf].get(list_id, 0)
+        self.buckets[leaf][list_id] = value
+        self._apply(leaf, old ^ value)
+
+    def remove(self, list_id):
+        leaf = self.leaf_of(list_id)
+        old = self.buckets[leaf].pop(list_id, None)
+        if old is not None:
+            self._apply(leaf, old)
+
+    def root(self):
+        return self.nodes[1]
+
+    def leaves(self):
+        return self.nodes[1 << self.depth:]
+
+    def diff_leaves(self, other_leaves):
+        """Indices of the leaves whose hash differs from `other_leaves`."""
+        return [leaf for leaf, value in enumerate(self.leaves()) if value != other_leaves[leaf]]
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.buckets)
+
+
+class MerkleIndex:
+    """
+    Per token range Merkle trees over the lists one server stores.
+
+    Storage reports every saved and deleted row, so the trees stay current
+    without reading Postgres. Ranges come from the hash ring: after a ring
+    change only the in-memory fingerprints are regrouped.
+    """
+    def __init__(self, depth=LEAF_BITS):
+        self.depth = depth
+        # list_id -> {replica_id: (version, base)}
+        self.rows = {}
+        self.fingerprints = {}
+        self.trees = {}
+        self.ring = None
+        self.ring_key = None
+        self.lock = threading.Lock()
+
+    def _range_of(self, list_id):
+        return None if self.ring is None else self.ring.token_range(list_id)
+
+    def _tree(self, token):
+        tree = self.trees.get(token)
+        if tree is None:
+            tree = self.trees[token] = MerkleTree(self.depth)
+        return tree
+
+    def _refresh(self, list_id):
+        tree = self._tree(self._range_of(list_id))
+        rows = self.rows.get(list_id)
+        if rows:
+            value = fingerprint(list_id, rows.values())
+            self.fingerprints[list_id] = value
+            tree.put(list_id, value)
+        else:
+            self.fingerprints.pop(list_id, None)
+            tree.remove(list_id)
+
+    def put(self, list_id, replica_id, version, base=None):
+        list_id = str(list_id)
+        with self.lock:
+            self.rows.setdefault(list_id, {})[replica_id] = (dict(version), dict(base or {}))
+            self._refresh(list_id)
+
+    def remove(self, list_id, replica_id):
+        list_id = str(list_id)
+        with self.lock:
+            rows = self.rows.get(list_id)
+            if rows is None or replica_id not in rows:
+                return
+            del rows[replica_id]
+            if not rows:
+                del self.rows[list_id]
+            self._refresh(list_id)
+
+    def set_ring(self, ring, key):
+        """Regroups the lists by the token ranges of a new ring."""
+        with self.lock:
+            if key == self.ring_key:
+                return
+            self.ring = ring
+            self.ring_key = key
+            self.trees = {}
+            for list_id, value in self.fingerprints.items():
+                self._tree(self._range_of(list_id)).put(list_id, value)
+
+    def roots(self, tokens):
+        with self.lock:
+            return {token: self.trees[token].root() if token in self.trees else 0 for token in tokens}
+
+    def leaves(self, token):
+        with self.lock:
+            tree = self.trees.get(token)
+            return tree.leaves() if tree is not None else [0] * (1 << self.depth)
+
+    def diff_leaves(self, token, other_leaves):
+        with self.lock:
+            tree = self.trees.get(token)
+            if tree is None:
+                return [leaf for leaf, value in enumerate(other_leaves) if value]
+            return tree.diff_leaves(other_leaves)
+
+    def replicas_of(self, list_id):
+        """replicaIDs this server stores the list under."""
+        with self.lock:
+            return sorted(self.rows.get(str(list_id), ()))
+
+    def lists_in(self, token, leaves):
+        """{list_id: fingerprint} for the lists in the given leaves of a range."""
+        with self.lock:
+            tree = self.trees.get(token)
+            if tree is None:
+                return {}
+            found = {}
+            for leaf in leaves:
+                found.update(tree.buckets[leaf])
+            return found
@@ -1,6 +1,8 @@
 from enum import Enum
 import json
 
+from src.common.codec.binary_codec import JSON, BINARY, is_binary_message, encode_message, decode_message
+
 class MessageType(Enum):
     REQUEST_FULL_LIST = 1
     REQUEST_FULL_LIST_ACK = 2
@@ -23,18 +25,49 @@ class MessageType(Enum):
     LIST_UPDATE = 19
     GOSSIP_INTRODUCTION = 20
     GOSSIP_SERVER_REMOVAL_ACK = 21
+    SENT_DELTA = 22
+    SENT_DELTA_ACK = 23
+    SENT_DELTA_NACK = 24
+    READ_REPAIR = 25
+    READ_REPAIR_ACK = 26
+    MERKLE_ROOTS = 27
+    MERKLE_ROOTS_ACK = 28
+    MERKLE_PULL = 29
+    MERKLE_PULL_ACK = 30
+
+def _contains_bytes(value):
+    if isinstance(value, (bytes, bytearray)):
+        return True
+    if isinstance(value, dict):
+        return any(_contains_bytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_contains_bytes(v) for v in value)
+    return False
 
 class Message:
-    def __init__(self, msg_type=None, payload=None, json_str=None):
+    def __init__(self, msg_type=None, payload=None, json_str=None, codec=None):
         if json_str is not None:
-            data = json.loads(json_str.decode('utf-8'))
-            self.msg_type = MessageType(data["msg_type"])
-            self.payload = data["payload"]
+            if is_binary_message(json_str):
+                msg_type_value, self.payload = decode_message(json_str)
+                self.msg_type = MessageType(msg_type_value)
+                self.codec = BINARY
+            else:
+                data = json.loads(json_str.decode('utf-8'))
+                self.msg_type = MessageType(data["msg_type"])
+                self.payload = data["payload"]
+                self.codec = JSON
         else:
             self.msg_type = msg_type
             self.payload = payload
+            # Binary framing is picked per message: explicitly, or whenever the
+            # payload carries binary blobs that JSON could not represent
+            if codec is None:
+                codec = BINARY if _contains_bytes(payload) else JSON
+            self.codec = codec
 
     def serialize(self):
+        if self.codec == BINARY:
+            return encode_message(self.msg_type.value, self.payload)
         return json.dumps(self.to_dict()).encode('utf-8')
 
     def to_dict(self):
@@ -0,0 +1,64 @@
+import bisect
+import threading
+
+# Bucket upper bounds in ms, two per power of two: 0.25ms .. ~3min
+DEFAULT_BOUNDS = [0.25 * 2 ** (i / 2) for i in range(40)]
+
+
+class LatencyHistogram:
+    """
+    Latency histogram with fixed log-spaced buckets, so recording is a
+    bisect and memory stays constant. Percentiles are read off the bucket
+    bounds, which puts them within ~41% of the true value (one half-octave).
+    """
+    __slots__ = ("name", "bounds", "counts", "count", "total", "max", "lock")
+
+    def __init__(self, name, bounds=DEFAULT_BOUNDS):
+        self.name = name
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, ms):
+        index = bisect.bisect_left(self.bounds, ms)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += ms
+            if ms > self.max:
+                self.max = ms
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile (p in 0..100)."""
+        with self.lock:
+            if not self.count:
+                return None
+            rank = max(1, round(self.count * p / 100))
+            seen = 0
+            for index, bucket in enumerate(self.counts):
+                seen += bucket
+                if seen >= rank:
+                    break
+            if index == len(self.bounds):
+                return self.max
+            return min(self.bounds[index], self.max)
+
+    def snapshot(self):
+        count = self.count
+        return {
+            "count": count,
+            "mean_ms": round(self.total / count, 2) if count else None,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max, 2) if count else None
+        }
+
+    def __str__(self):
+        snap = self.snapshot()
+        if not snap["count"]:
+            return f"{self.name}: no samples"
+        return (f"{self.name}: n={snap['count']} p50={snap['p50_ms']:.1f}ms "
+                f"p99={snap['p99_ms']:.1f}ms max={snap['max_ms']:.1f}ms")
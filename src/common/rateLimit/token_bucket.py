@@ -0,0 +1,25 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Allows `rate` operations per second on average and bursts of up to
+    `burst`. try_acquire never blocks: callers skip the work when it fails.
+    """
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self, tokens=1):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < tokens:
+                return False
+            self.tokens -= tokens
+            return True
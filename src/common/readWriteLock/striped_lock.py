@@ -0,0 +1,20 @@
+import threading
+
+LOCK_STRIPES = 64
+
+
+class StripedLock:
+    """
+    A fixed set of locks picked by key hash. Writers of the same key are
+    serialized, writers of different keys only meet when their keys share
+    a stripe. One stripe behaves like a single global lock.
+    """
+    def __init__(self, stripes=LOCK_STRIPES):
+        self.locks = [threading.Lock() for _ in range(stripes)]
+
+    def lock_for(self, key):
+        return self.locks[hash(key) % len(self.locks)]
+
+    def locks_for(self, keys):
+        """Distinct stripes of `keys`, in stripe order so batches cannot deadlock each other."""
+        return [self.locks[index] for index in sorted({hash(key) % len(self.locks) for key in keys})]
@@ -0,0 +1,63 @@
+import argparse
+import time
+import uuid
+from src.common.crdt.improved.ShoppingList import ShoppingList
+from src.common.messages.messages import Message, MessageType
+from src.common.codec.binary_codec import JSON, BINARY, encode_list, decode_list
+
+# Compares the JSON path (to_json inside a JSON message, i.e. encoded twice)
+# with the binary path (list blob inside a binary message frame) for one
+# SENT_FULL_LIST hop: encode + frame, then parse + decode.
+
+
+def build_list(num_items, churn):
+    sl = ShoppingList(str(uuid.uuid4()), "Benchmark List")
+    clients = [f"User_{c}" for c in range(4)]
+    for i in range(num_items):
+        name = f"item_{i}"
+        for round_number in range(churn):
+            client_id = clients[(i + round_number) % len(clients)]
+            sl.add_item(name, client_id, needed_amount=2)
+            if round_number < churn - 1:
+                sl.remove_item(name, client_id)
+        sl.update_acquired(name, 1, clients[i % len(clients)])
+        sl.acknowledge("server_5555/0")
+    return sl
+
+
+def time_hop(shop_list, codec, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        raw = Message(MessageType.SENT_FULL_LIST, {"shopping_list": encode_list(shop_list, codec)}, codec=codec).serialize()
+    encode_us = (time.perf_counter() - start) / repeat * 1e6
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        decode_list(Message(json_str=raw).payload["shopping_list"])
+    decode_us = (time.perf_counter() - start) / repeat * 1e6
+
+    return encode_us, decode_us, len(raw)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ShoppingList codec benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--churn", type=int, default=3, help="add/remove rounds per item")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'items':>6} {'codec':>7} {'encode us':>11} {'decode us':>11} {'bytes':>9}")
+    for size in args.sizes:
+        shop_list = build_list(size, args.churn)
+        results = {}
+        for codec in (JSON, BINARY):
+            results[codec] = time_hop(shop_list, codec, args.repeat)
+            encode_us, decode_us, size_bytes = results[codec]
+            print(f"{size:>6} {codec:>7} {encode_us:>11.1f} {decode_us:>11.1f} {size_bytes:>9}")
+
+        ratio = results[JSON][2] / results[BINARY][2]
+        print(f"{'':>6} {'':>7} binary is {ratio:.1f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import hashlib
+import statistics
+import time
+import uuid
+from src.common.hashRing.hash_ring import HashRing
+
+# Load balance: how evenly list ids spread over the physical servers for a
+# given number of virtual nodes. Lookup: the old per-call sort + linear scan
+# against a cached ring with bisect.
+
+
+class Node:
+    def __init__(self, port):
+        self.port = port
+        self.hash = hashlib.sha256(f"server_{port}".encode()).hexdigest()
+
+
+def sorted_scan(servers, key):
+    key_hash = hashlib.sha256(key.encode()).hexdigest()
+    ordered = sorted(servers, key=lambda s: s.hash)
+    start = next((i for i, s in enumerate(ordered) if key_hash <= s.hash), 0)
+    return [ordered[(start + offset) % len(ordered)] for offset in range(len(ordered))]
+
+
+def balance(servers, keys, vnodes):
+    ring = HashRing(servers, vnodes)
+    load = {node.port: 0 for node in servers}
+    for key in keys:
+        load[ring.lookup(key).port] += 1
+    counts = list(load.values())
+    mean = statistics.mean(counts)
+    return max(counts) / mean, statistics.pstdev(counts) / mean
+
+
+def time_lookups(lookup, keys):
+    start = time.perf_counter()
+    for key in keys:
+        lookup(key)
+    return (time.perf_counter() - start) / len(keys) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hash ring benchmark")
+    parser.add_argument("--servers", type=int, nargs="+", default=[5, 20, 100])
+    parser.add_argument("--keys", type=int, default=20000)
+    parser.add_argument("--vnodes", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    keys = [str(uuid.uuid4()) for _ in range(args.keys)]
+
+    print("--- load balance (max/mean and stddev/mean of lists per server) ---")
+    print(f"{'servers':>8} {'vnodes':>7} {'max/mean':>9} {'cv':>7}")
+    for count in args.servers:
+        servers = [Node(5555 + i) for i in range(count)]
+        for vnodes in args.vnodes:
+            peak, cv = balance(servers, keys, vnodes)
+            print(f"{count:>8} {vnodes:>7} {peak:>9.2f} {cv:>7.2f}")
+
+    print("\n--- preference list lookup, us per call ---")
+    print(f"{'servers':>8} {'sorted scan':>12} {'ring':>8}")
+    sample = keys[:2000]
+    for count in args.servers:
+        servers = [Node(5555 + i) for i in range(count)]
+        ring = HashRing(servers, 16)
+        scan_us = time_lookups(lambda key: sorted_scan(servers, key), sample)
+        # Walks are cached per token, so warm the ring up first
+        time_lookups(ring.preference_list, keys)
+        ring_us = time_lookups(ring.preference_list, sample)
+        print(f"{count:>8} {scan_us:>12.2f} {ring_us:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
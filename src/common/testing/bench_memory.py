@@ -0,0 +1,45 @@
+import argparse
+import gc
+import tracemalloc
+import uuid
+from src.common.crdt.improved.ShoppingList import ShoppingList
+
+# Measures the resident size of materialized ShoppingLists, as the server
+# holds them after get_all_lists(): bytes per 1k items, after a JSON round
+# trip so the objects are built the same way storage builds them.
+
+
+def build_list(num_items, clients=4):
+    sl = ShoppingList(str(uuid.uuid4()), "Memory List")
+    for i in range(num_items):
+        client_id = f"User_{i % clients}"
+        sl.add_item(f"item_{i}", client_id, needed_amount=3)
+        sl.update_acquired(f"item_{i}", 1, f"User_{(i + 1) % clients}")
+    return ShoppingList.from_json(sl.to_json())
+
+
+def measure(num_lists, num_items):
+    blobs = [build_list(num_items).to_json() for _ in range(num_lists)]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    lists = [ShoppingList.from_json(blob) for blob in blobs]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    total_items = sum(len(sl.items) for sl in lists)
+    return (after - before) / total_items * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ShoppingList memory benchmark")
+    parser.add_argument("--lists", type=int, default=20)
+    parser.add_argument("--items", type=int, default=500)
+    args = parser.parse_args()
+
+    per_1k = measure(args.lists, args.items)
+    print(f"{args.lists} lists x {args.items} items: {per_1k / 1024:.1f} KiB per 1k items")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import random
+import time
+import uuid
+from src.common.crdt.improved.ShoppingList import ShoppingList
+
+# Stress benchmark: replicas keep removing and re-adding the same items and
+# exchange full states after every round. Without GC the tombstone set (and
+# merge cost) grows with the number of rounds; with causal-stability GC it
+# stays bounded by the churn of the last couple of rounds.
+
+
+def run(rounds, items, churn, gc, report_every, seed=0):
+    rng = random.Random(seed)
+    list_id = str(uuid.uuid4())
+    names = [f"item_{i}" for i in range(items)]
+    replicas = [("Alice", ShoppingList(list_id)), ("Bob", ShoppingList(list_id)), ("server", ShoppingList(list_id))]
+
+    alice = replicas[0][1]
+    for name in names:
+        alice.add_item(name, "Alice")
+
+    print(f"\n--- GC {'ON' if gc else 'OFF'} ({items} items, {churn} removes/re-adds per client per round) ---")
+    print(f"{'round':>6} {'merge ms':>10} {'tombstones':>11} {'json bytes':>11}")
+
+    for round_number in range(1, rounds + 1):
+        for client_id, shop_list in replicas[:2]:
+            for name in rng.sample(names, churn):
+                shop_list.remove_item(name, client_id)
+                shop_list.add_item(name, client_id)
+
+        start = time.perf_counter()
+        for replica_name, shop_list in replicas:
+            for _, other in replicas:
+                if other is not shop_list:
+                    shop_list.merge(other)
+            shop_list.acknowledge(replica_name)
+            if gc:
+                shop_list.collect_garbage()
+        elapsed = (time.perf_counter() - start) * 1000
+
+        if round_number % report_every == 0:
+            tombstones = sum(len(data["existence"].tombstones) for data in alice.items.values())
+            print(f"{round_number:>6} {elapsed:>10.2f} {tombstones:>11} {len(alice.to_json()):>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ORSet tombstone churn benchmark")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--churn", type=int, default=20)
+    parser.add_argument("--report-every", type=int, default=25)
+    args = parser.parse_args()
+
+    for gc in (False, True):
+        run(args.rounds, args.items, args.churn, gc, args.report_every)
+
+
+if __name__ == "__main__":
+    main()
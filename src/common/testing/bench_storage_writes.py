@@ -0,0 +1,67 @@
+import argparse
+import threading
+import time
+import uuid
+from src.common.crdt.improved.ShoppingList import ShoppingList
+from src.common.readWriteLock.striped_lock import LOCK_STRIPES
+from src.server.main import ensure_database_exists, PG_USER, PG_PASSWORD, PG_HOST, PG_PORT
+from src.server.storage import ShoppingListStorage
+
+# save_list throughput against a local Postgres as handler threads grow.
+# One lock stripe is the old global write lock; with the default stripes
+# writers of different lists only wait on Postgres.
+
+DB_NAME = "bench_storage_writes"
+
+
+def make_storage(threads, stripes):
+    db_config = {"dbname": DB_NAME, "user": PG_USER, "password": PG_PASSWORD, "host": PG_HOST, "port": PG_PORT}
+    storage = ShoppingListStorage(db_config, replica_name="bench", pool_size=threads, lock_stripes=stripes)
+    storage.initialize_schema()
+    conn = storage._get_conn()
+    with conn.cursor() as cursor:
+        cursor.execute("TRUNCATE ShoppingList CASCADE")
+    conn.close()
+    return storage
+
+
+def run(storage, threads, writes, lists):
+    list_ids = [str(uuid.uuid4()) for _ in range(lists)]
+
+    def writer(worker):
+        for i in range(writes):
+            list_id = list_ids[(worker * writes + i) % lists]
+            shop_list = ShoppingList(list_id, "bench")
+            shop_list.add_item(f"item{i % 8}", f"w{worker}")
+            storage.save_list(shop_list, name="bench")
+
+    workers = [threading.Thread(target=writer, args=(w,)) for w in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return threads * writes / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Storage write concurrency benchmark")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--writes", type=int, default=200, help="save_list calls per thread")
+    parser.add_argument("--lists", type=int, default=512, help="distinct lists written")
+    args = parser.parse_args()
+
+    ensure_database_exists(DB_NAME)
+
+    print(f"{'threads':>8} {'global ops/s':>13} {'striped ops/s':>14} {'speedup':>8}")
+    for threads in args.threads:
+        rates = []
+        for stripes in (1, LOCK_STRIPES):
+            storage = make_storage(threads, stripes)
+            rates.append(run(storage, threads, args.writes, args.lists))
+            storage.pool.close()
+        print(f"{threads:>8} {rates[0]:>13.0f} {rates[1]:>14.0f} {rates[1] / rates[0]:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import uuid
+from src.common.crdt.improved.ShoppingList import ShoppingList
+from src.common.messages.messages import Message, MessageType
+from src.common.codec.binary_codec import JSON, BINARY, encode_list, decode_list, list_uuid, codec_of
+
+
+def build_list():
+    sl = ShoppingList(str(uuid.uuid4()), "Groceries")
+    sl.add_item("Milk", "Alice", needed_amount=3)
+    sl.add_item("Eggs", "Bob", needed_amount=12)
+    sl.update_acquired("Milk", 2, "Bob")
+    sl.remove_item("Eggs", "Alice")
+    sl.add_item("Eggs", "Alice", needed_amount=6)
+    sl.acknowledge("server_5555/0")
+    return sl
+
+
+def same_state(a, b):
+    assert a.uuid == b.uuid and a.name == b.name and a.clock == b.clock
+    assert a.version == b.version and a.base == b.base and a.summaries == b.summaries
+    assert set(a.items) == set(b.items)
+    for name in a.items:
+        for field in ("needed", "acquired"):
+            assert a.items[name][field].get_value() == b.items[name][field].get_value()
+        assert a.items[name]["existence"].entries == b.items[name]["existence"].entries
+        assert a.items[name]["existence"].tombstones == b.items[name]["existence"].tombstones
+        assert a.items[name]["existence"].removed_at == b.items[name]["existence"].removed_at
+
+
+def test_list_roundtrip():
+    print("\n=== STARTING CODEC ROUNDTRIP TEST ===\n")
+    sl = build_list()
+    for codec in (JSON, BINARY):
+        blob = encode_list(sl, codec)
+        assert codec_of(blob) == codec
+        assert list_uuid(blob) == sl.uuid
+        same_state(sl, decode_list(blob))
+
+
+def test_message_negotiation():
+    sl = build_list()
+    for codec in (JSON, BINARY):
+        msg = Message(MessageType.SENT_FULL_LIST, {"shopping_list": encode_list(sl, codec)})
+        assert msg.codec == codec
+
+        received = Message(json_str=msg.serialize())
+        assert received.msg_type == MessageType.SENT_FULL_LIST
+        assert received.codec == codec
+        same_state(sl, decode_list(received.payload["shopping_list"]))
+
+
+if __name__ == "__main__":
+    test_list_roundtrip()
+    test_message_negotiation()
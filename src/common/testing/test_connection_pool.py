@@ -0,0 +1,87 @@
+import threading
+import time
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+from src.server.connectionPool import ConnectionPool
+
+
+class FakeInfo:
+    def __init__(self):
+        self.transaction_status = TRANSACTION_STATUS_IDLE
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.info = FakeInfo()
+        self.prepared = 0
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+def prepare(conn):
+    conn.prepared += 1
+
+
+def test_reuses_connections_and_prepares_once():
+    print("\n=== STARTING CONNECTION POOL REUSE TEST ===\n")
+    opened = []
+    pool = ConnectionPool(lambda: opened.append(FakeConnection()) or opened[-1], max_size=4, on_connect=prepare)
+
+    for _ in range(10):
+        conn = pool.checkout()
+        pool.checkin(conn)
+
+    assert len(opened) == 1
+    assert opened[0].prepared == 1
+    metrics = pool.metrics()
+    assert metrics["checkouts"] == 10 and metrics["created"] == 1 and metrics["in_use"] == 0
+
+
+def test_waits_when_exhausted_and_times_out():
+    print("\n=== STARTING CONNECTION POOL BOUND TEST ===\n")
+    pool = ConnectionPool(FakeConnection, max_size=2, timeout=0.2)
+    held = [pool.checkout(), pool.checkout()]
+
+    start = time.monotonic()
+    try:
+        pool.checkout()
+        assert False, "checkout should time out"
+    except TimeoutError:
+        pass
+    assert time.monotonic() - start >= 0.2
+    assert pool.metrics()["timeouts"] == 1
+
+    # A waiter gets the connection as soon as it is returned
+    pool.timeout = 2.0
+    threading.Timer(0.05, pool.checkin, args=(held[0],)).start()
+    assert pool.checkout() is held[0]
+    assert pool.metrics()["waits"] == 1
+    assert pool.metrics()["size"] == 2
+
+
+def test_discards_broken_and_rolls_back_open_transactions():
+    print("\n=== STARTING CONNECTION POOL DISCARD TEST ===\n")
+    pool = ConnectionPool(FakeConnection, max_size=1)
+
+    conn = pool.checkout()
+    conn.info.transaction_status = TRANSACTION_STATUS_INTRANS
+    pool.checkin(conn)
+    assert conn.rollbacks == 1
+    assert pool.checkout() is conn
+
+    conn.closed = 2
+    pool.checkin(conn)
+    assert pool.metrics()["discarded"] == 1
+    assert pool.checkout() is not conn
+
+
+if __name__ == "__main__":
+    test_reuses_connections_and_prepares_once()
+    test_waits_when_exhausted_and_times_out()
+    test_discards_broken_and_rolls_back_open_transactions()
@@ -0,0 +1,49 @@
+import uuid
+from src.common.crdt.improved.ShoppingList import ShoppingList
+
+
+def test_deltas_converge_like_full_state():
+    print("\n=== STARTING DELTA TEST ===\n")
+
+    list_id = str(uuid.uuid4())
+    alice = ShoppingList(list_id, "Delta Test List")
+    bob = ShoppingList(list_id, "Delta Test List")
+
+    # Alice edits locally and ships only the deltas to Bob
+    deltas = [
+        alice.add_item("Milk", "Alice", 3),
+        alice.add_item("Eggs", "Alice", 12),
+        alice.update_needed("Milk", 2, "Alice"),
+        alice.update_acquired("Eggs", 6, "Alice"),
+        alice.remove_item("Eggs", "Alice"),
+    ]
+
+    for delta in deltas:
+        assert len(delta.items) <= 1, "A delta must only carry the item it touched"
+        bob.merge(ShoppingList.from_json(delta.to_json()))
+
+    print(f"Alice: {alice.get_visible_items()}")
+    print(f"Bob:   {bob.get_visible_items()}")
+    assert bob.get_visible_items() == alice.get_visible_items()
+    assert bob.get_visible_items() == {"Milk": {"needed": 5, "acquired": 0}}
+
+
+def test_delta_is_idempotent_and_commutes_with_concurrent_edits():
+    list_id = str(uuid.uuid4())
+    alice = ShoppingList(list_id)
+    bob = ShoppingList(list_id)
+
+    delta_a = alice.add_item("Milk", "Alice", 3)
+    delta_b = bob.add_item("Milk", "Bob", 12)
+
+    alice.merge(delta_b)
+    alice.merge(delta_b)
+    bob.merge(delta_a)
+
+    assert alice.get_visible_items() == bob.get_visible_items()
+    assert alice.get_visible_items()["Milk"]["needed"] == 15
+
+
+if __name__ == "__main__":
+    test_deltas_converge_like_full_state()
+    test_delta_is_idempotent_and_commutes_with_concurrent_edits()
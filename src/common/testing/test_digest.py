@@ -0,0 +1,56 @@
+import json
+import uuid
+from src.common.crdt.improved.ShoppingList import ShoppingList
+from src.common.codec.binary_codec import encode_list, decode_list
+
+
+def rehashed(shop_list):
+    """Digest computed from scratch, ignoring every cached item digest."""
+    data = json.loads(shop_list.to_json())
+    for item in data["items"].values():
+        item.pop("digest", None)
+    return ShoppingList.from_dict(data).digest()
+
+
+def test_incremental_digest_matches_full_rehash():
+    print("\n=== STARTING DIGEST TEST ===\n")
+
+    sl = ShoppingList(str(uuid.uuid4()))
+    sl.add_item("Milk", "Alice", 2)
+    sl.add_item("Eggs", "Bob", 6)
+    assert sl.digest() == rehashed(sl)
+
+    sl.update_acquired("Milk", 1, "Bob")
+    sl.remove_item("Eggs", "Alice")
+    sl.add_item("Tea", "Carol")
+    assert sl.digest() == rehashed(sl)
+
+    sl.acknowledge("Alice")
+    sl.retire("Bob")
+    sl.retire("Carol")
+    assert sl.collect_garbage() == 1
+    assert sl.digest() == rehashed(sl)
+
+
+def test_merge_skips_identical_state():
+    alice = ShoppingList(str(uuid.uuid4()))
+    alice.add_item("Milk", "Alice", 2)
+    alice.add_item("Eggs", "Alice", 6)
+    alice.get_visible_items()
+
+    copy = decode_list(encode_list(alice))
+    assert copy.digest() == alice.digest()
+
+    alice.merge(copy)
+    assert not alice._dirty, "identical items must not be touched"
+
+    copy.update_needed("Eggs", 1, "Bob")
+    alice.merge(ShoppingList.from_json(copy.to_json()))
+    assert alice._dirty == {"Eggs"}
+    assert alice.get_visible_items()["Eggs"]["needed"] == 7
+    assert alice.digest() == copy.digest() == rehashed(alice)
+
+
+if __name__ == "__main__":
+    test_incremental_digest_matches_full_rehash()
+    test_merge_skips_identical_state()
@@ -0,0 +1,71 @@
+import json
+import uuid
+from src.common.crdt.improved.ShoppingList import ShoppingList
+
+
+def test_merge_remaps_actor_tables():
+    print("\n=== STARTING DOT TAG TEST ===\n")
+
+    list_id = str(uuid.uuid4())
+    alice = ShoppingList(list_id)
+    bob = ShoppingList(list_id)
+
+    # Both lists start their tables with a different actor at index 0
+    alice.add_item("Milk", "Alice", 2)
+    bob.add_item("Eggs", "Bob", 6)
+    bob.add_item("Milk", "Bob", 1)
+    assert alice.actors == ["Alice"] and bob.actors == ["Bob"]
+
+    alice.merge(ShoppingList.from_json(bob.to_json()))
+    bob.merge(ShoppingList.from_json(alice.to_json()))
+    assert alice.get_visible_items() == bob.get_visible_items()
+
+    # A remove on one side must hide the other side's tags after the merge
+    alice.remove_item("Milk", "Alice")
+    bob.merge(ShoppingList.from_json(alice.to_json()))
+    assert "Milk" not in bob.get_visible_items()
+
+    for shop_list in (alice, bob):
+        for item in shop_list.items.values():
+            for tags in item.existence.entries.values():
+                for actor, counter in tags:
+                    assert isinstance(actor, int) and isinstance(counter, int)
+
+
+def test_legacy_string_tags_are_converted():
+    list_id = str(uuid.uuid4())
+    legacy = {
+        "uuid": list_id,
+        "name": "Old List",
+        "clock": 2,
+        "version": {"Alice": 2},
+        "items": {
+            "Milk": {
+                "needed": {"positive": {"counts": {"Alice": 2}}, "negative": {"counts": {}}},
+                "acquired": {"positive": {"counts": {}}, "negative": {"counts": {}}},
+                "existence": {"elements": [["Milk", "Alice:1"]], "tombstones": [], "removed_at": {}}
+            },
+            "Eggs": {
+                "needed": {"positive": {"counts": {"Alice": 1}}, "negative": {"counts": {"Alice": 1}}},
+                "acquired": {"positive": {"counts": {}}, "negative": {"counts": {}}},
+                "existence": {"elements": [], "tombstones": [["Eggs", "Alice:0"]], "removed_at": {"Alice:0": ["Alice", 2]}}
+            }
+        }
+    }
+
+    sl = ShoppingList.from_dict(legacy)
+    assert sl.actors == ["Alice"]
+    assert sl.items["Milk"].existence.entries == {"Milk": {(0, 1)}}
+    assert sl.items["Eggs"].existence.removed_at == {(0, 0): [0, 2]}
+    assert sl.get_visible_items() == {"Milk": {"needed": 2, "acquired": 0}}
+
+    # The converted list still merges with a list using dot tags
+    bob = ShoppingList(list_id)
+    bob.add_item("Bread", "Bob")
+    bob.merge(ShoppingList.from_json(json.dumps(legacy)))
+    assert set(bob.get_visible_items()) == {"Milk", "Bread"}
+
+
+if __name__ == "__main__":
+    test_merge_remaps_actor_tables()
+    test_legacy_string_tags_are_converted()
@@ -0,0 +1,79 @@
+import hashlib
+import uuid
+from src.common.hashRing.hash_ring import HashRing, RingCache
+
+
+class Node:
+    def __init__(self, port):
+        self.port = port
+        self.hash = hashlib.sha256(f"server_{port}".encode()).hexdigest()
+
+
+def sorted_scan(servers, key):
+    """Placement as the communicators computed it before the ring."""
+    key_hash = hashlib.sha256(key.encode()).hexdigest()
+    ordered = sorted(servers, key=lambda s: s.hash)
+    start = next((i for i, s in enumerate(ordered) if key_hash <= s.hash), 0)
+    return [ordered[(start + offset) % len(ordered)] for offset in range(len(ordered))]
+
+
+def test_single_token_matches_sorted_scan():
+    print("\n=== STARTING HASH RING TEST ===\n")
+    servers = [Node(5555 + i) for i in range(6)]
+    ring = HashRing(servers, vnodes=1)
+    for _ in range(200):
+        key = str(uuid.uuid4())
+        assert ring.preference_list(key) == sorted_scan(servers, key)
+        assert ring.lookup(key) is sorted_scan(servers, key)[0]
+
+
+def test_preference_list_has_distinct_servers():
+    servers = [Node(5555 + i) for i in range(5)]
+    ring = HashRing(servers, vnodes=32)
+    for _ in range(200):
+        key = str(uuid.uuid4())
+        preference = ring.preference_list(key)
+        assert len(preference) == 5
+        assert len({node.port for node in preference}) == 5
+        assert ring.preference_list(key, 3) == preference[:3]
+
+    assert HashRing([]).preference_list("x") == []
+    assert HashRing([]).lookup("x") is None
+
+
+def test_cache_rebuilds_on_version_change():
+    servers = [Node(5555), Node(5556)]
+    cache = RingCache(vnodes=4)
+    ring = cache.get(1, servers)
+    assert cache.get(1, servers) is ring
+
+    servers.append(Node(5557))
+    assert cache.get(1, servers) is not ring
+    assert len(cache.get(2, servers)) == 3
+
+    # Same version and size, different members
+    ring = cache.get(3, servers)
+    servers[0] = Node(5558)
+    swapped = cache.get(3, servers)
+    assert swapped is not ring
+    assert {node.port for node in swapped.preference_list("x")} == {5556, 5557, 5558}
+
+
+def test_range_bounds_contain_their_keys():
+    ring = HashRing([Node(5555 + i) for i in range(4)], vnodes=8)
+    for _ in range(200):
+        key = str(uuid.uuid4())
+        low, high = ring.range_bounds(ring.token_range(key))
+        token = hashlib.sha256(key.encode()).hexdigest()
+        # The first range wraps past the top of the hash space
+        assert low < token <= high if low < high else (token > low or token <= high)
+
+    only = HashRing([Node(5555)], vnodes=1)
+    assert only.range_bounds(only.tokens[0]) == (only.tokens[0], only.tokens[0])
+
+
+if __name__ == "__main__":
+    test_single_token_matches_sorted_scan()
+    test_preference_list_has_distinct_servers()
+    test_cache_rebuilds_on_version_change()
+    test_range_bounds_contain_their_keys()
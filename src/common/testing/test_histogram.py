@@ -0,0 +1,37 @@
+import random
+from src.common.metrics.histogram import LatencyHistogram
+
+
+def test_percentiles_land_in_the_right_bucket():
+    print("\n=== STARTING HISTOGRAM TEST ===\n")
+    hist = LatencyHistogram("test")
+    assert hist.percentile(50) is None
+
+    rng = random.Random(0)
+    samples = sorted(rng.uniform(1, 100) for _ in range(1000))
+    for ms in samples:
+        hist.observe(ms)
+
+    for p in (50, 90, 99):
+        exact = samples[int(len(samples) * p / 100) - 1]
+        estimate = hist.percentile(p)
+        # One bucket is half an octave wide
+        assert exact <= estimate <= exact * 2 ** 0.5 + 1e-9
+
+    snap = hist.snapshot()
+    assert snap["count"] == 1000
+    assert snap["max_ms"] == round(samples[-1], 2)
+
+
+def test_outliers_report_the_max():
+    hist = LatencyHistogram("test")
+    for _ in range(99):
+        hist.observe(2.0)
+    hist.observe(10 ** 7)
+    assert hist.percentile(50) == 2.0
+    assert hist.percentile(100) == 10 ** 7
+
+
+if __name__ == "__main__":
+    test_percentiles_land_in_the_right_bucket()
+    test_outliers_report_the_max()
@@ -0,0 +1,81 @@
+import uuid
+from src.server.listCache import ListCache
+from src.common.crdt.improved.ShoppingList import ShoppingList
+from src.common.codec.binary_codec import JSON, BINARY, encode_list, decode_list
+
+
+def make_list(items):
+    shop_list = ShoppingList(str(uuid.uuid4()), "Groceries")
+    for item in items:
+        shop_list.add_item(item, "alice")
+    return shop_list
+
+
+def cache_list(cache, shop_list, replica_id=0, codec=JSON):
+    blob = encode_list(shop_list, codec)
+    generation = cache.generation(shop_list.uuid, replica_id)
+    return cache.put(shop_list.uuid, replica_id, shop_list, codec, blob, generation)
+
+
+def test_hits_and_encodes_other_codecs_once():
+    print("\n=== STARTING LIST CACHE HIT TEST ===\n")
+    cache = ListCache()
+    shop_list = make_list(["milk", "eggs"])
+
+    assert cache.get(shop_list.uuid, 0, JSON) is None
+    assert cache_list(cache, shop_list)
+    cached, blob = cache.get(shop_list.uuid, 0, JSON)
+    assert cached is shop_list and blob == shop_list.to_json()
+
+    _, binary = cache.get(shop_list.uuid, 0, BINARY)
+    assert sorted(decode_list(binary).items) == ["eggs", "milk"]
+    assert cache.get(shop_list.uuid, 0, BINARY)[1] is binary
+    assert cache.get(shop_list.uuid, 1, JSON) is None
+
+    metrics = cache.metrics()
+    assert (metrics["hits"], metrics["misses"]) == (3, 2)
+    assert metrics["bytes"] == 2 * len(blob) + len(binary)
+
+
+def test_evicts_least_recently_read():
+    print("\n=== STARTING LIST CACHE EVICTION TEST ===\n")
+    lists = [make_list([f"item{i}"]) for i in range(4)]
+    size = 2 * len(lists[0].to_json())
+    cache = ListCache(max_bytes=3 * size + size // 2)
+
+    for shop_list in lists[:3]:
+        assert cache_list(cache, shop_list)
+    cache.get(lists[0].uuid, 0, JSON)
+    cache_list(cache, lists[3])
+
+    assert cache.get(lists[1].uuid, 0, JSON) is None
+    assert cache.get(lists[0].uuid, 0, JSON) is not None
+    assert cache.metrics()["evictions"] == 1
+    assert cache.metrics()["bytes"] <= cache.max_bytes
+
+    # Larger than the whole budget: never cached
+    assert not cache_list(ListCache(max_bytes=10), lists[0])
+
+
+def test_write_during_read_is_not_cached_stale():
+    print("\n=== STARTING LIST CACHE INVALIDATION TEST ===\n")
+    cache = ListCache()
+    shop_list = make_list(["milk"])
+    assert cache_list(cache, shop_list)
+
+    cache.invalidate([(shop_list.uuid, 0)])
+    assert cache.get(shop_list.uuid, 0, JSON) is None
+    assert cache.metrics()["invalidations"] == 1
+
+    # A reader takes the generation, a writer commits, the reader's row is stale
+    generation = cache.generation(shop_list.uuid, 0)
+    cache.invalidate([(shop_list.uuid, 0)])
+    assert not cache.put(shop_list.uuid, 0, shop_list, JSON, shop_list.to_json(), generation)
+    assert cache.get(shop_list.uuid, 0, JSON) is None
+    assert cache_list(cache, shop_list)
+
+
+if __name__ == "__main__":
+    test_hits_and_encodes_other_codecs_once()
+    test_evicts_least_recently_read()
+    test_write_during_read_is_not_cached_stale()
@@ -0,0 +1,74 @@
+import random
+import uuid
+from src.common.crdt.improved.ShoppingList import ShoppingList
+
+CLIENTS = ["Alice", "Bob", "Carol", "Dave"]
+NAMES = ["Milk", "Eggs", "Bread", "Rice", "Tea", "Jam"]
+
+
+def random_replicas(seed, count=4):
+    rng = random.Random(seed)
+    list_id = str(uuid.uuid4())
+    replicas = [ShoppingList(list_id) for _ in range(count)]
+    for _ in range(120):
+        replica = rng.randrange(count)
+        sl = replicas[replica]
+        client_id = CLIENTS[replica]
+        name = rng.choice(NAMES)
+        op = rng.random()
+        if op < 0.4:
+            sl.add_item(name, client_id, rng.randint(1, 5))
+        elif op < 0.6:
+            sl.remove_item(name, client_id)
+        elif op < 0.8:
+            sl.update_acquired(name, 1, client_id)
+        else:
+            other = replicas[rng.randrange(count)]
+            if other is not sl:
+                sl.merge(ShoppingList.from_json(other.to_json()))
+    return replicas
+
+
+def state(sl):
+    return (
+        dict(sl.get_visible_items()),
+        {name: item.existence.entries for name, item in sl.items.items()},
+        {name: item.existence.tombstones for name, item in sl.items.items()},
+        sl.version, sl.base
+    )
+
+
+def test_merge_many_matches_pairwise_merges():
+    print("\n=== STARTING MERGE MANY TEST ===\n")
+    for seed in range(25):
+        replicas = random_replicas(seed)
+        # A duplicate replica must not change the outcome
+        replicas.append(ShoppingList.from_json(replicas[1].to_json()))
+        blobs = [replica.to_json() for replica in replicas]
+
+        pairwise = ShoppingList.from_json(blobs[0])
+        for blob in blobs[1:]:
+            pairwise.merge(ShoppingList.from_json(blob))
+
+        batched = ShoppingList.from_json(blobs[0])
+        batched.merge_many([ShoppingList.from_json(blob) for blob in blobs[1:]])
+
+        assert state(batched) == state(pairwise)
+        assert batched.digest() == pairwise.digest()
+
+
+def test_merge_many_skips_identical_replicas():
+    sl = ShoppingList(str(uuid.uuid4()))
+    sl.add_item("Milk", "Alice", 2)
+    blob = sl.to_json()
+
+    merged = ShoppingList.from_json(blob)
+    merged.get_visible_items()
+    merged.merge_many([ShoppingList.from_json(blob) for _ in range(3)])
+    assert not merged._dirty
+    assert merged.get_visible_items() == {"Milk": {"needed": 2, "acquired": 0}}
+
+
+if __name__ == "__main__":
+    test_merge_many_matches_pairwise_merges()
+    test_merge_many_skips_identical_replicas()
@@ -0,0 +1,85 @@
+import hashlib
+import random
+from src.common.merkleTree.merkle_tree import MerkleTree, MerkleIndex, fingerprint
+from src.common.hashRing.hash_ring import HashRing
+
+
+class Node:
+    def __init__(self, port):
+        self.port = port
+        self.hash = hashlib.sha256(f"server_{port}".encode()).hexdigest()
+
+
+def test_incremental_tree_matches_rebuild():
+    print("\n=== STARTING MERKLE INCREMENTAL TEST ===\n")
+    rng = random.Random(7)
+    tree = MerkleTree()
+    live = {}
+    for step in range(500):
+        list_id = f"list-{rng.randrange(60)}"
+        if rng.random() < 0.7:
+            live[list_id] = rng.getrandbits(64)
+            tree.put(list_id, live[list_id])
+        else:
+            live.pop(list_id, None)
+            tree.remove(list_id)
+
+    rebuilt = MerkleTree()
+    for list_id, value in live.items():
+        rebuilt.put(list_id, value)
+    assert tree.nodes == rebuilt.nodes
+    assert len(tree) == len(live)
+
+    for list_id in list(live):
+        tree.remove(list_id)
+    assert tree.root() == 0
+
+
+def test_fingerprint_ignores_replica_slot_and_order():
+    a = fingerprint("l1", [({"x": 2, "y": 1}, {}), ({"y": 1, "x": 2}, {})])
+    b = fingerprint("l1", [({"y": 1, "x": 2}, {})])
+    assert a == b
+    assert a != fingerprint("l1", [({"x": 3, "y": 1}, {})])
+    assert a != fingerprint("l2", [({"x": 2, "y": 1}, {})])
+
+
+def test_indexes_find_only_the_differing_lists():
+    print("\n=== STARTING MERKLE DIFF TEST ===\n")
+    ring = HashRing([Node(p) for p in (5001, 5002, 5003)])
+    left, right = MerkleIndex(), MerkleIndex()
+    left.set_ring(ring, 1)
+    right.set_ring(ring, 1)
+
+    for i in range(200):
+        left.put(f"list-{i}", 0, {"a": i})
+        right.put(f"list-{i}", 1, {"a": i})
+    right.put("list-17", 1, {"a": 17, "b": 1})
+    right.put("list-extra", 2, {"b": 4})
+
+    tokens = set(ring.tokens)
+    left_roots, right_roots = left.roots(tokens), right.roots(tokens)
+    differing = [t for t in tokens if left_roots[t] != right_roots[t]]
+    assert set(differing) == {ring.token_range("list-17"), ring.token_range("list-extra")}
+
+    found = set()
+    for token in differing:
+        leaves = left.diff_leaves(token, right.leaves(token))
+        mine = left.lists_in(token, leaves)
+        found |= {list_id for list_id, value in right.lists_in(token, leaves).items() if mine.get(list_id) != value}
+    assert found == {"list-17", "list-extra"}
+
+    # Same result after regrouping for a new ring
+    ring = HashRing([Node(p) for p in (5001, 5002, 5003, 5004)])
+    left.set_ring(ring, 2)
+    right.set_ring(ring, 2)
+    left.remove("list-17", 0)
+    right.remove("list-17", 1)
+    tokens = set(ring.tokens)
+    left_roots, right_roots = left.roots(tokens), right.roots(tokens)
+    assert [t for t in tokens if left_roots[t] != right_roots[t]] == [ring.token_range("list-extra")]
+
+
+if __name__ == "__main__":
+    test_incremental_tree_matches_rebuild()
+    test_fingerprint_ignores_replica_slot_and_order()
+    test_indexes_find_only_the_differing_lists()
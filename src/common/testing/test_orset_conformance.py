@@ -0,0 +1,89 @@
+import json
+import random
+from src.common.crdt.improved.ORSet import ORSet
+from src.common.crdt.improved.IndexedORSet import IndexedORSet
+
+ELEMENTS = ["Milk", "Eggs", "Bread", "Rice", "Tea"]
+
+
+def live(ors):
+    return {entry for entry in ors.elements if entry not in ors.tombstones}
+
+
+def wire(ors):
+    data = json.loads(json.dumps(ors.to_dict()))
+    return (
+        {tuple(x) for x in data["elements"]} - {tuple(x) for x in data["tombstones"]},
+        {tuple(x) for x in data["tombstones"]},
+        sorted(json.dumps(pair) for pair in data["removed_at"])
+    )
+
+
+def run_random_history(seed, use_seen):
+    rng = random.Random(seed)
+    reference = [ORSet() for _ in range(3)]
+    indexed = [IndexedORSet() for _ in range(3)]
+    counters = [0, 0, 0]
+
+    for _ in range(300):
+        replica = rng.randrange(3)
+        op = rng.random()
+        element = rng.choice(ELEMENTS)
+
+        if op < 0.45:
+            counters[replica] += 1
+            tag = f"r{replica}:{counters[replica]}"
+            reference[replica].add(element, tag)
+            indexed[replica].add(element, tag)
+        elif op < 0.7:
+            counters[replica] += 1
+            dot = [f"r{replica}", counters[replica]]
+            reference[replica].remove(element, dot)
+            indexed[replica].remove(element, dot)
+        else:
+            other = rng.randrange(3)
+            if other == replica:
+                continue
+            self_seen = other_seen = None
+            if use_seen:
+                # Pretend each side has seen every tag of its own actor
+                self_seen = lambda tag, r=replica: tag.startswith(f"r{r}:")
+                other_seen = lambda tag, r=other: tag.startswith(f"r{r}:")
+            reference[replica].merge(reference[other], self_seen, other_seen)
+            indexed[replica].merge(indexed[other], self_seen, other_seen)
+
+        for ref, idx in zip(reference, indexed):
+            assert live(ref) == live(idx)
+            for name in ELEMENTS:
+                assert ref.contains(name) == idx.contains(name)
+
+    for ref, idx in zip(reference, indexed):
+        assert wire(ref) == wire(idx)
+        roundtrip = IndexedORSet.from_dict(json.loads(json.dumps(idx.to_dict())))
+        assert live(roundtrip) == live(idx)
+        assert roundtrip.tombstones == idx.tombstones
+
+
+def test_indexed_orset_matches_orset():
+    print("\n=== STARTING ORSET CONFORMANCE TEST ===\n")
+    for seed in range(20):
+        run_random_history(seed, use_seen=False)
+        run_random_history(seed, use_seen=True)
+
+
+def test_indexed_orset_reads_orset_wire_format():
+    ref = ORSet()
+    ref.add("Milk", "a:1")
+    ref.add("Milk", "a:2")
+    ref.remove("Milk", ["a", 3])
+    ref.add("Milk", "b:1")
+
+    idx = IndexedORSet.from_dict(json.loads(json.dumps(ref.to_dict())))
+    assert idx.contains("Milk")
+    assert idx.entries == {"Milk": {"b:1"}}
+    assert idx.removed_at == {"a:1": ["a", 3], "a:2": ["a", 3]}
+
+
+if __name__ == "__main__":
+    test_indexed_orset_matches_orset()
+    test_indexed_orset_reads_orset_wire_format()
@@ -0,0 +1,180 @@
+import asyncio
+import threading
+import time
+import zmq
+import zmq.asyncio
+from src.server.peerPool import PeerPool, AsyncPeerPool
+
+
+def start_echo_router(context, port, delays):
+    # Replies to the n-th request after delays[n] ms, echoing the routing envelope
+    router = context.socket(zmq.ROUTER)
+    router.setsockopt(zmq.LINGER, 0)
+    router.bind(f"tcp://*:{port}")
+
+    def serve():
+        for delay in delays:
+            frames = router.recv_multipart()
+            if delay:
+                time.sleep(delay / 1000)
+            router.send_multipart(frames[:-1] + [b"ack:" + frames[-1]])
+        router.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_reuses_one_socket_per_peer():
+    print("\n=== STARTING PEER POOL REUSE TEST ===\n")
+    context = zmq.Context()
+    pool = PeerPool(context)
+    thread = start_echo_router(context, 5791, [0, 0, 0])
+
+    for i in range(3):
+        assert pool.request(5791, f"m{i}".encode(), 2000) == f"ack:m{i}".encode()
+
+    metrics = pool.metrics()
+    assert metrics["connects"] == 1
+    assert metrics["peers"]["5791"]["replies"] == 3
+
+    thread.join(2)
+    pool.close()
+    context.term()
+
+
+def test_late_reply_is_not_taken_for_the_next_one():
+    print("\n=== STARTING PEER POOL STALE REPLY TEST ===\n")
+    context = zmq.Context()
+    pool = PeerPool(context)
+    thread = start_echo_router(context, 5792, [300, 0])
+
+    assert pool.request(5792, b"slow", 100) is None
+    assert pool.request(5792, b"fast", 2000) == b"ack:fast"
+    assert pool.metrics()["peers"]["5792"]["stale_replies"] == 1
+
+    thread.join(2)
+    pool.close()
+    context.term()
+
+
+def test_evicts_after_repeated_failures():
+    print("\n=== STARTING PEER POOL EVICTION TEST ===\n")
+    context = zmq.Context()
+    pool = PeerPool(context, max_failures=2)
+
+    assert pool.request(5793, b"nobody", 50) is None
+    assert "5793" in pool.metrics()["peers"]
+    assert pool.request(5793, b"nobody", 50) is None
+    assert "5793" not in pool.metrics()["peers"]
+    assert pool.metrics()["evictions"] == 1
+
+    pool.close()
+    context.term()
+
+
+def test_down_peer_fails_fast_until_cooldown():
+    print("\n=== STARTING PEER POOL COOLDOWN TEST ===\n")
+    context = zmq.Context()
+    pool = PeerPool(context, max_failures=1, cooldown=0.3)
+
+    assert pool.request(5795, b"nobody", 50) is None
+    start = time.monotonic()
+    assert pool.request(5795, b"nobody", 1000) is None
+    assert time.monotonic() - start < 0.05
+    assert pool.metrics()["skipped"] == 1
+
+    # After the cooldown a single failed probe marks it down again
+    time.sleep(0.35)
+    pool.max_failures = 3
+    assert pool.request(5795, b"nobody", 50) is None
+    assert pool.is_down(5795)
+
+    pool.close()
+    context.term()
+
+def test_requests_to_one_peer_run_concurrently():
+    print("\n=== STARTING PEER POOL CONCURRENCY TEST ===\n")
+    context = zmq.Context()
+    pool = PeerPool(context)
+    router = context.socket(zmq.ROUTER)
+    router.setsockopt(zmq.LINGER, 0)
+    router.bind("tcp://*:5796")
+
+    def serve():
+        # Answers the second request at once and the first one 300 ms later
+        slow = router.recv_multipart()
+        fast = router.recv_multipart()
+        router.send_multipart(fast[:-1] + [b"ack:" + fast[-1]])
+        router.recv_multipart()  # the fire-and-forget send
+        time.sleep(0.3)
+        router.send_multipart(slow[:-1] + [b"ack:" + slow[-1]])
+
+    server = threading.Thread(target=serve, daemon=True)
+    server.start()
+    replies = {}
+    slow = threading.Thread(target=lambda: replies.update(slow=pool.request(5796, b"slow", 2000)))
+    slow.start()
+    time.sleep(0.05)
+
+    start = time.monotonic()
+    assert pool.request(5796, b"fast", 2000) == b"ack:fast"
+    assert pool.send(5796, b"gossip")
+    assert time.monotonic() - start < 0.2
+
+    slow.join(2)
+    assert replies["slow"] == b"ack:slow"
+    assert pool.metrics()["peers"]["5796"]["replies"] == 2
+
+    server.join(2)
+    pool.close()
+    router.close()
+    context.term()
+
+
+def test_async_pool_matches_out_of_order_replies():
+    print("\n=== STARTING ASYNC PEER POOL TEST ===\n")
+    # The router answers all three requests in reverse order
+    router_context = zmq.Context()
+    router = router_context.socket(zmq.ROUTER)
+    router.setsockopt(zmq.LINGER, 0)
+    router.bind("tcp://*:5794")
+
+    def serve():
+        received = [router.recv_multipart() for _ in range(3)]
+        for frames in reversed(received):
+            router.send_multipart(frames[:-1] + [b"ack:" + frames[-1]])
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+
+    async def run():
+        context = zmq.asyncio.Context()
+        pool = AsyncPeerPool(context)
+        replies = await asyncio.gather(
+            pool.request(5794, b"a", 2000),
+            pool.request(5794, b"b", 2000),
+            pool.request(5794, b"c", 2000),
+        )
+        metrics = pool.metrics()
+        pool.close()
+        context.destroy(linger=0)
+        return replies, metrics
+
+    replies, metrics = asyncio.run(run())
+    assert replies == [b"ack:a", b"ack:b", b"ack:c"]
+    assert metrics["connects"] == 1
+    assert metrics["peers"]["5794"]["replies"] == 3
+
+    thread.join(2)
+    router.close()
+    router_context.term()
+
+
+if __name__ == "__main__":
+    test_reuses_one_socket_per_peer()
+    test_late_reply_is_not_taken_for_the_next_one()
+    test_evicts_after_repeated_failures()
+    test_down_peer_fails_fast_until_cooldown()
+    test_requests_to_one_peer_run_concurrently()
+    test_async_pool_matches_out_of_order_replies()
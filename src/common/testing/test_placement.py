@@ -0,0 +1,69 @@
+import hashlib
+import random
+import uuid
+from src.common.hashRing.hash_ring import HashRing
+from src.common.hashRing.placement import PlacementIndex
+
+
+class Node:
+    def __init__(self, port):
+        self.port = str(port)
+        self.hash = hashlib.sha256(f"server_{port}".encode()).hexdigest()
+
+
+def expected_misplaced(ring, rows, port):
+    # Same rule as ServerCommunicator.get_intended_server
+    misplaced = {}
+    for (list_id, replica_id), is_replica in rows.items():
+        preference = ring.preference_list(list_id)
+        owner = preference[replica_id % len(preference)] if is_replica else preference[0]
+        if owner.port != port:
+            misplaced[(list_id, replica_id)] = owner.port
+    return misplaced
+
+
+def test_index_matches_full_scan_across_ring_changes():
+    print("\n=== STARTING PLACEMENT INDEX TEST ===\n")
+    rng = random.Random(3)
+    nodes = [Node(p) for p in (5001, 5002, 5003, 5004)]
+    index = PlacementIndex()
+    rows = {}
+
+    ring = HashRing(nodes)
+    index.set_ring(ring, 1, "5001")
+    for _ in range(400):
+        list_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        replica_id = rng.randrange(3)
+        rows[(list_id, replica_id)] = replica_id != 0
+        index.record(list_id, replica_id, replica_id != 0)
+    assert index.misplaced == expected_misplaced(ring, rows, "5001")
+
+    # A join and a departure: only the moved arcs are recomputed
+    for version, members in ((2, nodes + [Node(5005)]), (3, nodes[1:] + [Node(5005)])):
+        ring = HashRing(members)
+        index.set_ring(ring, version, "5001")
+        assert index.misplaced == expected_misplaced(ring, rows, "5001")
+        assert 0 < index.recomputed < len(rows)
+
+    for row in list(rows)[:100]:
+        del rows[row]
+        index.forget(*row)
+    assert index.misplaced == expected_misplaced(ring, rows, "5001")
+    assert index.metrics()["rows"] == len(rows)
+
+
+def test_rows_recorded_before_the_ring_are_placed_on_it():
+    index = PlacementIndex()
+    index.record("list-a", 0, False)
+    assert index.handoff_candidates() == {}
+
+    ring = HashRing([Node(5001), Node(5002)])
+    owner = ring.preference_list("list-a")[0].port
+    other = "5002" if owner == "5001" else "5001"
+    index.set_ring(ring, 1, other)
+    assert index.handoff_candidates() == {owner: [("list-a", 0)]}
+
+
+if __name__ == "__main__":
+    test_index_matches_full_scan_across_ring_changes()
+    test_rows_recorded_before_the_ring_are_placed_on_it()
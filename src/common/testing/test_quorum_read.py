@@ -0,0 +1,101 @@
+import threading
+import time
+import zmq
+from src.common.messages.messages import Message, MessageType
+from src.proxy.proxyCommunication import ProxyCommunicator, READ_TIMEOUT
+
+PORTS = ["5811", "5812", "5813", "5814"]
+
+
+def start_fake_server(context, port, delay, stop):
+    # Answers every REQUEST_FULL_LIST with its own port as the "list"
+    sock = context.socket(zmq.ROUTER)
+    sock.setsockopt(zmq.LINGER, 0)
+    sock.bind(f"tcp://*:{port}")
+
+    def serve():
+        while not stop.is_set():
+            if not sock.poll(50):
+                continue
+            frames = sock.recv_multipart()
+            time.sleep(delay)
+            reply = Message(MessageType.REQUEST_FULL_LIST_ACK, {"shopping_list": port})
+            sock.send_multipart(frames[:-1] + [reply.serialize()])
+        sock.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    return thread
+
+
+def make_proxy(hedge_reads):
+    proxy = ProxyCommunicator("5810", [], [], hedge_reads=hedge_reads)
+    for port in PORTS:
+        proxy.connect_to_server(port)
+    return proxy
+
+
+def run_servers(delays):
+    context = zmq.Context()
+    stop = threading.Event()
+    threads = [start_fake_server(context, port, delay, stop)
+               for port, delay in zip(PORTS, delays) if delay is not None]
+    return context, stop, threads
+
+
+def stop_servers(context, stop, threads):
+    stop.set()
+    for thread in threads:
+        thread.join(1)
+    context.term()
+
+
+def test_dead_server_is_replaced_after_read_timeout():
+    print("\n=== STARTING QUORUM READ TEST ===\n")
+    # One server never answers: the read still completes with two replies
+    proxy = make_proxy(hedge_reads=False)
+    preference = [s.port for s in proxy.ring().preference_list("list-a")]
+
+    delays = {port: 0 for port in PORTS}
+    delays[preference[0]] = None
+    context, stop, threads = run_servers([delays[port] for port in PORTS])
+
+    start = time.monotonic()
+    replies = proxy._read_quorum("list-a")
+    elapsed = time.monotonic() - start
+
+    assert sorted(blob for _, blob, _ in replies) == sorted(preference[1:3])
+    assert elapsed < READ_TIMEOUT / 1000 + 0.5
+
+    stop_servers(context, stop, threads)
+    proxy.context.term()
+
+
+def test_slow_read_is_hedged():
+    proxy = make_proxy(hedge_reads=True)
+    preference = [s.port for s in proxy.ring().preference_list("list-b")]
+    for _ in range(30):
+        proxy.replica_read_latency.observe(5.0)
+
+    delays = {port: 0 for port in PORTS}
+    delays[preference[1]] = 0.6
+    context, stop, threads = run_servers([delays[port] for port in PORTS])
+
+    start = time.monotonic()
+    replies = proxy._read_quorum("list-b")
+    elapsed = time.monotonic() - start
+
+    # Under load any read slower than the hedge delay may be hedged, so
+    # only check that the slow server was not waited for
+    answered = [blob for _, blob, _ in replies]
+    assert len(answered) >= 2 and preference[1] not in answered
+    assert proxy.hedged_reads >= 1
+    assert elapsed < 0.5
+
+    stop_servers(context, stop, threads)
+    proxy.context.term()
+
+
+if __name__ == "__main__":
+    test_dead_server_is_replaced_after_read_timeout()
+    test_slow_read_is_hedged()
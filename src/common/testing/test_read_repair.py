@@ -0,0 +1,143 @@
+import time
+import uuid
+from src.common.crdt.improved.ShoppingList import ShoppingList
+from src.common.codec.binary_codec import encode_list, decode_list
+from src.common.rateLimit.token_bucket import TokenBucket
+from src.proxy.proxyCommunication import ProxyCommunicator, Server
+
+
+def replicas_of(base, count):
+    blob = encode_list(base)
+    return [decode_list(blob) for _ in range(count)]
+
+
+def merged_of(replicas):
+    merged = decode_list(encode_list(replicas[0]))
+    merged.merge_many(replicas)
+    return merged
+
+
+def assert_repaired(stale, merged):
+    repair = merged.delta_for(stale)
+    stale.merge(decode_list(encode_list(repair)))
+    assert dict(stale.get_visible_items()) == dict(merged.get_visible_items())
+    assert stale.actors == merged.actors and stale.digest() == merged.digest()
+    assert merged.delta_for(stale) is None
+    return repair
+
+
+def test_delta_holds_only_changed_items():
+    print("\n=== STARTING READ REPAIR TEST ===\n")
+    base = ShoppingList(str(uuid.uuid4()), "Groceries")
+    for i in range(20):
+        base.add_item(f"item_{i}", "alice", needed_amount=2)
+    fresh, stale = replicas_of(base, 2)
+
+    fresh.update_acquired("item_3", 1, "alice")
+    fresh.add_item("item_new", "alice")
+    merged = merged_of([fresh, stale])
+
+    assert merged.delta_for(fresh) is None
+    repair = assert_repaired(stale, merged)
+    assert set(repair.items) == {"item_3", "item_new"}
+
+
+def test_removes_reach_the_stale_replica():
+    base = ShoppingList(str(uuid.uuid4()))
+    base.add_item("Milk", "alice")
+    base.add_item("Eggs", "alice")
+    fresh, stale = replicas_of(base, 2)
+
+    fresh.remove_item("Milk", "alice")
+    merged = merged_of([fresh, stale])
+    repair = assert_repaired(stale, merged)
+
+    assert set(repair.items) == {"Milk"}
+    assert "Milk" not in stale.get_visible_items()
+
+
+def test_stale_replica_with_fewer_actors():
+    base = ShoppingList(str(uuid.uuid4()))
+    base.add_item("Milk", "bob")
+    fresh, stale = replicas_of(base, 2)
+
+    # "alice" sorts before "bob", so the fresh replica's indices shift
+    fresh.add_item("Bread", "alice")
+    fresh.update_needed("Milk", 3, "alice")
+    merged = merged_of([fresh, stale])
+
+    repair = assert_repaired(stale, merged)
+    assert set(repair.items) == {"Bread", "Milk"}
+
+
+def test_both_sides_stale():
+    base = ShoppingList(str(uuid.uuid4()))
+    base.add_item("Milk", "alice")
+    left, right = replicas_of(base, 2)
+    left.add_item("Tea", "alice")
+    right.add_item("Rice", "bob")
+    merged = merged_of([left, right])
+
+    assert set(assert_repaired(left, merged).items) == {"Rice"}
+    assert set(assert_repaired(right, merged).items) == {"Tea"}
+
+
+def test_repair_after_a_gapped_delta():
+    base = ShoppingList(str(uuid.uuid4()))
+    base.add_item("Milk", "alice")
+    fresh, stale = replicas_of(base, 2)
+    fresh.add_item("Eggs", "alice")
+    jam = fresh.add_item("Jam", "alice")
+
+    # The Jam delta arrives before the Eggs one: stale holds Jam, its version does not
+    stale.merge(decode_list(encode_list(jam)))
+    assert set(stale.items) == {"Jam", "Milk"} and stale.version == {"alice": 1}
+    merged = merged_of([fresh, stale])
+
+    # The server merges its stored row into the repair it received
+    repair = decode_list(encode_list(merged.delta_for(stale)))
+    assert set(repair.items) == {"Eggs", "Jam"}
+    repair.merge(stale)
+    assert set(repair.get_visible_items()) == {"Eggs", "Jam", "Milk"}
+    assert merged.delta_for(repair) is None
+
+    fresh.merge(repair)
+    assert set(fresh.get_visible_items()) == {"Eggs", "Jam", "Milk"}
+
+
+def test_token_bucket_limits_bursts():
+    bucket = TokenBucket(rate=50, burst=3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+    time.sleep(0.05)
+    assert bucket.try_acquire()
+
+
+def test_replicas_in_sync_do_not_spend_repair_budget():
+    proxy = ProxyCommunicator("5812", [], [])
+    proxy.repair_bucket = TokenBucket(rate=0.001, burst=1)
+    submitted = []
+    proxy.thread_pool.submit = lambda *args: submitted.append(args)
+
+    base = ShoppingList(str(uuid.uuid4()))
+    base.add_item("Milk", "alice")
+    fresh, in_sync, stale = replicas_of(base, 3)
+    fresh.add_item("Tea", "alice")
+    in_sync.merge(fresh)
+    merged = merged_of([fresh, in_sync, stale])
+
+    server = Server("5813", "x")
+    proxy._schedule_repair(server, 1, merged, in_sync)
+    proxy._schedule_repair(server, 2, merged, stale)
+    assert proxy.repair_counts() == {"sent": 1, "acked": 0, "skipped": 0}
+    assert len(submitted) == 1
+    proxy.context.term()
+
+
+if __name__ == "__main__":
+    test_delta_holds_only_changed_items()
+    test_removes_reach_the_stale_replica()
+    test_stale_replica_with_fewer_actors()
+    test_both_sides_stale()
+    test_repair_after_a_gapped_delta()
+    test_token_bucket_limits_bursts()
+    test_replicas_in_sync_do_not_spend_repair_budget()
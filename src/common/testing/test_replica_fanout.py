@@ -0,0 +1,91 @@
+import uuid
+from src.server.serverCommunication import ReplicaFanout, ServerCommunicator
+from src.common.crdt.improved.ShoppingList import ShoppingList
+from src.common.codec.binary_codec import JSON, BINARY, encode_list, decode_list
+
+
+def test_quorum_settles_once():
+    print("\n=== STARTING REPLICA FANOUT TEST ===\n")
+    fanout = ReplicaFanout(["a", "b", "c", "d"], slots=2, quorum=1)
+    assert fanout.first == ["a", "b"]
+
+    # First ack settles W=1; the other slot finishing later does not
+    assert fanout.record(True)
+    assert not fanout.record(False)
+    assert fanout.acks == 1
+
+
+def test_failed_slots_take_spare_nodes_in_ring_order():
+    fanout = ReplicaFanout(["a", "b", "c", "d"], slots=2, quorum=2)
+    assert fanout.next_target() == "c"
+    assert fanout.next_target() == "d"
+    assert fanout.next_target() is None
+
+
+def test_quorum_fails_when_every_slot_is_done():
+    fanout = ReplicaFanout(["a", "b"], slots=2, quorum=2)
+    assert not fanout.record(False)
+    assert fanout.record(True)
+    assert fanout.acks < fanout.quorum
+
+
+def test_quorum_is_capped_by_ring_size():
+    fanout = ReplicaFanout(["a"], slots=2, quorum=2)
+    assert fanout.quorum == 1
+    assert fanout.record(True)
+
+
+class MergingStorage:
+    # Merges the stored row into its argument, as ShoppingListStorage.save_list does
+    def __init__(self, stored):
+        self.stored = stored
+
+    def save_list(self, shop_list, name=None, is_replica=False, replica_id=0, codec=JSON):
+        shop_list.merge(self.stored)
+        return shop_list, encode_list(shop_list, codec)
+
+
+def test_json_delta_is_replicated_as_the_delta():
+    stored = ShoppingList(str(uuid.uuid4()), "Groceries")
+    for i in range(10):
+        stored.add_item(f"item_{i}", "alice")
+    copy = decode_list(encode_list(stored, BINARY))
+    delta = copy.add_item("Tea", "bob")
+
+    server = ServerCommunicator(MergingStorage(stored), 5899, [], [])
+    sent = []
+    server.send_replica = lambda shop_list, replica_blob=None: sent.append(replica_blob)
+    server._reply = lambda route, message: None
+
+    delta_json = encode_list(delta, JSON)
+    server.handle_sent_delta([b"client"], {"delta": delta_json, "list_id": stored.uuid})
+
+    assert sent == [delta_json]
+    assert set(decode_list(sent[0]).items) == {"Tea"}
+    server.context.term()
+
+
+def test_ack_reports_a_missed_quorum():
+    stored = ShoppingList(str(uuid.uuid4()), "Groceries")
+    server = ServerCommunicator(MergingStorage(stored), 5898, [], [])
+    replies = []
+    server._reply = lambda route, message: replies.append(message.payload)
+
+    for quorum_met in (True, False):
+        server.send_replica = lambda shop_list, replica_blob=None: quorum_met
+        shop_list = ShoppingList(stored.uuid, "Groceries")
+        shop_list.add_item("Milk", "alice")
+        server.handle_sent_full_list([b"client"], {"shopping_list": encode_list(shop_list, JSON)})
+
+    assert [reply["quorum_met"] for reply in replies] == [True, False]
+    assert server.quorum_misses == 1
+    server.context.term()
+
+
+if __name__ == "__main__":
+    test_quorum_settles_once()
+    test_failed_slots_take_spare_nodes_in_ring_order()
+    test_quorum_fails_when_every_slot_is_done()
+    test_quorum_is_capped_by_ring_size()
+    test_json_delta_is_replicated_as_the_delta()
+    test_ack_reports_a_missed_quorum()
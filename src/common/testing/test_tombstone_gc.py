@@ -0,0 +1,91 @@
+import uuid
+from src.common.crdt.improved.ShoppingList import ShoppingList
+
+
+def tombstone_count(shop_list):
+    return sum(len(data["existence"].tombstones) for data in shop_list.items.values())
+
+
+def sync(*replicas):
+    """Full-state exchange where every replica acknowledges what it merged."""
+    for replica_name, shop_list in replicas:
+        for _, other in replicas:
+            if other is not shop_list:
+                shop_list.merge(ShoppingList.from_json(other.to_json()))
+        shop_list.acknowledge(replica_name)
+
+
+def test_tombstones_purged_only_after_every_replica_saw_the_remove():
+    print("\n=== STARTING TOMBSTONE GC TEST ===\n")
+
+    list_id = str(uuid.uuid4())
+    alice = ShoppingList(list_id)
+    bob = ShoppingList(list_id)
+    server = ShoppingList(list_id)
+
+    alice.add_item("Milk", "Alice", 2)
+    sync(("Alice", alice), ("Bob", bob), ("server", server))
+    sync(("Alice", alice), ("Bob", bob), ("server", server))
+
+    # Carol fetched the list but her acknowledgement never reached anyone
+    carol = ShoppingList.from_json(server.to_json())
+
+    alice.remove_item("Milk", "Alice")
+    alice.collect_garbage()
+    assert tombstone_count(alice) == 1, "Bob and the server have not seen the remove yet"
+
+    # Bob only receives the stale full state of the server
+    bob.merge(ShoppingList.from_json(server.to_json()))
+    bob.acknowledge("Bob")
+    alice.merge(ShoppingList.from_json(bob.to_json()))
+    alice.collect_garbage()
+    assert tombstone_count(alice) == 1
+
+    sync(("Alice", alice), ("Bob", bob), ("server", server))
+    sync(("Alice", alice), ("Bob", bob), ("server", server))
+    for shop_list in (alice, bob, server):
+        shop_list.collect_garbage()
+        assert tombstone_count(shop_list) == 0
+        assert "Milk" not in shop_list.get_visible_items()
+
+    # Carol's stale copy still has the element but no tombstone can bring it back
+    alice.merge(ShoppingList.from_json(carol.to_json()))
+    carol.merge(ShoppingList.from_json(bob.to_json()))
+    assert "Milk" not in alice.get_visible_items()
+    assert "Milk" not in carol.get_visible_items()
+
+
+def test_retired_replica_does_not_block_gc():
+    list_id = str(uuid.uuid4())
+    alice = ShoppingList(list_id)
+    alice.add_item("Bread", "Alice")
+    alice.acknowledge("server_5555/0")
+
+    alice.remove_item("Bread", "Alice")
+    assert alice.collect_garbage() == 0
+
+    alice.retire("server_5555/0")
+    assert alice.collect_garbage() == 1
+
+
+def test_delta_with_gap_does_not_advance_version():
+    list_id = str(uuid.uuid4())
+    alice = ShoppingList(list_id)
+    bob = ShoppingList(list_id)
+
+    alice.add_item("Milk", "Alice")
+    lost = alice.remove_item("Milk", "Alice")
+    received = alice.add_item("Eggs", "Alice")
+
+    bob.merge(received)
+    bob.acknowledge("Bob")
+    assert bob.summaries["Bob"].get("Alice", 0) == 0
+
+    bob.merge(lost)
+    assert bob.version["Alice"] == 3 and "Alice" in bob.base
+
+
+if __name__ == "__main__":
+    test_tombstones_purged_only_after_every_replica_saw_the_remove()
+    test_retired_replica_does_not_block_gc()
+    test_delta_with_gap_does_not_advance_version()
@@ -0,0 +1,68 @@
+import uuid
+from src.common.crdt.improved.ShoppingList import ShoppingList, item_changes
+
+
+def test_view_follows_mutations_and_merges():
+    print("\n=== STARTING VISIBLE VIEW TEST ===\n")
+
+    list_id = str(uuid.uuid4())
+    alice = ShoppingList(list_id)
+    bob = ShoppingList(list_id)
+
+    alice.add_item("Milk", "Alice", 2)
+    alice.add_item("Eggs", "Alice", 6)
+    view = alice.get_visible_items()
+    assert view == {"Milk": {"needed": 2, "acquired": 0}, "Eggs": {"needed": 6, "acquired": 0}}
+
+    alice.update_acquired("Milk", 1, "Alice")
+    alice.remove_item("Eggs", "Alice")
+    assert alice.get_visible_items() == {"Milk": {"needed": 2, "acquired": 1}}
+
+    bob.merge(ShoppingList.from_json(alice.to_json()))
+    bob.merge(alice.add_item("Bread", "Alice"))
+    assert bob.get_visible_items() == alice.get_visible_items()
+
+    try:
+        view["Tea"] = {"needed": 1, "acquired": 0}
+        assert False, "the view must be read-only"
+    except TypeError:
+        pass
+
+
+def test_view_matches_full_recompute():
+    sl = ShoppingList(str(uuid.uuid4()))
+    for i in range(50):
+        sl.add_item(f"item_{i}", "Alice", i + 1)
+        if i % 3 == 0:
+            sl.remove_item(f"item_{i // 2}", "Bob")
+        sl.get_visible_items()
+
+    fresh = ShoppingList.from_json(sl.to_json())
+    assert dict(sl.get_visible_items()) == dict(fresh.get_visible_items())
+
+
+
+def test_item_changes_touch_only_edited_rows():
+    print("\n=== STARTING ITEM DIFF TEST ===\n")
+    sl = ShoppingList(str(uuid.uuid4()))
+    for i in range(20):
+        sl.add_item(f"item_{i}", "Alice", 2)
+    before = sl.stored_items()
+
+    edited = ShoppingList.from_json(sl.to_json())
+    edited.update_acquired("item_3", 1, "Bob")
+    edited.update_needed("item_4", -5, "Bob")
+    edited.remove_item("item_7", "Bob")
+    edited.add_item("Tea", "Bob")
+    upserts, removed = item_changes(before, edited.stored_items())
+
+    # Negative quantities are stored as zero
+    assert sorted(upserts) == [("Tea", 1, 0), ("item_3", 2, 1), ("item_4", 0, 0)]
+    assert removed == ["item_7"]
+    assert item_changes(before, sl.stored_items()) == ([], [])
+
+
+if __name__ == "__main__":
+    test_view_follows_mutations_and_merges()
+    test_view_matches_full_recompute()
+    test_item_changes_touch_only_edited_rows()
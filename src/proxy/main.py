@@ -9,6 +9,8 @@ def main():
     parser.add_argument("--port", required=True, help="Port to run the server on")
     parser.add_argument("--servers", type=str, help="file containing known servers", default=None)
     parser.add_argument("--proxies", type=str, help="file containing known proxies", default=None)
+    parser.add_argument("--no-hedge", action="store_true", help="disable hedged reads")
+    parser.add_argument("--no-read-repair", action="store_true", help="do not push merged state back to stale replicas")
     args = parser.parse_args()
 
     filenameServer = args.servers
@@ -47,7 +49,7 @@ def main():
         print(f"[System] Known proxy: {name} at port {port}")
 
 
-    comm = ProxyCommunicator(args.port, known_server_ports, known_proxy_ports) 
+    comm = ProxyCommunicator(args.port, known_server_ports, known_proxy_ports, hedge_reads=not args.no_hedge, read_repair=not args.no_read_repair)
     comm.start()
 
 
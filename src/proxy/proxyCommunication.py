@@ -4,12 +4,26 @@ from src.common.messages.messages import Message, MessageType
 import hashlib
 import random
 import time
-from src.common.crdt.improved.ShoppingList import ShoppingList
+import threading
+from src.common.codec.binary_codec import JSON, BINARY, encode_list, decode_list, list_uuid
+from src.common.hashRing.hash_ring import RingCache
+from src.common.metrics.histogram import LatencyHistogram
+from src.common.rateLimit.token_bucket import TokenBucket
 
 GOSSIP_FANOUT = 2
 GOSSIP_INTERVAL = 0.5
 NEXT_NUMBER = 5
 SUCCESSFUL_READS = 2
+READ_TIMEOUT = 1000  # ms a server gets before the next candidate is asked
+READ_DEADLINE = 4  # s for the whole quorum read
+# Hedge a read still pending past this percentile of recent replica latency
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20
+STATS_INTERVAL = 10
+# Read repairs pushed back to stale replicas, per second and in a burst
+REPAIR_RATE = 20
+REPAIR_BURST = 40
+REPAIR_TIMEOUT = 1000  # ms
 
 class Server():
     def __init__(self, port, hash):
@@ -21,7 +35,7 @@ class Proxy():
         self.port = port
 
 class ProxyCommunicator:
-    def __init__(self, port, known_server_ports, known_proxy_ports):
+    def __init__(self, port, known_server_ports, known_proxy_ports, hedge_reads=True, read_repair=True):
         self.port = port
         
         self.known_server_ports = known_server_ports
@@ -36,7 +50,19 @@ class ProxyCommunicator:
         self.proxy_publish_socket = None
         self.proxies = []
         self.servers = []
-        self.hash_ring_version = 1 
+        self.hash_ring_version = 1
+        self.ring_cache = RingCache()
+
+        self.hedge_reads = hedge_reads
+        self.hedged_reads = 0
+        # Counters below are bumped from the read handlers and the repair threads
+        self.stats_lock = threading.Lock()
+        self.read_latency = LatencyHistogram("read")
+        self.replica_read_latency = LatencyHistogram("replica_read")
+
+        self.read_repair = read_repair
+        self.repair_bucket = TokenBucket(REPAIR_RATE, REPAIR_BURST)
+        self.repairs = {"sent": 0, "acked": 0, "skipped": 0}
 
     def start(self):
         print(f"[ProxyCommunicator] Starting proxy on port {self.port}")
@@ -63,11 +89,16 @@ class ProxyCommunicator:
 
     def gossip_loop(self):
         print("[Gossip] Loop started.")
+        last_stats = time.monotonic()
         while self.running:
             try:
                 # (Peer Discovery) + (Registration)
                 self.gossip()
 
+                if time.monotonic() - last_stats >= STATS_INTERVAL:
+                    last_stats = time.monotonic()
+                    self.print_stats()
+
                 time.sleep(GOSSIP_INTERVAL)
             except Exception as e:
                 print(f"[Gossip] Error in loop: {e}")
@@ -114,6 +145,15 @@ class ProxyCommunicator:
             except Exception as e:
                 print(f"[Gossip] Failed to send to {node.port}: {e}")
 
+    def print_stats(self):
+        read = self.read_latency.snapshot()
+        if read["count"]:
+            print(f"[Stats] read p50={read['p50_ms']:.1f}ms p99={read['p99_ms']:.1f}ms "
+                  f"(n={read['count']}, hedged={self.hedged_reads}) | {self.replica_read_latency} | repairs {self.repair_counts()}")
+
+    def ring(self):
+        return self.ring_cache.get(self.hash_ring_version, self.servers)
+
     def connect_to_server(self, port, hash_val=None):
         if any(str(s.port) == str(port) for s in self.servers):
             return
@@ -253,15 +293,18 @@ class ProxyCommunicator:
                 self.thread_pool.submit(self.handle_request_full_list, identity, message.payload)
             case MessageType.SENT_FULL_LIST:
                 self.thread_pool.submit(self.handle_sent_full_list, identity, message.payload)
+            case MessageType.SENT_DELTA:
+                self.thread_pool.submit(self.handle_sent_delta, identity, message.payload)
             case _:
                 print(f"[Network] Unknown message type: {message.msg_type}")
 
 
-    def _try_send_full_list_to_server(self, server, shopping_list_obj, retries=3, base_timeout=1000):
+    def _try_send_full_list_to_server(self, server, list_id, shopping_list, retries=3, base_timeout=1000):
+        # shopping_list is the encoded blob received from the client
         message = Message(
             msg_type=MessageType.SENT_FULL_LIST,
             payload={
-                "shopping_list": shopping_list_obj.to_json()
+                "shopping_list": shopping_list
             }
         )
 
@@ -277,7 +320,7 @@ class ProxyCommunicator:
 
         for attempt in range(1, retries + 1):
             print(
-                f"[Proxy] Sending FULL_LIST {shopping_list_obj.to_json()} → server {server.port} "
+                f"[Proxy] Sending FULL_LIST {list_id} → server {server.port} "
                 f"(attempt {attempt}/{retries})"
             )
 
@@ -306,63 +349,48 @@ class ProxyCommunicator:
 
     def handle_sent_full_list(self, identity, payload):
         shopping_list = payload.get("shopping_list")
-        shopping_list_obj = ShoppingList.from_json(shopping_list)
+        # Only the uuid is needed for routing, the list is forwarded as-is
+        list_id = list_uuid(shopping_list)
         print(
-            f"[Proxy] Received FULL_LIST {shopping_list_obj.uuid} from client {identity}"
+            f"[Proxy] Received FULL_LIST {list_id} from client {identity}"
         )
 
         if not self.servers:
             print("[Proxy] No servers available")
             return
 
-        key_hash = hashlib.sha256(shopping_list_obj.uuid.encode()).hexdigest()
-
-        # Sort servers by hash ONLY for this request
-        servers = sorted(self.servers, key=lambda s: s.hash)
-
-        # Find first server clockwise on the ring
-        start_index = None
-        for i, server in enumerate(servers):
-            if key_hash <= server.hash:
-                start_index = i
-                break
-
-        if start_index is None:
-            start_index = 0  # wrap around
-
-        num_servers = len(servers)
-
-        # Walk the ring until success or full loop
-        for offset in range(num_servers):
-            server = servers[(start_index + offset) % num_servers]
-
+        # Walk the ring clockwise from the list until success or full loop
+        for server in self.ring().preference_list(list_id):
             result = self._try_send_full_list_to_server(
                 server,
-                shopping_list_obj,
+                list_id,
+                shopping_list,
             )
 
             if result:
                 print(
-                    f"[Proxy] FULL_LIST {shopping_list_obj.uuid} stored on server {server.port}"
+                    f"[Proxy] FULL_LIST {list_id} stored on server {server.port}"
                 )
 
+                # Stored on the server either way; quorum_met tells the client
+                # whether W replicas have it yet
                 message = Message(
                     msg_type=MessageType.SENT_FULL_LIST_ACK,
-                    payload={"shopping_list": result['shopping_list']}
+                    payload={"shopping_list": result['shopping_list'], "quorum_met": result.get("quorum_met", True)}
                 )
                 self.proxy_interface_socket.send_multipart(
                     [identity, message.serialize()]
                 )
 
                 self.proxy_publish_socket.send_multipart(
-                    [shopping_list_obj.uuid.encode('utf-8'), Message(
+                    [list_id.encode('utf-8'), Message(
                         msg_type=MessageType.LIST_UPDATE,
                         payload={
                             "shopping_list": result['shopping_list']
                         }
                     ).serialize()]
                 )
-                print(f"[Proxy] Sent LIST_UPDATE with UUID {shopping_list_obj.uuid}")
+                print(f"[Proxy] Sent LIST_UPDATE with UUID {list_id}")
                 return
 
             print(
@@ -370,7 +398,7 @@ class ProxyCommunicator:
             )
 
         print(
-            f"[Proxy] FAILED: FULL_LIST {shopping_list_obj.uuid} "
+            f"[Proxy] FAILED: FULL_LIST {list_id} "
             f"after full ring traversal"
         )
         # All servers failed
@@ -382,39 +410,180 @@ class ProxyCommunicator:
             [identity, nack_message.serialize()]
         )
 
-    def _try_request_full_list_from_server(self, server, list_id, retries=3, timeout=1000):
-        message = Message(
-            msg_type=MessageType.REQUEST_FULL_LIST,
-            payload={"list_id": list_id}
-        )
-
+    def _try_send_delta_to_server(self, server, message, retries=3, base_timeout=1000):
         sock = self.context.socket(zmq.DEALER)
         sock.connect(f"tcp://localhost:{server.port}")
 
-
         poller = zmq.Poller()
         poller.register(sock, zmq.POLLIN)
 
+        timeout = base_timeout
+
         for attempt in range(1, retries + 1):
+            print(f"[Proxy] Sending DELTA → server {server.port} (attempt {attempt}/{retries})")
+
             sock.send(message.serialize())
+
             socks = dict(poller.poll(timeout))
 
             if sock in socks:
                 reply = Message(json_str=sock.recv())
-                if reply.msg_type == MessageType.REQUEST_FULL_LIST_ACK:
-                    sock.close(linger=0)
-                    return reply.payload  # CRDT dict
-                elif reply.msg_type == MessageType.REQUEST_FULL_LIST_NACK:
+
+                if reply.msg_type == MessageType.SENT_DELTA_ACK:
                     sock.close(linger=0)
-                    return None
+                    print(f"[Proxy] DELTA ACK from server {server.port}")
+                    return reply.payload
+
+                print(f"[Proxy] Unexpected reply {reply.msg_type}")
+
+            else:
+                print(f"[Proxy] Timeout waiting for {server.port}")
 
             timeout = min(8000, timeout * 2)
+
         sock.close(linger=0)
         return None
 
 
+    def handle_sent_delta(self, identity, payload):
+        # The delta is forwarded as-is: routing only needs the list id,
+        # so the proxy never decodes the CRDT.
+        list_id = payload.get("list_id")
+        delta = payload.get("delta")
+        print(f"[Proxy] Received DELTA for {list_id} from client {identity}")
+
+        if not self.servers or not list_id or delta is None:
+            nack = Message(msg_type=MessageType.SENT_DELTA_NACK, payload={})
+            self.proxy_interface_socket.send_multipart([identity, nack.serialize()])
+            return
+
+        message = Message(
+            msg_type=MessageType.SENT_DELTA,
+            payload={"list_id": list_id, "delta": delta}
+        )
+
+        for server in self.ring().preference_list(list_id):
+            result = self._try_send_delta_to_server(server, message)
+            if result is not None:
+                ack = Message(msg_type=MessageType.SENT_DELTA_ACK, payload={"quorum_met": result.get("quorum_met", True)})
+                self.proxy_interface_socket.send_multipart([identity, ack.serialize()])
+
+                self.proxy_publish_socket.send_multipart(
+                    [list_id.encode('utf-8'), Message(
+                        msg_type=MessageType.LIST_UPDATE,
+                        payload={"shopping_list": delta}
+                    ).serialize()]
+                )
+                print(f"[Proxy] Sent LIST_UPDATE (delta) with UUID {list_id}")
+                return
+
+            print(f"[Proxy] Server {server.port} failed, trying next")
+
+        print(f"[Proxy] FAILED: DELTA {list_id} after full ring traversal")
+        nack = Message(msg_type=MessageType.SENT_DELTA_NACK, payload={})
+        self.proxy_interface_socket.send_multipart([identity, nack.serialize()])
+
+    def _hedge_delay(self):
+        """Seconds after which a pending read is hedged, None while off or warming up."""
+        if not self.hedge_reads or self.replica_read_latency.count < HEDGE_MIN_SAMPLES:
+            return None
+        return self.replica_read_latency.percentile(HEDGE_PERCENTILE) / 1000
+
+    def _read_quorum(self, list_id, codec=JSON):
+        """
+        Asks the preference list for a list concurrently and returns the
+        (server, blob, replicaID) replies as soon as SUCCESSFUL_READS have
+        arrived.
+
+        The first SUCCESSFUL_READS candidates are asked at once. A NACK, or
+        no reply within READ_TIMEOUT, brings in the next candidate (up to
+        NEXT_NUMBER in total). With hedging on, a read still pending after
+        the HEDGE_PERCENTILE of recent replica latency also gets one extra
+        candidate asked next to it; whichever answers first counts.
+        """
+        candidates = self.ring().preference_list(list_id)[:NEXT_NUMBER]
+        serialized_msg = Message(
+            msg_type=MessageType.REQUEST_FULL_LIST,
+            payload={"list_id": list_id, "codec": codec}
+        ).serialize()
+
+        poller = zmq.Poller()
+        pending = {}  # socket -> [server, sent_at, hedged]
+        replies = []
+        asked = 0
+
+        def ask_next():
+            nonlocal asked
+            if asked >= len(candidates):
+                return False
+            server = candidates[asked]
+            asked += 1
+            sock = self.context.socket(zmq.DEALER)
+            sock.setsockopt(zmq.LINGER, 0)
+            sock.connect(f"tcp://localhost:{server.port}")
+            sock.send(serialized_msg)
+            poller.register(sock, zmq.POLLIN)
+            pending[sock] = [server, time.monotonic(), False]
+            return True
+
+        def drop(sock):
+            poller.unregister(sock)
+            sock.close(linger=0)
+            return pending.pop(sock)
+
+        for _ in range(SUCCESSFUL_READS):
+            ask_next()
+
+        deadline = time.monotonic() + READ_DEADLINE
+        hedge_delay = self._hedge_delay()
+
+        while pending and len(replies) < SUCCESSFUL_READS:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+
+            # Sleep until a reply, a hedge or a per-server timeout is due
+            wake = deadline
+            for _, sent_at, hedged in pending.values():
+                wake = min(wake, sent_at + READ_TIMEOUT / 1000)
+                if hedge_delay is not None and not hedged and asked < len(candidates):
+                    wake = min(wake, sent_at + hedge_delay)
+            events = dict(poller.poll(max(0, (wake - now) * 1000)))
+
+            for sock in events:
+                raw = sock.recv()
+                server, sent_at, _ = drop(sock)
+                reply = Message(json_str=raw)
+                if reply.msg_type == MessageType.REQUEST_FULL_LIST_ACK:
+                    self.replica_read_latency.observe((time.monotonic() - sent_at) * 1000)
+                    print(f"[Proxy] Received full list from server {server.port}")
+                    replies.append((server, reply.payload["shopping_list"], reply.payload.get("replicaID", 0)))
+                else:
+                    print(f"[Proxy] Server {server.port} has no list {list_id}")
+                    ask_next()
+
+            now = time.monotonic()
+            for sock, state in list(pending.items()):
+                server, sent_at, hedged = state
+                if now - sent_at >= READ_TIMEOUT / 1000:
+                    print(f"[Proxy] Timeout waiting for {server.port}, trying next")
+                    drop(sock)
+                    ask_next()
+                elif hedge_delay is not None and not hedged and now - sent_at >= hedge_delay:
+                    state[2] = True
+                    if ask_next():
+                        with self.stats_lock:
+                            self.hedged_reads += 1
+                        print(f"[Proxy] Read from {server.port} is slow, hedging")
+
+        for sock in list(pending):
+            drop(sock)
+        return replies
+
+
     def handle_request_full_list(self, identity, payload):
         list_id = payload.get("list_id")
+        codec = payload.get("codec", JSON)
         if not list_id:
             print("[Proxy] Missing list_id in request")
             return
@@ -427,54 +596,29 @@ class ProxyCommunicator:
             self.proxy_interface_socket.send_multipart([identity, nack.serialize()])
             return
 
-        # Calculate hash for primary server position
-        key_hash = hashlib.sha256(list_id.encode()).hexdigest()
-        servers = sorted(self.servers, key=lambda s: s.hash)
-        start_index = next((i for i, s in enumerate(servers) if key_hash <= s.hash), 0)
-        num_servers = len(servers)
-
-        collected_crdts = []
-        servers_tried = 0
-        successful = 0
+        start = time.monotonic()
+        replies = self._read_quorum(list_id, codec)
 
-        # Try up to NEXT_NUMBER servers
-        for offset in range(num_servers):
-            if servers_tried >= NEXT_NUMBER:
-                break
-            if successful >= SUCCESSFUL_READS:
-                break
-
-            server = servers[(start_index + offset) % num_servers]
-            servers_tried += 1
-
-            crdt_payload = self._try_request_full_list_from_server(server, list_id)
-
-            crdt_payload = crdt_payload.get("shopping_list") if crdt_payload else None
-            if crdt_payload is not None:
-                print(f"[Proxy] Received full list from server {server.port}: {crdt_payload}")
-                collected_crdts.append(crdt_payload)
-                successful += 1
-            else:
-                print(f"[Proxy] Server {server.port} has no list {list_id}")
-
-        if successful < SUCCESSFUL_READS:
-            # All servers failed → send NACK to client
+        if len(replies) < SUCCESSFUL_READS:
+            # Not enough replicas answered → send NACK to client
             nack = Message(msg_type=MessageType.REQUEST_FULL_LIST_NACK, payload={})
             self.proxy_interface_socket.send_multipart([identity, nack.serialize()])
-            print(f"[Proxy] Full list {list_id} not found on any server")
+            print(f"[Proxy] Full list {list_id} not found on enough servers")
             return
 
-        # Merge all CRDTs
-        merged_list = ShoppingList.from_json(collected_crdts[0])
-        print(f"[Proxy] Initial Merged list: {merged_list}")
+        # Merge all CRDTs in one pass over their items
+        collected_crdts = [decode_list(blob) for _, blob, _ in replies]
+        stale = self._stale_replicas(collected_crdts) if self.read_repair else []
+        if stale:
+            # Keep every replica intact: they are diffed against the result
+            merged = decode_list(replies[0][1])
+            merged.merge_many(collected_crdts)
+        else:
+            merged = collected_crdts[0]
+            merged.merge_many(collected_crdts[1:])
+        print(f"[Proxy] Merged {len(collected_crdts)} replicas of list {list_id}")
 
-        for crdt in collected_crdts[1:]:
-            print(f"[Proxy] Merging with CRDT: {crdt}")
-            # Assuming ShoppingList.merge_dict exists or implement merge here
-            merged_list.merge(ShoppingList.from_json(crdt))
-            print(f"[Proxy] Merged list: {merged_list}")
-
-        merged_list = merged_list.to_json()
+        merged_list = encode_list(merged, codec)
 
         # Send ACK with merged list to client
         ack = Message(
@@ -482,8 +626,66 @@ class ProxyCommunicator:
             payload={"shopping_list": merged_list}
         )
         self.proxy_interface_socket.send_multipart([identity, ack.serialize()])
+        self.read_latency.observe((time.monotonic() - start) * 1000)
         print(f"[Proxy] Sent merged full list {list_id} to client {identity}")
 
+        for index in stale:
+            server, _, replica_id = replies[index]
+            self._schedule_repair(server, replica_id, merged, collected_crdts[index])
+
+    @staticmethod
+    def _stale_replicas(replicas):
+        """Indices of replicas missing events that another replica has."""
+        joined = {}
+        for replica in replicas:
+            for actor, counter in replica.version.items():
+                if counter > joined.get(actor, 0):
+                    joined[actor] = counter
+        return [
+            index for index, replica in enumerate(replicas)
+            if any(replica.version.get(actor, 0) < counter for actor, counter in joined.items())
+        ]
+
+    def _schedule_repair(self, server, replica_id, merged, replica):
+        repair = merged.delta_for(replica)
+        if repair is None:
+            return
+        # Over the budget the divergence is left to handoff and later reads
+        if not self.repair_bucket.try_acquire():
+            self._count_repair("skipped")
+            return
+        message = Message(
+            msg_type=MessageType.READ_REPAIR,
+            payload={"shopping_list": encode_list(repair, BINARY), "replicaID": replica_id}
+        )
+        print(f"[Proxy] Replica {server.port}/{replica_id} of {merged.uuid} is stale, "
+              f"repairing {len(repair.items)}/{len(merged.items)} items")
+        self._count_repair("sent")
+        self.thread_pool.submit(self._send_read_repair, server, message)
+
+    def _count_repair(self, outcome):
+        with self.stats_lock:
+            self.repairs[outcome] += 1
+
+    def repair_counts(self):
+        with self.stats_lock:
+            return dict(self.repairs)
+
+    def _send_read_repair(self, server, message):
+        sock = self.context.socket(zmq.DEALER)
+        sock.setsockopt(zmq.LINGER, 0)
+        sock.connect(f"tcp://localhost:{server.port}")
+        try:
+            sock.send(message.serialize())
+            if sock.poll(REPAIR_TIMEOUT):
+                reply = Message(json_str=sock.recv())
+                if reply.msg_type == MessageType.READ_REPAIR_ACK:
+                    self._count_repair("acked")
+                    return
+            print(f"[Proxy] Read repair to {server.port} not acknowledged")
+        finally:
+            sock.close(linger=0)
+
     def handle_gossip_introduction(self, identity, payload):
         incoming_servers = payload.get("servers", [])
         incoming_proxies = payload.get("proxies", [])
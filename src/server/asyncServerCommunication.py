@@ -0,0 +1,455 @@
+import asyncio
+import random
+import time
+import zmq
+import zmq.asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from src.common.messages.messages import Message, MessageType
+from src.common.codec.binary_codec import JSON, BINARY, encode_list, decode_list, codec_of
+from src.server.peerPool import AsyncPeerPool
+from src.server.serverCommunication import ServerCommunicator, ReplicaFanout, GOSSIP_INTERVAL, REPLICA_COUNT, REPLICA_CODEC, WRITE_QUORUM, QUORUM_TIMEOUT, REPLICA_TIMEOUT, ANTI_ENTROPY_INTERVAL, ANTI_ENTROPY_TIMEOUT
+
+DB_WORKERS = 16
+MAX_IN_FLIGHT = 4096
+HEARTBEAT_INTERVAL = 10
+
+
+class AsyncServerCommunicator(ServerCommunicator):
+    """
+    Same protocol as ServerCommunicator, run on one asyncio event loop.
+
+    Every message becomes a task, so replica round-trips and handoffs wait
+    on the network without holding a thread. Only Postgres calls go to a
+    bounded executor. Once MAX_IN_FLIGHT requests are being handled the
+    loop stops reading the ROUTER socket, and ZMQ queues the rest.
+    """
+    def __init__(self, storage, port, known_servers, known_proxies, db_workers=DB_WORKERS, max_in_flight=MAX_IN_FLIGHT, write_quorum=WRITE_QUORUM):
+        super().__init__(storage, port, known_servers, known_proxies, workers=0, write_quorum=write_quorum)
+        self.context.term()
+        self.context = zmq.asyncio.Context()
+        self.peers = AsyncPeerPool(self.context)
+        self.db_executor = ThreadPoolExecutor(max_workers=db_workers, thread_name_prefix="db")
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.tasks = set()
+
+    def start(self):
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        self.setup_server_interface_socket()
+        print(f"[System] Starting async server on port {self.port}...")
+        self.setup_servers()
+        self.setup_proxies()
+        self.spawn(self.gossip_loop())
+        self.spawn(self.heartbeat())
+        self.spawn(self.anti_entropy_loop())
+        await self.loop()
+
+    def setup_server_interface_socket(self):
+        self.server_interface_socket = self.context.socket(zmq.ROUTER)
+        self.server_interface_socket.bind(f"tcp://localhost:{self.port}")
+
+    def spawn(self, coro):
+        # Keep a reference, the loop only holds weak ones to running tasks
+        task = asyncio.ensure_future(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def db(self, func, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self.db_executor, partial(func, *args, **kwargs))
+
+    async def loop(self):
+        print("[System] Entering async server loop...")
+        while self.running:
+            await self.in_flight.acquire()
+            if not await self.server_interface_socket.poll(1000, zmq.POLLIN):
+                self.in_flight.release()
+                continue
+            frames = await self.server_interface_socket.recv_multipart()
+            task = self.spawn(self.handle_server_interface_socket(frames))
+            task.add_done_callback(lambda _: self.in_flight.release())
+
+        for task in list(self.tasks):
+            task.cancel()
+        self.peers.close()
+        self.context.destroy(linger=0)
+        self.db_executor.shutdown(wait=True)
+        print("[System] Server stopped.")
+
+    async def _reply(self, route, message):
+        await self.server_interface_socket.send_multipart(route + [message.serialize()])
+
+    async def handle_server_interface_socket(self, frames):
+        identity, msg_bytes = frames[:-1], frames[-1]
+        try:
+            message = Message(json_str=msg_bytes)
+            print(f"[Network] Received message from {identity}: {message.msg_type}")
+            match message.msg_type:
+                case MessageType.GOSSIP:
+                    self.handle_gossip(identity, message.payload)
+                case MessageType.GOSSIP_INTRODUCTION:
+                    self.handle_gossip_introduction(identity, message.payload)
+                case MessageType.REQUEST_FULL_LIST:
+                    await self.handle_request_full_list(identity, message.payload)
+                case MessageType.REPLICA:
+                    await self.handle_replica(identity, message.payload)
+                case MessageType.SENT_FULL_LIST:
+                    await self.handle_sent_full_list(identity, message.payload)
+                case MessageType.SENT_DELTA:
+                    await self.handle_sent_delta(identity, message.payload)
+                case MessageType.HINTED_HANDOFF:
+                    await self.handle_hinted_handoff(identity, message.payload)
+                case MessageType.REMOVE_SERVER:
+                    await self.shutdown(identity, message.payload)
+                case MessageType.GOSSIP_SERVER_REMOVAL:
+                    await self.handle_gossip_server_removal(identity, message.payload)
+                case MessageType.READ_REPAIR:
+                    await self.handle_read_repair(identity, message.payload)
+                case MessageType.MERKLE_ROOTS:
+                    await self.handle_merkle_roots(identity, message.payload)
+                case MessageType.MERKLE_PULL:
+                    await self.handle_merkle_pull(identity, message.payload)
+                case _:
+                    print(f"[Network] Unknown message type: {message.msg_type}")
+        except Exception as e:
+            print(f"[Network] Error handling message from {identity}: {e}")
+
+    # --- Background loops ---
+
+    async def gossip_loop(self):
+        print("[Gossip] Starting gossip loop...")
+        while self.running:
+            try:
+                await self.gossip()
+            except Exception as e:
+                print(f"[Gossip] Error in loop: {e}")
+            await asyncio.sleep(GOSSIP_INTERVAL)
+
+    async def gossip(self):
+        serialized_msg, targets = self.prepare_gossip()
+
+        print(f"[Gossip] Sending GOSSIP to  {[t.port for t in targets]}")
+        for node in targets:
+            try:
+                if not await self.peers.send(node.port, serialized_msg):
+                    print(f"[Gossip] Queue to {node.port} is full, skipping this round")
+            except Exception as e:
+                print(f"[Gossip] Failed to send to {node.port}: {e}")
+
+    async def heartbeat(self):
+        print("[Heartbeat] Starting heartbeat to monitor server health...")
+        while self.running:
+            try:
+                self.index_ring()
+                port_server_map = {str(s.port): s for s in self.servers}
+                for port, rows in self.storage.placement.handoff_candidates().items():
+                    server = port_server_map.get(port)
+                    if server is None:
+                        continue
+                    shop_lists = await self.db(self.load_rows, rows)
+                    if shop_lists:
+                        self.spawn(self.send_hinted_handoff(server, shop_lists))
+                print(f"[Placement] {self.storage.placement.metrics()}")
+                print(f"[DB] {self.storage.pool.metrics()}")
+                print(f"[Cache] {self.storage.cache.metrics()}")
+                print(f"[Pool] {self.peers.metrics()}")
+                print(f"[Replica] {self.replica_latency} | {self.quorum_latency} | quorum misses {self.quorum_misses}")
+            except Exception as e:
+                print(f"[Heartbeat] Error: {e}")
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    async def anti_entropy_loop(self):
+        print("[AntiEntropy] Starting anti-entropy loop...")
+        while self.running:
+            await asyncio.sleep(ANTI_ENTROPY_INTERVAL)
+            try:
+                await self.anti_entropy()
+            except Exception as e:
+                print(f"[AntiEntropy] Error: {e}")
+
+    async def anti_entropy(self):
+        peer, message = self.prepare_anti_entropy()
+        if peer is None:
+            return
+
+        reply = await self._anti_entropy_request(peer, message, MessageType.MERKLE_ROOTS_ACK)
+        if not reply or not reply.get("ranges"):
+            return
+
+        pull = Message(MessageType.MERKLE_PULL, self.merkle_pull_payload(reply["ranges"]))
+        reply = await self._anti_entropy_request(peer, pull, MessageType.MERKLE_PULL_ACK)
+        if reply:
+            stored = await self.db(self.store_pulled_lists, reply["lists"])
+            print(f"[AntiEntropy] Pulled {stored} lists from {peer.port}")
+
+    async def _anti_entropy_request(self, peer, message, expected):
+        reply_bytes = await self.peers.request(peer.port, message.serialize(), ANTI_ENTROPY_TIMEOUT)
+        if reply_bytes is None:
+            print(f"[AntiEntropy] No reply from {peer.port}")
+            return None
+        reply = Message(json_str=reply_bytes)
+        if reply.msg_type != expected:
+            print(f"[AntiEntropy] Unexpected reply {reply.msg_type}")
+            return None
+        return reply.payload
+
+    # --- Handlers ---
+
+    async def handle_request_full_list(self, identity, payload):
+        print(f"[Network] Handling REQUEST_FULL_LIST from {identity}: {payload}")
+        found = await self.db(self.storage.read_list, payload["list_id"], payload.get("codec", JSON))
+
+        if found is None:
+            print(f"[Network] No list found with ID {payload['list_id']}")
+            message = Message(msg_type=MessageType.REQUEST_FULL_LIST_NACK, payload={})
+        else:
+            full_list, shopping_list = found
+            message = Message(msg_type=MessageType.REQUEST_FULL_LIST_ACK,
+                              payload={"shopping_list": shopping_list, "replicaID": full_list.replicaID})
+
+        await self._reply(identity, message)
+        print(f"[Network] Sent {message.msg_type} to {identity}")
+
+    async def handle_read_repair(self, identity, payload):
+        repair = decode_list(payload["shopping_list"])
+        replica_id = payload.get("replicaID", 0)
+        print(f"[Network] Handling READ_REPAIR of {repair.uuid}/{replica_id} ({len(repair.items)} items) from {identity}")
+        await self.db(self.storage.save_list, repair, is_replica=replica_id != 0, replica_id=replica_id, name=repair.name)
+
+        await self._reply(identity, Message(msg_type=MessageType.READ_REPAIR_ACK, payload={}))
+
+    async def handle_merkle_roots(self, identity, payload):
+        await self._reply(identity, Message(MessageType.MERKLE_ROOTS_ACK, self.merkle_roots_reply(payload)))
+
+    async def handle_merkle_pull(self, identity, payload):
+        blobs = await self.db(self.collect_pulled_lists, payload)
+        print(f"[AntiEntropy] Sending {len(blobs)} differing lists to {identity}")
+        await self._reply(identity, Message(MessageType.MERKLE_PULL_ACK, {"lists": blobs}, codec=BINARY))
+
+    async def handle_replica(self, identity, payload):
+        print(f"[Network] Handling REPLICA from {identity}")
+        replica_list = decode_list(payload["replica_list"])
+        await self.db(self.storage.save_list, replica_list, is_replica=True,
+                      replica_id=payload["replicaID"], name=replica_list.name)
+
+        await self._reply(identity, Message(msg_type=MessageType.REPLICA_ACK, payload={}))
+        print(f"[Network] Sent REPLICA_ACK to {identity}")
+
+    async def handle_sent_full_list(self, identity, payload):
+        print(f"[Network] Handling SENT_FULL_LIST from {identity}")
+        full_list = payload["shopping_list"]
+        shopping_list = decode_list(full_list)
+
+        codec = codec_of(full_list)
+        merged_list, merged_blob = await self.db(self.storage.save_list, shopping_list, is_replica=False,
+                                                 name=shopping_list.name, replica_id=0, codec=codec)
+
+        quorum_met = self.record_quorum(await self.send_replica(merged_list, merged_blob if codec == REPLICA_CODEC else None))
+
+        ack_message = Message(msg_type=MessageType.SENT_FULL_LIST_ACK, payload={"shopping_list": merged_blob, "quorum_met": quorum_met})
+        await self._reply(identity, ack_message)
+        print(f"[Network] Sent SENT_FULL_LIST_ACK to {identity}")
+
+    async def handle_sent_delta(self, identity, payload):
+        print(f"[Network] Handling SENT_DELTA from {identity} for list {payload.get('list_id')}")
+        delta_blob = payload["delta"]
+        delta = decode_list(delta_blob)
+
+        # Replicas get the received delta bytes, save_list merged into `delta`
+        await self.db(self.storage.save_list, delta, is_replica=False, name=delta.name, replica_id=0)
+        quorum_met = self.record_quorum(await self.send_replica(delta, delta_blob))
+
+        await self._reply(identity, Message(msg_type=MessageType.SENT_DELTA_ACK, payload={"quorum_met": quorum_met}))
+        print(f"[Network] Sent SENT_DELTA_ACK to {identity}")
+
+    async def handle_hinted_handoff(self, identity, payload):
+        print(f"[Network] Handling HINTED_HANDOFF from {identity}")
+
+        entries = await self.db(self._handoff_entries, payload["main_lists"], payload["replica_lists"])
+        await self.db(self.storage.save_lists, entries)
+
+        await self._reply(identity, Message(msg_type=MessageType.HINTED_HANDOFF_ACK, payload={}))
+        print(f"[Network] Sent HINTED_HANDOFF_ACK to {identity}")
+
+    async def handle_gossip_server_removal(self, identity, payload):
+        print(f"[Network] Handling GOSSIP_SERVER_REMOVAL from {identity}")
+        port = payload["port"]
+
+        merged = await self.db(self._merge_incoming, payload["all_lists"])
+        await self.db(self.storage.save_lists, [(obj, obj.name, False, replica_id) for obj, replica_id in merged])
+
+        for s in list(self.servers) if payload.get("last", True) else []:
+            if str(s.port) == str(port):
+                s.stage_for_removal = True
+                self.hash_ring_version += 1
+                print(f"[Gossip] Server {port} removed due to GOSSIP_SERVER_REMOVAL")
+                break
+
+        await self._reply(identity, Message(msg_type=MessageType.GOSSIP_SERVER_REMOVAL_ACK, payload={}))
+        print(f"[Network] Sent GOSSIP_SERVER_REMOVAL_ACK to {identity}")
+
+    async def shutdown(self, identity, payload):
+        print("[System] Initiating graceful shutdown...")
+
+        if not self.servers:
+            print("[System] No peers available to offload data.")
+            return False
+
+        rows = []
+        messages = self.removal_messages()
+        try:
+            while True:
+                # Each step reads the next storage batch, off the event loop
+                step = await self.db(next, messages, None)
+                if step is None:
+                    break
+                serialized_msg, batch_rows = step
+                successful_recipients = await self._offload(serialized_msg)
+                if not successful_recipients:
+                    print("[Handoff] CRITICAL: Failed to offload data to any server after max attempts.")
+                    return False
+                rows += batch_rows
+        finally:
+            await self.db(messages.close)
+
+        print(f"[Handoff] Handoff complete. Data stored on: {list(successful_recipients)}")
+        await self._reply(identity, Message(msg_type=MessageType.REMOVE_SERVER_ACK, payload={}))
+
+        await self.db(self.storage.delete_lists, rows)
+
+        print("[System] Shutdown complete.")
+        self.running = False
+        return True
+
+    async def _offload(self, serialized_msg):
+        needed_acks = min(len(self.servers), 2)
+        successful_recipients = set()
+        max_total_attempts = 3
+        attempt_count = 0
+
+        while len(successful_recipients) < needed_acks and attempt_count < max_total_attempts:
+            attempt_count += 1
+            candidates = [s for s in self.servers if s.port not in successful_recipients and s.port != self.port]
+            if not candidates:
+                print("[Handoff] No more unique candidates available.")
+                break
+
+            target_server = random.choice(candidates)
+            print(f"[Handoff] Attempt {attempt_count}/{max_total_attempts}: "
+                  f"Trying to offload to {target_server.port}...")
+
+            reply_bytes = await self.peers.request(target_server.port, serialized_msg, 1500)
+            if reply_bytes is None:
+                print(f"[Handoff] TIMEOUT: No reply from {target_server.port}. Switching target...")
+                continue
+
+            reply = Message(json_str=reply_bytes)
+            if reply.msg_type == MessageType.GOSSIP_SERVER_REMOVAL_ACK:
+                print(f"[Handoff] SUCCESS: Data offloaded to {target_server.port}")
+                successful_recipients.add(target_server.port)
+            else:
+                print(f"[Handoff] Unexpected reply from {target_server.port}: {reply.msg_type}")
+
+        return successful_recipients
+
+    # --- Outgoing ---
+
+    async def send_replica(self, shop_list, replica_blob=None):
+        preference = self.ring().preference_list(shop_list.uuid)
+        fanout = ReplicaFanout(preference[1:] + preference[:1], REPLICA_COUNT, self.write_quorum)
+        if not fanout.first:
+            return self.write_quorum == 0
+
+        if replica_blob is None:
+            replica_blob = encode_list(shop_list, REPLICA_CODEC)
+
+        decided = asyncio.Event()
+        for replicaID, server in enumerate(fanout.first, start=1):
+            self.spawn(self._replicate_slot(fanout, decided, server, replica_blob, replicaID))
+
+        if fanout.quorum == 0:
+            return True
+
+        try:
+            await asyncio.wait_for(decided.wait(), QUORUM_TIMEOUT)
+        except asyncio.TimeoutError:
+            print(f"[Replica] Quorum of {fanout.quorum} not reached for {shop_list.uuid} within {QUORUM_TIMEOUT}s")
+            return False
+        return fanout.acks >= fanout.quorum
+
+    async def _replicate_slot(self, fanout, decided, server, replica_blob, replicaID):
+        ok = False
+        while server is not None and not ok:
+            ok = await self._try_send_replica_to_server(server, replica_blob, replicaID, retries=1)
+            if not ok:
+                server = fanout.next_target()
+                if server is not None:
+                    print(f"[Replica] Slot {replicaID} falling back to {server.port}")
+
+        if fanout.record(ok):
+            if fanout.acks >= fanout.quorum:
+                self.quorum_latency.observe(fanout.elapsed_ms())
+            decided.set()
+
+    async def _try_send_replica_to_server(self, server, replica_blob, replicaID, retries=3):
+        serialized_msg = Message(
+            msg_type=MessageType.REPLICA,
+            payload={"replica_list": replica_blob, "replicaID": replicaID}
+        ).serialize()
+
+        timeout = REPLICA_TIMEOUT
+        for attempt in range(1, retries + 1):
+            print(f"[Replica] Sending REPLICA ({len(replica_blob)} bytes) to {server.port} (attempt {attempt}/{retries})")
+            start = time.monotonic()
+            reply_bytes = await self.peers.request(server.port, serialized_msg, timeout)
+
+            if reply_bytes is not None:
+                reply = Message(json_str=reply_bytes)
+                if reply.msg_type == MessageType.REPLICA_ACK:
+                    self.replica_latency.observe((time.monotonic() - start) * 1000)
+                    print(f"[Replica] ACK received from {server.port}")
+                    return True
+                print(f"[Replica] Unexpected reply {reply.msg_type}")
+            else:
+                print(f"[Replica] No reply from {server.port}, retrying...")
+            timeout = min(8000, timeout * 2)
+
+        print(f"[Replica] FAILED after retries → {server.port}")
+        return False
+
+    async def send_hinted_handoff(self, server, shop_lists):
+        main_lists = []
+        replica_lists = []
+        for shop_list in shop_lists:
+            if self.storage.replica_name is not None:
+                shop_list.retire(self.storage.replica_key(shop_list.replicaID))
+            is_replica = shop_list.isReplica
+            if hasattr(shop_list, 'isReplica'):
+                delattr(shop_list, 'isReplica')
+            (replica_lists if is_replica else main_lists).append(shop_list.to_json())
+
+        serialized_msg = Message(
+            msg_type=MessageType.HINTED_HANDOFF,
+            payload={"main_lists": main_lists, "replica_lists": replica_lists}
+        ).serialize()
+
+        timeout = 1000  # ms
+        for attempt in range(1, 4):
+            print(f"[Handoff] Sending HINTED_HANDOFF to {server.port} (attempt {attempt}/3)")
+            reply_bytes = await self.peers.request(server.port, serialized_msg, timeout)
+
+            if reply_bytes is not None:
+                reply = Message(json_str=reply_bytes)
+                if reply.msg_type == MessageType.HINTED_HANDOFF_ACK:
+                    print(f"[Handoff] HINTED_HANDOFF_ACK received from {server.port}")
+                    await self.db(self.storage.delete_lists, [(shop_list.uuid, shop_list.replicaID) for shop_list in shop_lists])
+                    return True
+                print(f"[Handoff] Unexpected reply: {reply.msg_type}")
+            else:
+                print(f"[Handoff] No ACK from {server.port}, retrying...")
+            timeout = min(timeout * 2, 8000)
+
+        print(f"[Handoff] FAILED to send hinted handoff to {server.port}, queueing action")
+        return False
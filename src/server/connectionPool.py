@@ -0,0 +1,118 @@
+import threading
+import time
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from src.common.metrics.histogram import LatencyHistogram
+
+POOL_SIZE = 16
+POOL_TIMEOUT = 10.0  # s a caller waits for a free connection
+
+
+class ConnectionPool:
+    """
+    Bounded pool of Postgres connections shared by the handler threads.
+
+    Connections are opened on demand up to max_size, and callers beyond
+    that wait for one to be returned. `on_connect` runs once on every new
+    connection, so per-session setup (prepared statements) is paid once
+    instead of on every call. A connection that failed with a connection
+    error is closed rather than returned to the pool.
+    """
+    def __init__(self, connect, max_size=POOL_SIZE, timeout=POOL_TIMEOUT, on_connect=None):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.on_connect = on_connect
+        self.idle = []
+        self.size = 0
+        self.closed = False
+        self.cond = threading.Condition()
+
+        self.wait_latency = LatencyHistogram("pool_wait")
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.created = 0
+        self.discarded = 0
+
+    def _open(self):
+        conn = self.connect()
+        try:
+            if self.on_connect is not None:
+                self.on_connect(conn)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def checkout(self):
+        start = time.monotonic()
+        with self.cond:
+            waited = False
+            while not self.idle and self.size >= self.max_size:
+                remaining = self.timeout - (time.monotonic() - start)
+                if self.closed or remaining <= 0:
+                    self.timeouts += 1
+                    raise TimeoutError(f"No database connection free after {self.timeout}s")
+                waited = True
+                self.cond.wait(remaining)
+
+            self.checkouts += 1
+            self.waits += waited
+            self.wait_latency.observe((time.monotonic() - start) * 1000)
+            if self.idle:
+                return self.idle.pop()
+            # Reserve the slot, the connect itself happens outside the lock
+            self.size += 1
+
+        try:
+            conn = self._open()
+        except Exception:
+            with self.cond:
+                self.size -= 1
+                self.cond.notify()
+            raise
+
+        with self.cond:
+            self.created += 1
+        return conn
+
+    def checkin(self, conn, broken=False):
+        if not broken and not conn.closed and conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+
+        with self.cond:
+            if broken or conn.closed or self.closed:
+                self.size -= 1
+                self.discarded += 1
+                if not conn.closed:
+                    conn.close()
+            else:
+                self.idle.append(conn)
+            self.cond.notify()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            for conn in self.idle:
+                conn.close()
+            self.size -= len(self.idle)
+            self.idle = []
+            self.cond.notify_all()
+
+    def metrics(self):
+        with self.cond:
+            return {
+                "size": self.size,
+                "idle": len(self.idle),
+                "in_use": self.size - len(self.idle),
+                "created": self.created,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "discarded": self.discarded,
+                "wait": self.wait_latency.snapshot()
+            }
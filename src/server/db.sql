@@ -24,4 +24,17 @@ CREATE TABLE IF NOT EXISTS ShoppingListItem (
 );
 
 CREATE INDEX IF NOT EXISTS idx_shopping_list_uuid 
-ON ShoppingListItem (shopping_list_uuid, shopping_list_replicaID);
\ No newline at end of file
+ON ShoppingListItem (shopping_list_uuid, shopping_list_replicaID);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_shopping_list_item_name
+ON ShoppingListItem (shopping_list_uuid, shopping_list_replicaID, name);
+
+-- Ring position of the list (sha256 hex of the uuid), so hash ranges can be
+-- read, counted and deleted without hashing every row in Python
+ALTER TABLE ShoppingList ADD COLUMN IF NOT EXISTS ring_token TEXT;
+
+UPDATE ShoppingList SET ring_token = encode(sha256(convert_to(uuid::text, 'UTF8')), 'hex')
+WHERE ring_token IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_shopping_list_ring_token
+ON ShoppingList (ring_token);
@@ -0,0 +1,113 @@
+import threading
+from collections import OrderedDict
+from src.common.codec.binary_codec import encode_list
+
+CACHE_BYTES = 64 * 1024 * 1024
+GENERATION_STRIPES = 64
+
+
+class ListCache:
+    """
+    Bounded LRU of decoded lists and their encodings, keyed by (uuid, replicaID).
+
+    An entry weighs the bytes of its encodings, with the decoded list counted
+    as large as its first encoding, and the least recently read entries are
+    evicted past max_bytes. Cached lists are shared by every reader and must
+    not be mutated.
+
+    Writers call invalidate() once their write committed. A reader takes
+    generation(key) before it reads the database and hands it to put(), so
+    a row read before a concurrent write is never cached after it.
+    """
+    def __init__(self, max_bytes=CACHE_BYTES, stripes=GENERATION_STRIPES):
+        self.max_bytes = max_bytes
+        # key -> [shop_list, {codec: blob}, size]
+        self.entries = OrderedDict()
+        self.size = 0
+        self.generations = [0] * stripes
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _stripe(self, key):
+        return hash(key) % len(self.generations)
+
+    def generation(self, list_id, replica_id):
+        with self.lock:
+            return self.generations[self._stripe((str(list_id), replica_id))]
+
+    def get(self, list_id, replica_id, codec):
+        """(shop_list, blob in codec), or None on a miss."""
+        key = (str(list_id), replica_id)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            shop_list, blobs = entry[0], entry[1]
+            blob = blobs.get(codec)
+
+        if blob is None:
+            # First read in this codec, encoded outside the lock
+            blob = encode_list(shop_list, codec)
+            with self.lock:
+                if self.entries.get(key) is entry and codec not in blobs:
+                    blobs[codec] = blob
+                    entry[2] += len(blob)
+                    self.size += len(blob)
+                    self._evict()
+        return shop_list, blob
+
+    def put(self, list_id, replica_id, shop_list, codec, blob, generation):
+        """Caches a list read at `generation`; False if a write invalidated it since."""
+        key = (str(list_id), replica_id)
+        size = 2 * len(blob)
+        if size > self.max_bytes:
+            return False
+
+        with self.lock:
+            if self.generations[self._stripe(key)] != generation:
+                return False
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old[2]
+            self.entries[key] = [shop_list, {codec: blob}, size]
+            self.size += size
+            self._evict()
+        return True
+
+    def invalidate(self, rows):
+        """Drops the (list_id, replica_id) rows and fails reads still in flight for them."""
+        with self.lock:
+            for list_id, replica_id in rows:
+                key = (str(list_id), replica_id)
+                self.generations[self._stripe(key)] += 1
+                entry = self.entries.pop(key, None)
+                if entry is not None:
+                    self.size -= entry[2]
+                    self.invalidations += 1
+
+    def _evict(self):
+        while self.size > self.max_bytes and self.entries:
+            _, entry = self.entries.popitem(last=False)
+            self.size -= entry[2]
+            self.evictions += 1
+
+    def metrics(self):
+        with self.lock:
+            reads = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / reads, 3) if reads else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
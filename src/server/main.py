@@ -3,8 +3,11 @@ import hashlib
 import psycopg2
 import os
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
-from src.server.serverCommunication import ServerCommunicator
+from src.server.serverCommunication import ServerCommunicator, WRITE_QUORUM
+from src.server.asyncServerCommunication import AsyncServerCommunicator, DB_WORKERS
 from src.server.storage import ShoppingListStorage
+from src.server.connectionPool import POOL_SIZE
+from src.server.listCache import CACHE_BYTES
 
 
 
@@ -42,6 +45,11 @@ def main():
     parser.add_argument("--db", required=True, help="DB Name (e.g. server_1)")
     parser.add_argument("--servers", type=str, help="file containing known servers", default=None)
     parser.add_argument("--proxies", type=str, help="file containing known proxies", default=None)
+    parser.add_argument("--async", dest="use_async", action="store_true", help="run the asyncio event loop server")
+    parser.add_argument("--write-quorum", type=int, default=WRITE_QUORUM, help="replica acks a write waits for (W)")
+    parser.add_argument("--db-workers", type=int, default=DB_WORKERS, help="database threads for the async server")
+    parser.add_argument("--db-pool", type=int, default=POOL_SIZE, help="maximum open Postgres connections")
+    parser.add_argument("--cache-mb", type=int, default=CACHE_BYTES // (1024 * 1024), help="memory for cached lists (0 disables)")
     args = parser.parse_args()
 
     clean_db_name = args.db.replace(".db", "").lower().replace("-", "_")
@@ -61,8 +69,10 @@ def main():
         "port": PG_PORT
     }
 
-    storage = ShoppingListStorage(db_config)
+    storage = ShoppingListStorage(db_config, replica_name=f"server_{args.port}", pool_size=args.db_pool,
+                                  cache_bytes=args.cache_mb * 1024 * 1024)
     storage.initialize_schema()
+    storage.load_indexes()
 
     known_servers = []
     if args.servers:
@@ -92,7 +102,10 @@ def main():
         except Exception as e:
             print(f"[Warning] Could not read known proxies file: {e}")
     
-    comm = ServerCommunicator(storage, args.port, known_servers, known_proxies)
+    if args.use_async:
+        comm = AsyncServerCommunicator(storage, args.port, known_servers, known_proxies, db_workers=args.db_workers, write_quorum=args.write_quorum)
+    else:
+        comm = ServerCommunicator(storage, args.port, known_servers, known_proxies, write_quorum=args.write_quorum)
     comm.start()
     
 
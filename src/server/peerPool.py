@@ -0,0 +1,377 @@
+import asyncio
+import collections
+import itertools
+import threading
+import time
+import zmq
+from socket import socketpair
+
+SEND_HWM = 100
+SEND_WAIT = 1.0  # s send() waits for the I/O thread to hand a message to zmq
+
+
+class PeerConnection:
+    def __init__(self, socket):
+        self.socket = socket
+        # Guards the counters; the socket itself is only used by the I/O thread
+        self.lock = threading.Lock()
+        self.closed = False
+        self.failures = 0
+        self.requests = 0
+        self.replies = 0
+        self.timeouts = 0
+        self.stale_replies = 0
+        self.dropped = 0
+        self.last_latency_ms = None
+
+
+class PendingReply:
+    """What a caller waits on: set once its message is sent (or its request answered)."""
+    __slots__ = ("conn", "event", "sent", "reply")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.event = threading.Event()
+        self.sent = None
+        self.reply = None
+
+    def finish(self, reply=None):
+        self.reply = reply
+        self.event.set()
+
+
+class PeerPool:
+    """
+    One long-lived DEALER socket per peer port.
+
+    Requests carry a request-id frame that the peer's ROUTER echoes back. A
+    single I/O thread owns every peer socket: it sends what callers queue and
+    polls all sockets at once, handing each reply to the caller waiting on
+    that request id. Any number of requests can be in flight on one peer,
+    and a late reply to a timed-out request is dropped instead of being read
+    as the answer to another. A peer that keeps timing out is evicted: its
+    socket is closed (discarding queued messages) and a fresh one is
+    connected on the next use. For `cooldown` seconds after such an eviction
+    requests to it fail at once, so callers fall back to other nodes instead
+    of waiting out its timeouts.
+    """
+    def __init__(self, context, max_failures=3, cooldown=2.0):
+        self.context = context
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        # Ports that were marked down; one more failure after the cooldown
+        # marks them down again (half-open circuit)
+        self.down_until = {}
+        self.skipped = 0
+        self.connections = {}
+        self.lock = threading.Lock()
+        self.request_ids = itertools.count(1)
+        self.connects = 0
+        self.evictions = 0
+
+        # request id -> PendingReply
+        self.pending = {}
+        # (action, conn, frames, slot) for the I/O thread, which is woken
+        # through a socket pair it polls next to the peer sockets
+        self.outbox = collections.deque()
+        self.io_thread = None
+        self.wake_in = self.wake_out = None
+
+    def _connection(self, port):
+        port = str(port)
+        with self.lock:
+            conn = self.connections.get(port)
+            if conn is None:
+                socket = self.context.socket(zmq.DEALER)
+                socket.setsockopt(zmq.LINGER, 0)
+                socket.setsockopt(zmq.SNDHWM, SEND_HWM)
+                socket.connect(f"tcp://localhost:{port}")
+                conn = self.connections[port] = PeerConnection(socket)
+                self.connects += 1
+            return conn
+
+    def _submit(self, action, conn, frames=None, slot=None):
+        with self.lock:
+            if self.io_thread is None:
+                self.wake_in, self.wake_out = socketpair()
+                self.wake_in.setblocking(False)
+                self.wake_out.setblocking(False)
+                self.io_thread = threading.Thread(target=self._io_loop, name="peer-pool", daemon=True)
+                self.io_thread.start()
+            self.outbox.append((action, conn, frames, slot))
+        try:
+            self.wake_out.send(b"\0")
+        except BlockingIOError:
+            # The pipe is full of wake-ups the thread has not read yet
+            pass
+
+    def _io_loop(self):
+        poller = zmq.Poller()
+        poller.register(self.wake_in, zmq.POLLIN)
+        sockets = {}
+        while True:
+            events = dict(poller.poll())
+            if self.wake_in.fileno() in events or self.wake_in in events:
+                try:
+                    while self.wake_in.recv(4096):
+                        pass
+                except BlockingIOError:
+                    pass
+
+            while self.outbox:
+                action, conn, frames, slot = self.outbox.popleft()
+                if action == "stop":
+                    for socket in sockets:
+                        socket.close(linger=0)
+                    return
+                if action == "evict":
+                    if conn.socket in sockets:
+                        poller.unregister(conn.socket)
+                        del sockets[conn.socket]
+                    conn.socket.close(linger=0)
+                    conn.closed = True
+                    self._fail_pending(conn)
+                    continue
+
+                sent = False
+                if not conn.closed:
+                    if conn.socket not in sockets:
+                        poller.register(conn.socket, zmq.POLLIN)
+                        sockets[conn.socket] = conn
+                    try:
+                        conn.socket.send_multipart(frames, zmq.NOBLOCK)
+                        sent = True
+                    except zmq.Again:
+                        with conn.lock:
+                            conn.dropped += 1
+                slot.sent = sent
+                if not sent or action == "send":
+                    slot.finish()
+
+            for socket, conn in list(sockets.items()):
+                if socket not in events:
+                    continue
+                while True:
+                    try:
+                        frames = socket.recv_multipart(zmq.NOBLOCK)
+                    except zmq.Again:
+                        break
+                    self._deliver(conn, frames)
+
+    def _deliver(self, conn, frames):
+        slot = None
+        if len(frames) == 2:
+            with self.lock:
+                slot = self.pending.pop(frames[0], None)
+        if slot is None:
+            with conn.lock:
+                conn.stale_replies += 1
+        else:
+            slot.finish(frames[1])
+
+    def _fail_pending(self, conn):
+        # Requests still waiting on a closed socket fail now instead of at their timeout
+        with self.lock:
+            failed = [rid for rid, slot in self.pending.items() if slot.conn is conn]
+            slots = [self.pending.pop(rid) for rid in failed]
+        for slot in slots:
+            slot.finish()
+
+    def send(self, port, message_bytes):
+        """Fire-and-forget send; False if the peer's queue is full."""
+        conn = self._connection(port)
+        slot = PendingReply(conn)
+        self._submit("send", conn, [message_bytes], slot)
+        # Only waits for the I/O thread to try the non-blocking send
+        slot.event.wait(SEND_WAIT)
+        return bool(slot.sent)
+
+    def is_down(self, port):
+        return time.monotonic() < self.down_until.get(str(port), 0)
+
+    def _failure_limit(self, port):
+        return 1 if str(port) in self.down_until else self.max_failures
+
+    def _mark_down(self, port):
+        print(f"[Pool] Peer {port} keeps failing, evicting for {self.cooldown}s")
+        self.down_until[str(port)] = time.monotonic() + self.cooldown
+        self.evict(port)
+
+    def request(self, port, message_bytes, timeout=1000):
+        """Sends a request and waits up to `timeout` ms for its reply bytes."""
+        if self.is_down(port):
+            self.skipped += 1
+            return None
+        conn = self._connection(port)
+        request_id = next(self.request_ids).to_bytes(8, 'big')
+        slot = PendingReply(conn)
+        with self.lock:
+            self.pending[request_id] = slot
+        with conn.lock:
+            conn.requests += 1
+
+        start = time.monotonic()
+        self._submit("request", conn, [request_id, message_bytes], slot)
+        slot.event.wait(timeout / 1000)
+        with self.lock:
+            self.pending.pop(request_id, None)
+        reply = slot.reply
+
+        with conn.lock:
+            if reply is not None:
+                conn.replies += 1
+                conn.failures = 0
+                conn.last_latency_ms = (time.monotonic() - start) * 1000
+            else:
+                conn.timeouts += 1
+                conn.failures += 1
+            evict = reply is None and conn.failures >= self._failure_limit(port)
+
+        if reply is not None:
+            self.down_until.pop(str(port), None)
+            return reply
+        if evict and self.connections.get(str(port)) is conn:
+            self._mark_down(port)
+        return None
+
+    def evict(self, port):
+        with self.lock:
+            conn = self.connections.pop(str(port), None)
+            if conn is not None:
+                self.evictions += 1
+            started = self.io_thread is not None
+        if conn is None:
+            return
+        if started:
+            # The socket belongs to the I/O thread, which closes it in order
+            self._submit("evict", conn)
+        else:
+            conn.socket.close(linger=0)
+
+    def close(self):
+        for port in list(self.connections):
+            self.evict(port)
+        with self.lock:
+            io_thread = self.io_thread
+        if io_thread is not None:
+            self._submit("stop", None)
+            io_thread.join()
+            self.wake_in.close()
+            self.wake_out.close()
+
+    def metrics(self):
+        peers = {}
+        with self.lock:
+            connections = dict(self.connections)
+            in_flight = len(self.pending)
+        for port, conn in connections.items():
+            peers[port] = {
+                "requests": conn.requests,
+                "replies": conn.replies,
+                "timeouts": conn.timeouts,
+                "stale_replies": conn.stale_replies,
+                "dropped": conn.dropped,
+                "last_latency_ms": conn.last_latency_ms
+            }
+        return {"connects": self.connects, "evictions": self.evictions, "skipped": self.skipped,
+                "in_flight": in_flight, "peers": peers}
+
+
+class AsyncPeerConnection(PeerConnection):
+    def __init__(self, socket):
+        super().__init__(socket)
+        self.pending = {}
+        self.reader = None
+
+
+class AsyncPeerPool(PeerPool):
+    """
+    PeerPool for a zmq.asyncio context. Any number of requests can be in
+    flight on one peer socket: a reader task per peer resolves the waiting
+    future whose request id matches each reply. Only used from the event
+    loop thread, so no locking.
+    """
+    def _connection(self, port):
+        port = str(port)
+        conn = self.connections.get(port)
+        if conn is None:
+            socket = self.context.socket(zmq.DEALER)
+            socket.setsockopt(zmq.LINGER, 0)
+            socket.setsockopt(zmq.SNDHWM, SEND_HWM)
+            socket.connect(f"tcp://localhost:{port}")
+            conn = self.connections[port] = AsyncPeerConnection(socket)
+            conn.reader = asyncio.ensure_future(self._read_replies(conn))
+            self.connects += 1
+        return conn
+
+    async def _read_replies(self, conn):
+        try:
+            while True:
+                frames = await conn.socket.recv_multipart()
+                waiter = conn.pending.pop(frames[0], None) if len(frames) == 2 else None
+                if waiter is None or waiter.done():
+                    conn.stale_replies += 1
+                else:
+                    waiter.set_result(frames[1])
+        except (asyncio.CancelledError, zmq.ZMQError):
+            pass
+
+    async def send(self, port, message_bytes):
+        """Fire-and-forget send; False if the peer's queue is full."""
+        conn = self._connection(port)
+        try:
+            await conn.socket.send(message_bytes, zmq.NOBLOCK)
+            return True
+        except zmq.Again:
+            conn.dropped += 1
+            return False
+
+    async def request(self, port, message_bytes, timeout=1000):
+        """Sends a request and waits up to `timeout` ms for its reply bytes."""
+        if self.is_down(port):
+            self.skipped += 1
+            return None
+        conn = self._connection(port)
+        request_id = next(self.request_ids).to_bytes(8, 'big')
+        conn.requests += 1
+        start = time.monotonic()
+        reply = None
+
+        try:
+            await conn.socket.send_multipart([request_id, message_bytes], zmq.NOBLOCK)
+        except zmq.Again:
+            conn.dropped += 1
+        else:
+            waiter = conn.pending[request_id] = asyncio.get_running_loop().create_future()
+            try:
+                reply = await asyncio.wait_for(waiter, timeout / 1000)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                conn.pending.pop(request_id, None)
+
+        if reply is not None:
+            conn.replies += 1
+            conn.failures = 0
+            self.down_until.pop(str(port), None)
+            conn.last_latency_ms = (time.monotonic() - start) * 1000
+            return reply
+
+        conn.timeouts += 1
+        conn.failures += 1
+        if conn.failures >= self._failure_limit(port) and self.connections.get(str(port)) is conn:
+            self._mark_down(port)
+        return None
+
+    def evict(self, port):
+        conn = self.connections.pop(str(port), None)
+        if conn is None:
+            return
+        self.evictions += 1
+        conn.reader.cancel()
+        # Requests still waiting on this socket fail now instead of at their timeout
+        for waiter in conn.pending.values():
+            if not waiter.done():
+                waiter.set_result(None)
+        conn.pending.clear()
+        conn.socket.close(linger=0)
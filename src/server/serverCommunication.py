@@ -3,13 +3,30 @@ import zmq
 from src.common.crdt.improved.ShoppingList import ShoppingList
 from src.common.messages.messages import Message, MessageType
 from src.common.threadPool.threadPool import ThreadPool
+from src.common.codec.binary_codec import JSON, BINARY, encode_list, decode_list, codec_of
+from src.common.hashRing.hash_ring import RingCache
+from src.server.peerPool import PeerPool
+from src.common.metrics.histogram import LatencyHistogram
+import threading
+from contextlib import closing
+from itertools import chain
 import time 
 import random 
 import json
 
 GOSSIP_FANOUT = 2
 REPLICA_COUNT = 2
+# Replica acks a write waits for before it is acknowledged (W)
+WRITE_QUORUM = 1
+QUORUM_TIMEOUT = 0.5  # s, keeps the ack inside the proxy's first timeout
+REPLICA_TIMEOUT = 1000  # ms per target before the slot moves down the ring
 GOSSIP_INTERVAL = 0.5
+# Replicas travel in binary; handoff keeps JSON since it carries replicaID metadata
+REPLICA_CODEC = BINARY
+ANTI_ENTROPY_INTERVAL = 30
+ANTI_ENTROPY_TIMEOUT = 2000
+# Lists one anti-entropy round may pull, the next round picks up the rest
+MAX_PULL_LISTS = 256
 
 class Server():
     def __init__(self, port, hash):
@@ -23,9 +40,44 @@ class Proxy():
         self.port = port
 
 
+class ReplicaFanout:
+    """
+    Bookkeeping for one write sent to REPLICA_COUNT replica slots at once.
+    Each slot starts on its own ring successor; a slot whose target fails
+    takes the next unused node of the preference list (sloppy quorum). That
+    node's heartbeat later hands the replica to its intended owner.
+    """
+    def __init__(self, candidates, slots, quorum):
+        self.first = candidates[:slots]
+        self.spare = candidates[slots:]
+        self.quorum = min(quorum, len(self.first))
+        self.acks = 0
+        self.finished = 0
+        self.decided = False
+        self.start = time.monotonic()
+        self.lock = threading.Lock()
+
+    def next_target(self):
+        with self.lock:
+            return self.spare.pop(0) if self.spare else None
+
+    def record(self, ok):
+        """True for the one call that settles the quorum, either way."""
+        with self.lock:
+            self.acks += ok
+            self.finished += 1
+            if self.decided:
+                return False
+            self.decided = self.acks >= self.quorum or self.finished == len(self.first)
+            return self.decided
+
+    def elapsed_ms(self):
+        return (time.monotonic() - self.start) * 1000
+
+
 
 class ServerCommunicator:
-    def __init__(self, storage, port, known_servers, known_proxies):
+    def __init__(self, storage, port, known_servers, known_proxies, workers=8, write_quorum=WRITE_QUORUM):
         self.storage = storage
         self.port = port
         self.hash = hashlib.sha256(f"server_{port}".encode()).hexdigest()
@@ -38,9 +90,20 @@ class ServerCommunicator:
         self.server_interface_socket = None
         self.servers = []
         self.proxies = []
-        self.thread_pool = ThreadPool(8)
+        self.thread_pool = ThreadPool(workers)
+        # Replica slots get their own threads so waiting on a quorum cannot
+        # starve the handlers that would answer it
+        self.replica_pool = ThreadPool(workers)
+        self.write_quorum = write_quorum
+        self.replica_latency = LatencyHistogram("replica_ack")
+        self.quorum_latency = LatencyHistogram("write_quorum")
+        self.quorum_misses = 0
+        self.quorum_lock = threading.Lock()
         self.disconnected = False
         self.hash_ring_version = 1
+        self.ring_cache = RingCache()
+        self.peers = PeerPool(self.context)
+        self.reply_lock = threading.Lock()
 
 
     def start(self): 
@@ -51,6 +114,7 @@ class ServerCommunicator:
         self.setup_proxies()
         self.thread_pool.submit(self.gossip_loop)
         self.thread_pool.submit(self.heartbeat)
+        self.thread_pool.submit(self.anti_entropy_loop)
         self.loop()
 
     def setup_server_interface_socket(self):
@@ -82,9 +146,21 @@ class ServerCommunicator:
                 print(f"[Gossip] Error in loop: {e}")
 
     def gossip(self):
+        serialized_msg, targets = self.prepare_gossip()
+
+        print(f"[Gossip] Sending GOSSIP to  {[t.port for t in targets]}")
+        for node in targets:
+            try:
+                if not self.peers.send(node.port, serialized_msg):
+                    print(f"[Gossip] Queue to {node.port} is full, skipping this round")
+            except Exception as e:
+                print(f"[Gossip] Failed to send to {node.port}: {e}")
+
+    def prepare_gossip(self):
         for server in list(self.servers):
             if server.stage_for_removal:
                 self.servers.remove(server)
+                self.peers.evict(server.port)
                 print(f"[Gossip] Server {server.port} removed from gossip list")
            
         server_ports = [str(s.port) for s in self.servers]
@@ -111,17 +187,7 @@ class ServerCommunicator:
         if self.proxies:
             targets.extend(random.sample(self.proxies, min(len(self.proxies), GOSSIP_FANOUT)))
 
-        print(f"[Gossip] Sending GOSSIP to  {[t.port for t in targets]}")
-        for node in targets:
-            try:
-                sock = self.context.socket(zmq.DEALER)
-                sock.connect(f"tcp://localhost:{node.port}")
-                if sock:
-                    sock.send(serialized_msg)
-                    time.sleep(0.1) # Good code :D
-                    sock.close(linger=0)
-            except Exception as e:
-                print(f"[Gossip] Failed to send to {node.port}: {e}")
+        return serialized_msg, targets
 
 
     def loop(self):
@@ -133,13 +199,23 @@ class ServerCommunicator:
                     if sock == self.server_interface_socket: 
                         self.handle_server_interface_socket()
 
+        self.peers.close()
         self.context.destroy()
         self.thread_pool.shutdown()
+        self.replica_pool.shutdown()
         print("[System] Server stopped.")
 
 
+    def _reply(self, route, message):
+        # Handlers run on the thread pool; the ROUTER socket is shared
+        with self.reply_lock:
+            self.server_interface_socket.send_multipart(route + [message.serialize()])
+
     def handle_server_interface_socket(self):
-        identity, msg_bytes = self.server_interface_socket.recv_multipart()
+        # Peers using the connection pool add a request-id frame that must be
+        # echoed back, so handlers get the whole envelope as `identity`
+        frames = self.server_interface_socket.recv_multipart()
+        identity, msg_bytes = frames[:-1], frames[-1]
         message = Message(json_str=msg_bytes)
         print(f"[Network] Received message from {identity}: {message.msg_type}, {message.payload}")
         match message.msg_type:
@@ -153,12 +229,20 @@ class ServerCommunicator:
                 self.thread_pool.submit(self.handle_replica, identity, message.payload)
             case MessageType.SENT_FULL_LIST:
                 self.thread_pool.submit(self.handle_sent_full_list, identity, message.payload)
+            case MessageType.SENT_DELTA:
+                self.thread_pool.submit(self.handle_sent_delta, identity, message.payload)
             case MessageType.HINTED_HANDOFF:
                 self.thread_pool.submit(self.handle_hinted_handoff, identity, message.payload)
             case MessageType.REMOVE_SERVER:
                 self.thread_pool.submit(self.shutdown, identity, message.payload)
             case MessageType.GOSSIP_SERVER_REMOVAL:
                 self.thread_pool.submit(self.handle_gossip_server_removal, identity, message.payload)
+            case MessageType.READ_REPAIR:
+                self.thread_pool.submit(self.handle_read_repair, identity, message.payload)
+            case MessageType.MERKLE_ROOTS:
+                self.thread_pool.submit(self.handle_merkle_roots, identity, message.payload)
+            case MessageType.MERKLE_PULL:
+                self.thread_pool.submit(self.handle_merkle_pull, identity, message.payload)
             case _:
                 print(f"[Network] Unknown message type: {message.msg_type}")
 
@@ -169,12 +253,10 @@ class ServerCommunicator:
         all_lists = payload["all_lists"]
         port = payload["port"]
 
-        for shop_list in all_lists:
-            obj = ShoppingList.from_json(shop_list)
-            shop_list_replica_id = json.loads(shop_list).get('replicaID', 0)
-            self.storage.save_list(obj,name=obj.name, replica_id=shop_list_replica_id)
+        self.storage.save_lists([(obj, obj.name, False, replica_id) for obj, replica_id in self._merge_incoming(all_lists)])
 
-        for s in list(self.servers):  # copy to avoid mutation issues
+        # A draining node sends its lists in batches; only the last one removes it
+        for s in list(self.servers) if payload.get("last", True) else []:  # copy to avoid mutation issues
             if str(s.port) == str(port):
                 s.stage_for_removal = True
                 self.hash_ring_version += 1
@@ -183,63 +265,96 @@ class ServerCommunicator:
 
 
         ack_message = Message(msg_type=MessageType.GOSSIP_SERVER_REMOVAL_ACK, payload={})
-        self.server_interface_socket.send_multipart([identity, ack_message.serialize()])
+        self._reply(identity, ack_message)
 
         print(f"[Network] Sent GOSSIP_SERVER_REMOVAL_ACK to {identity}")
 
+    def removal_messages(self):
+        """
+        GOSSIP_SERVER_REMOVAL messages carrying the stored lists one storage
+        batch at a time, then a last one that marks this node removed.
+        Yields (serialized message, (uuid, replicaID) rows it carries).
+        """
+        for shop_lists in self.storage.iter_list_batches():
+            # This node stops holding the lists, so tombstone GC must not wait on it
+            if self.storage.replica_name is not None:
+                for shop_list in shop_lists:
+                    shop_list.retire(self.storage.replica_key(shop_list.replicaID))
+
+            message = Message(
+                msg_type=MessageType.GOSSIP_SERVER_REMOVAL,
+                payload={
+                    "all_lists": [shop_list.to_json() for shop_list in shop_lists],
+                    "port": self.port,
+                    "last": False
+                }
+            )
+            yield message.serialize(), [(shop_list.uuid, shop_list.replicaID) for shop_list in shop_lists]
+
+        last = Message(msg_type=MessageType.GOSSIP_SERVER_REMOVAL, payload={"all_lists": [], "port": self.port, "last": True})
+        yield last.serialize(), []
+
     def shutdown(self, identity, payload):
         print("[System] Initiating graceful shutdown...")
 
-        shoppingLists = self.storage.get_all_lists()
-
-        message = Message(
-            msg_type=MessageType.GOSSIP_SERVER_REMOVAL,
-            payload={
-                "all_lists": [shop_list.to_json() for shop_list in shoppingLists],
-                "port": self.port
-            }
-        )
-        serialized_msg = message.serialize()
-
         if not self.servers:
             print("[System] No peers available to offload data.")
             return False
 
-        # 2. Configuration for the Handoff Loop
-        needed_acks = min(len(self.servers), 2)  
-        successful_recipients = set()            
-        
-        max_total_attempts = 3                  
+        # Lists leave in storage batches, so memory holds one batch and the
+        # ids of what was sent, never the whole database
+        rows = []
+        messages = self.removal_messages()
+        try:
+            for serialized_msg, batch_rows in messages:
+                successful_recipients = self._offload(serialized_msg)
+                if not successful_recipients:
+                    print("[Handoff] CRITICAL: Failed to offload data to any server after max attempts.")
+                    return False
+                rows += batch_rows
+        finally:
+            messages.close()
+
+        print(f"[Handoff] Handoff complete. Data stored on: {list(successful_recipients)}")
+        print("[Handoff] Clearing local storage...")
+
+        ack_message = Message(msg_type=MessageType.REMOVE_SERVER_ACK, payload={})
+        self._reply(identity, ack_message)
+
+        self.storage.delete_lists(rows)
+
+        print("[System] Shutdown complete.")
+        self.running = False
+
+        return True
+
+    def _offload(self, serialized_msg):
+        """Sends one removal message until up to two peers acked it; returns their ports."""
+        needed_acks = min(len(self.servers), 2)
+        successful_recipients = set()
+
+        max_total_attempts = 3
         attempt_count = 0
 
-        # 3. Dynamic Retry Loop
         while len(successful_recipients) < needed_acks and attempt_count < max_total_attempts:
             attempt_count += 1
 
             candidates = [s for s in self.servers if s.port not in successful_recipients and s.port != self.port]
-            
+
             if not candidates:
                 print("[Handoff] No more unique candidates available.")
                 break
 
             target_server = random.choice(candidates)
-            
+
             print(f"[Handoff] Attempt {attempt_count}/{max_total_attempts}: "
                   f"Trying to offload to {target_server.port}...")
 
-            s = self.context.socket(zmq.DEALER)
             try:
-                s.connect(f"tcp://localhost:{target_server.port}")
-                s.send(serialized_msg)
-                
-                print(f"[Handoff] Sent GOSSIP_SERVER_REMOVAL to {target_server.port}, awaiting ACK...")
+                print(f"[Handoff] Sending GOSSIP_SERVER_REMOVAL to {target_server.port}, awaiting ACK...")
+                reply_bytes = self.peers.request(target_server.port, serialized_msg, 1500)
 
-                poller = zmq.Poller()
-                poller.register(s, zmq.POLLIN)
-                socks = dict(poller.poll(1500))
-
-                if s in socks and socks[s] == zmq.POLLIN:
-                    reply_bytes = s.recv()
+                if reply_bytes is not None:
                     reply = Message(json_str=reply_bytes)
 
                     if reply.msg_type == MessageType.GOSSIP_SERVER_REMOVAL_ACK:
@@ -252,27 +367,8 @@ class ServerCommunicator:
 
             except Exception as e:
                 print(f"[Handoff] Socket error with {target_server.port}: {e}")
-            finally:
-                s.close()
-
-        if len(successful_recipients) > 0:
-            print(f"[Handoff] Handoff complete. Data stored on: {list(successful_recipients)}")
-            print("[Handoff] Clearing local storage...")
-
-            ack_message = Message(msg_type=MessageType.REMOVE_SERVER_ACK, payload={})
-            self.server_interface_socket.send_multipart([identity, ack_message.serialize()])
 
-
-            for shop_list in shoppingLists:
-                self.storage.delete_list(shop_list.uuid, shop_list.replicaID)
-
-            print("[System] Shutdown complete.")
-            self.running = False
-
-            return True
-        else:
-            print("[Handoff] CRITICAL: Failed to offload data to any server after max attempts.")
-            return False
+        return successful_recipients
 
     def connect_to_server(self, port, hash_val=None):
         if any(str(s.port) == str(port) for s in self.servers):
@@ -302,6 +398,7 @@ class ServerCommunicator:
         for p in list(self.proxies):
             if str(p.port) == str(port):
                 self.proxies.remove(p)
+                self.peers.evict(port)
                 print(f"[Gossip] Proxy {port} removed")
                 return
 
@@ -376,54 +473,238 @@ class ServerCommunicator:
 
         print("[Heartbeat] Starting heartbeat to monitor server health...")
         while self.running:
-            all_lists = self.storage.get_all_lists() # TODO could be more optimized 
-            lists_by_server = {}
+            self.index_ring()
             port_server_map = {str(s.port): s for s in self.servers}
-            for shop_list in all_lists: 
-                intended_server = self.get_intended_server(shop_list)
-                if intended_server.port != self.port:
-                    if intended_server.port not in lists_by_server:
-                        lists_by_server[intended_server.port] = []
-                    lists_by_server[intended_server.port].append(shop_list)
-                    print(f"[Heartbeat] replica: {shop_list.isReplica} list {shop_list.uuid} intended for server {intended_server.port}")
-
-            for server in lists_by_server:
-                if len(lists_by_server[server]) > 0:
-                    self.thread_pool.submit(self.send_hinted_handoff, port_server_map[server], lists_by_server[server])
+            for port, rows in self.storage.placement.handoff_candidates().items():
+                server = port_server_map.get(port)
+                if server is None:
+                    continue
+                shop_lists = self.load_rows(rows)
+                for shop_list in shop_lists:
+                    print(f"[Heartbeat] replica: {shop_list.isReplica} list {shop_list.uuid} intended for server {port}")
+                if shop_lists:
+                    self.thread_pool.submit(self.send_hinted_handoff, server, shop_lists)
+
+            print(f"[Placement] {self.storage.placement.metrics()}")
+            print(f"[DB] {self.storage.pool.metrics()}")
+            print(f"[Cache] {self.storage.cache.metrics()}")
+            print(f"[Pool] {self.peers.metrics()}")
+            print(f"[Replica] {self.replica_latency} | {self.quorum_latency} | quorum misses {self.quorum_misses}")
             time.sleep(10)
 
 
-    def handle_request_full_list(self, identity, payload): # TODO missing quorum logic
-        print(f"[Network] Handling REQUEST_FULL_LIST from {identity}: {payload}")
-        full_list = self.storage.get_list_by_id(payload["list_id"])
+    # --- Anti-entropy ---
+    #
+    # Every ANTI_ENTROPY_INTERVAL a server compares the Merkle roots of the
+    # token ranges it shares with one random peer. The peer answers with the
+    # leaf hashes of the ranges that differ, this server sends its
+    # fingerprints for the differing leaves, and the peer returns the lists
+    # whose fingerprint does not match. Pulling only: lists the peer lacks
+    # reach it when the peer runs its own round.
 
-        if full_list and hasattr(full_list, 'isReplica'):
-            delattr(full_list, 'isReplica')
+    def anti_entropy_loop(self):
+        print("[AntiEntropy] Starting anti-entropy loop...")
+        while self.running:
+            time.sleep(ANTI_ENTROPY_INTERVAL)
+            try:
+                self.anti_entropy()
+            except Exception as e:
+                print(f"[AntiEntropy] Error: {e}")
+
+    def anti_entropy(self):
+        peer, message = self.prepare_anti_entropy()
+        if peer is None:
+            return
+
+        reply = self._anti_entropy_request(peer, message, MessageType.MERKLE_ROOTS_ACK)
+        if not reply or not reply.get("ranges"):
+            return
+
+        pull = Message(MessageType.MERKLE_PULL, self.merkle_pull_payload(reply["ranges"]))
+        reply = self._anti_entropy_request(peer, pull, MessageType.MERKLE_PULL_ACK)
+        if reply:
+            stored = self.store_pulled_lists(reply["lists"])
+            print(f"[AntiEntropy] Pulled {stored} lists from {peer.port}")
+
+    def _anti_entropy_request(self, peer, message, expected):
+        reply_bytes = self.peers.request(peer.port, message.serialize(), ANTI_ENTROPY_TIMEOUT)
+        if reply_bytes is None:
+            print(f"[AntiEntropy] No reply from {peer.port}")
+            return None
+        reply = Message(json_str=reply_bytes)
+        if reply.msg_type != expected:
+            print(f"[AntiEntropy] Unexpected reply {reply.msg_type}")
+            return None
+        return reply.payload
+
+    def index_ring(self):
+        """Current ring, with the storage indexes moved onto it if it changed."""
+        ring = self.ring()
+        key = (self.hash_ring_version, len(self.servers))
+        self.storage.merkle.set_ring(ring, key)
+        self.storage.placement.set_ring(ring, key, self.port)
+        return ring
+
+    def shared_ranges(self, ring, port):
+        count = REPLICA_COUNT + 1
+        return ring.replica_ranges(self.port, count) & ring.replica_ranges(port, count)
+
+    def prepare_anti_entropy(self):
+        peers = [s for s in self.servers if str(s.port) != str(self.port) and not s.stage_for_removal]
+        if not peers:
+            return None, None
+        peer = random.choice(peers)
+
+        ranges = self.shared_ranges(self.index_ring(), peer.port)
+        if not ranges:
+            return None, None
 
-        shopping_list = full_list.to_json() if full_list else None
+        payload = {
+            "hash_ring_version": self.hash_ring_version,
+            "roots": self.storage.merkle.roots(ranges)
+        }
+        return peer, Message(MessageType.MERKLE_ROOTS, payload)
+
+    def merkle_roots_reply(self, payload):
+        """Leaf hashes of the ranges whose root differs from the sender's."""
+        # Ranges only line up when both sides hash on the same ring
+        if payload.get("hash_ring_version") != self.hash_ring_version:
+            return {"ranges": {}}
+
+        self.index_ring()
+        roots = payload["roots"]
+        mine = self.storage.merkle.roots(roots)
+        return {"ranges": {
+            token: self.storage.merkle.leaves(token)
+            for token, root in roots.items() if mine[token] != root
+        }}
+
+    def merkle_pull_payload(self, ranges):
+        merkle = self.storage.merkle
+        pull = {}
+        for token, leaves in ranges.items():
+            differing = merkle.diff_leaves(token, leaves)
+            if differing:
+                pull[token] = {"leaves": differing, "lists": merkle.lists_in(token, differing)}
+        return {"ranges": pull}
+
+    def collect_pulled_lists(self, payload):
+        """Encoded lists in the requested leaves whose fingerprint differs."""
+        merkle = self.storage.merkle
+        wanted = []
+        whole_ranges = []
+        for token, request in payload["ranges"].items():
+            theirs = request["lists"]
+            held = [leaf for leaf, value in enumerate(merkle.leaves(token)) if value]
+            if not theirs and set(held) <= set(request["leaves"]):
+                # The requester has nothing in this range (e.g. a new node): one range scan
+                whole_ranges.append(token)
+                continue
+            for list_id, value in merkle.lists_in(token, request["leaves"]).items():
+                if theirs.get(list_id) != value:
+                    wanted.append(list_id)
+
+        blobs = []
+        for token in whole_ranges:
+            blobs.extend(encode_list(shop_list, REPLICA_CODEC) for shop_list in self.range_lists(token, MAX_PULL_LISTS - len(blobs)))
+
+        for list_id in wanted[:MAX_PULL_LISTS - len(blobs)]:
+            rows = [self.storage.get_list_by_id(list_id, replica_id) for replica_id in merkle.replicas_of(list_id)]
+            rows = [row for row in rows if row is not None]
+            if not rows:
+                continue
+            rows[0].merge_many(rows[1:])
+            blobs.append(encode_list(rows[0], REPLICA_CODEC))
+        return blobs
+
+    def range_lists(self, token, limit):
+        """Up to `limit` lists of a ring range, each merged across the rows held for it."""
+        rows = {}
+        with closing(self.storage.iter_token_range(*self.ring().range_bounds(token))) as batches:
+            # Rows come in ring token order, so a list's rows are adjacent
+            for row in chain.from_iterable(batches):
+                if row.uuid not in rows:
+                    if len(rows) == limit:
+                        break
+                    rows[row.uuid] = []
+                rows[row.uuid].append(row)
+
+        merged = []
+        for held in rows.values():
+            held[0].merge_many(held[1:])
+            merged.append(held[0])
+        return merged
+
+    def store_pulled_lists(self, blobs):
+        """Merges pulled lists into every row held, or stores them in this server's slot."""
+        ring = self.ring()
+        stored = 0
+        for blob in blobs:
+            shop_list = decode_list(blob)
+            replica_ids = self.storage.merkle.replicas_of(shop_list.uuid)
+            if not replica_ids:
+                preference = [str(s.port) for s in ring.preference_list(shop_list.uuid)[:REPLICA_COUNT + 1]]
+                if str(self.port) not in preference:
+                    continue
+                replica_ids = [preference.index(str(self.port))]
+
+            for i, replica_id in enumerate(replica_ids):
+                # save_list merges into its argument, each row needs its own copy
+                copy = shop_list if i == 0 else decode_list(blob)
+                self.storage.save_list(copy, is_replica=replica_id != 0, replica_id=replica_id, name=copy.name)
+            stored += 1
+        return stored
+
+    def handle_merkle_roots(self, identity, payload):
+        reply = Message(MessageType.MERKLE_ROOTS_ACK, self.merkle_roots_reply(payload))
+        self._reply(identity, reply)
+
+    def handle_merkle_pull(self, identity, payload):
+        blobs = self.collect_pulled_lists(payload)
+        print(f"[AntiEntropy] Sending {len(blobs)} differing lists to {identity}")
+        self._reply(identity, Message(MessageType.MERKLE_PULL_ACK, {"lists": blobs}, codec=BINARY))
+
+    def load_rows(self, rows):
+        shop_lists = (self.storage.get_list_by_id(list_id, replica_id) for list_id, replica_id in rows)
+        return [shop_list for shop_list in shop_lists if shop_list is not None]
 
+    def handle_request_full_list(self, identity, payload): # TODO missing quorum logic
+        print(f"[Network] Handling REQUEST_FULL_LIST from {identity}: {payload}")
+        found = self.storage.read_list(payload["list_id"], payload.get("codec", JSON))
 
         message = None
-        if full_list is None:
+        if found is None:
             print(f"[Network] No list found with ID {payload['list_id']}")
             message = Message(msg_type=MessageType.REQUEST_FULL_LIST_NACK, payload={})
 
         else:
-            message = Message(msg_type=MessageType.REQUEST_FULL_LIST_ACK, payload={"shopping_list": shopping_list})
+            # The proxy sends read repairs back for this exact row
+            full_list, shopping_list = found
+            message = Message(msg_type=MessageType.REQUEST_FULL_LIST_ACK, payload={"shopping_list": shopping_list, "replicaID": full_list.replicaID})
 
-        self.server_interface_socket.send_multipart([identity, message.serialize()])
+        self._reply(identity, message)
         print(f"[Network] Sent {message.msg_type} to {identity}")
 
+    def handle_read_repair(self, identity, payload):
+        # State (or the missing delta) a proxy found this row to lack on a read
+        repair = decode_list(payload["shopping_list"])
+        replica_id = payload.get("replicaID", 0)
+        print(f"[Network] Handling READ_REPAIR of {repair.uuid}/{replica_id} ({len(repair.items)} items) from {identity}")
+        self.storage.save_list(repair, is_replica=replica_id != 0, replica_id=replica_id, name=repair.name)
+
+        self._reply(identity, Message(msg_type=MessageType.READ_REPAIR_ACK, payload={}))
+
     def handle_replica(self, identity, payload):
         print(f"[Network] Handling REPLICA from {identity}")
 
         replica_item = payload["replica_list"]
         replica_id = payload["replicaID"]
         
-        self.storage.save_list(ShoppingList.from_json(replica_item), is_replica=True, replica_id=replica_id, name=json.loads(replica_item).get('name', None))
+        replica_list = decode_list(replica_item)
+        self.storage.save_list(replica_list, is_replica=True, replica_id=replica_id, name=replica_list.name)
 
         ack_message = Message(msg_type=MessageType.REPLICA_ACK, payload={})
-        self.server_interface_socket.send_multipart([identity, ack_message.serialize()])
+        self._reply(identity, ack_message)
 
         print(f"[Network] Sent REPLICA_ACK to {identity}")
 
@@ -444,114 +725,121 @@ class ServerCommunicator:
 #        return left_neighbor, right_neighbor
 
 
-    def get_intended_server(self, shop_list):
-        sorted_servers = sorted(
-            self.servers,
-            key=lambda s: s.hash
-        )
-
-        list_hash = hashlib.sha256(shop_list.uuid.encode()).hexdigest()
-
-        hash_server = None
+    def ring(self):
+        return self.ring_cache.get(self.hash_ring_version, self.servers)
 
-        for server in sorted_servers:
-            if list_hash <= server.hash:
-                hash_server = server
-                break
+    def get_intended_server(self, shop_list):
+        preference = self.ring().preference_list(shop_list.uuid)
+        if not preference:
+            return None
 
         if shop_list.isReplica:
-            hash_server_index = sorted_servers.index(hash_server)
-            return sorted_servers[(hash_server_index + shop_list.replicaID) % len(sorted_servers)]
+            return preference[shop_list.replicaID % len(preference)]
         else:
-            return hash_server
+            return preference[0]
 
 
     def handle_sent_full_list(self, identity, payload):
         print(f"[Network] Handling SENT_FULL_LIST from {identity}: {payload}")
         full_list = payload["shopping_list"]
-        shopping_list = ShoppingList.from_json(full_list)
-
-        self.storage.save_list(shopping_list, is_replica=False, name=shopping_list.name, replica_id=0)
-        merged_list = self.storage.get_list_by_id(shopping_list.uuid, 0)
+        shopping_list = decode_list(full_list)
 
-        
-        self.thread_pool.submit(self.send_replica, merged_list)
+        codec = codec_of(full_list)
+        merged_list, merged_blob = self.storage.save_list(shopping_list, is_replica=False, name=shopping_list.name, replica_id=0, codec=codec)
 
-        if hasattr(merged_list, 'isReplica'):
-            delattr(merged_list, 'isReplica')
+        # Waits for the write quorum. The list is already durable here, so a
+        # missed quorum is reported in the ACK for the client to retry, and
+        # handoff heals the replicas meanwhile
+        quorum_met = self.record_quorum(self.send_replica(merged_list, merged_blob if codec == REPLICA_CODEC else None))
 
-        ack_message = Message(msg_type=MessageType.SENT_FULL_LIST_ACK, payload={"shopping_list": merged_list.to_json()})
-        self.server_interface_socket.send_multipart([identity, ack_message.serialize()])
+        ack_message = Message(msg_type=MessageType.SENT_FULL_LIST_ACK, payload={"shopping_list": merged_blob, "quorum_met": quorum_met})
+        self._reply(identity, ack_message)
         print(f"[Network] Sent SENT_FULL_LIST_ACK to {identity}")
 
-    def send_replica(self, shop_list):
-        ring = sorted(self.servers, key=lambda s: s.hash)
-        ring_len = len(ring)
-
-        list_hash = hashlib.sha256(shop_list.uuid.encode()).hexdigest()
-
-        primary_index = None
-        for i, srv in enumerate(ring):
-            if list_hash <= srv.hash:
-                primary_index = (i + 1) % ring_len
-                break
-        if primary_index is None:
-            primary_index = 0  
-
-        successes = 0
-        attempted = 0
-        index = primary_index
-
-        results = []  # (server, accepted: True/False)
-
-        while successes < REPLICA_COUNT and attempted < ring_len:
-            server = ring[index]
-            replicaID = successes + 1  
-            ok = self._try_send_replica_to_server(server, shop_list, replicaID)
-            results.append((server, ok))
-
-            if ok:
-                successes += 1
-
-            attempted += 1
-            index = (index + 1) % ring_len
-
-    
-    def _try_send_replica_to_server(self, server, replica_list, replicaID):
-        print(f"[Network] Attempting to send {len(replica_list.items)} items to server {server.port}")
-
-        if hasattr(replica_list, 'isReplica'):
-            delattr(replica_list, 'isReplica')
+    def handle_sent_delta(self, identity, payload):
+        print(f"[Network] Handling SENT_DELTA from {identity} for list {payload.get('list_id')}")
+        delta_json = payload["delta"]
+        delta = decode_list(delta_json)
+
+        # save_list merges the stored state into `delta`; replicas get the
+        # received bytes, still only the delta, in whichever codec they came.
+        self.storage.save_list(delta, is_replica=False, name=delta.name, replica_id=0)
+        quorum_met = self.record_quorum(self.send_replica(delta, delta_json))
+
+        ack_message = Message(msg_type=MessageType.SENT_DELTA_ACK, payload={"quorum_met": quorum_met})
+        self._reply(identity, ack_message)
+        print(f"[Network] Sent SENT_DELTA_ACK to {identity}")
+
+    def record_quorum(self, quorum_met):
+        if not quorum_met:
+            with self.quorum_lock:
+                self.quorum_misses += 1
+        return quorum_met
+
+    def send_replica(self, shop_list, replica_blob=None):
+        """
+        Replicates to REPLICA_COUNT ring successors concurrently and returns
+        True once write_quorum of them acked. The remaining slots keep going
+        in the background.
+        """
+        # Replicas go to the servers after the primary, the primary is tried last
+        preference = self.ring().preference_list(shop_list.uuid)
+        fanout = ReplicaFanout(preference[1:] + preference[:1], REPLICA_COUNT, self.write_quorum)
+        if not fanout.first:
+            return self.write_quorum == 0
+
+        # Callers that already hold the encoded list pass it in
+        if replica_blob is None:
+            replica_blob = encode_list(shop_list, REPLICA_CODEC)
+
+        decided = threading.Event()
+        for replicaID, server in enumerate(fanout.first, start=1):
+            self.replica_pool.submit(self._replicate_slot, fanout, decided, server, replica_blob, replicaID)
+
+        if fanout.quorum == 0:
+            return True
 
+        if not decided.wait(QUORUM_TIMEOUT):
+            print(f"[Replica] Quorum of {fanout.quorum} not reached for {shop_list.uuid} within {QUORUM_TIMEOUT}s")
+            return False
+        return fanout.acks >= fanout.quorum
+
+    def _replicate_slot(self, fanout, decided, server, replica_blob, replicaID):
+        ok = False
+        while server is not None and not ok:
+            ok = self._try_send_replica_to_server(server, replica_blob, replicaID, retries=1)
+            if not ok:
+                server = fanout.next_target()
+                if server is not None:
+                    print(f"[Replica] Slot {replicaID} falling back to {server.port}")
+
+        if fanout.record(ok):
+            if fanout.acks >= fanout.quorum:
+                self.quorum_latency.observe(fanout.elapsed_ms())
+            decided.set()
+
+    def _try_send_replica_to_server(self, server, replica_blob, replicaID, retries=3):
         replica_message = Message(
             msg_type=MessageType.REPLICA,
-            payload={"replica_list": replica_list.to_json(), "replicaID": replicaID}
+            payload={"replica_list": replica_blob, "replicaID": replicaID}
         )
 
-        # Connect or reuse socket
-        server_socket = self.context.socket(zmq.DEALER)
-        server_socket.connect(f"tcp://localhost:{server.port}")
-
-
-        retries = 3
-        timeout = 1000  # ms
-
-        poller = zmq.Poller()
-        poller.register(server_socket, zmq.POLLIN)
+        serialized_msg = replica_message.serialize()
+        timeout = REPLICA_TIMEOUT
 
         for attempt in range(1, retries + 1):
-            print(f"[Replica] Sending REPLICA x{len(replica_list.items)} to {server.port} "
+            print(f"[Replica] Sending REPLICA ({len(replica_blob)} bytes) to {server.port} "
                 f"(attempt {attempt}/{retries})")
 
-            server_socket.send(replica_message.serialize())
-            socks = dict(poller.poll(timeout))
+            start = time.monotonic()
+            reply_bytes = self.peers.request(server.port, serialized_msg, timeout)
 
-            if server_socket in socks and socks[server_socket] == zmq.POLLIN:
-                reply = Message(json_str=server_socket.recv())
+            if reply_bytes is not None:
+                reply = Message(json_str=reply_bytes)
 
                 if reply.msg_type == MessageType.REPLICA_ACK:
+                    self.replica_latency.observe((time.monotonic() - start) * 1000)
                     print(f"[Replica] ACK received from {server.port}")
-                    server_socket.close(linger=0)
                     return True
 
                 print(f"[Replica] Unexpected reply {reply.msg_type}")
@@ -562,7 +850,6 @@ class ServerCommunicator:
             timeout = min(8000, timeout * 2)
 
         print(f"[Replica] FAILED after retries → {server.port}")
-        server_socket.close(linger=0)
         return False
 
 
@@ -577,6 +864,8 @@ class ServerCommunicator:
         main_lists = []
 
         for shop_list in shop_lists:
+            if self.storage.replica_name is not None:
+                shop_list.retire(self.storage.replica_key(shop_list.replicaID))
             if not shop_list.isReplica:
                 if hasattr(shop_list, 'isReplica'):
                     delattr(shop_list, 'isReplica')
@@ -596,35 +885,23 @@ class ServerCommunicator:
             }
         )
 
-        # Create / reuse socket
-        s = self.context.socket(zmq.DEALER)
-        s.connect(f"tcp://localhost:{server.port}")
-
-
+        serialized_msg = message.serialize()
         retries = 3
         timeout = 1000  # ms
 
-        poller = zmq.Poller()
-        poller.register(s, zmq.POLLIN)
-
         for attempt in range(1, retries + 1):
             print(f"[Handoff] Sending HINTED_HANDOFF to {server.port} "
                 f"(attempt {attempt}/{retries})")
 
-            s.send(message.serialize())
-
-            socks = dict(poller.poll(timeout))
+            reply_bytes = self.peers.request(server.port, serialized_msg, timeout)
 
-            if s in socks and socks[s] == zmq.POLLIN:
-                reply_bytes = s.recv()
+            if reply_bytes is not None:
                 reply = Message(json_str=reply_bytes)
 
                 if reply.msg_type == MessageType.HINTED_HANDOFF_ACK:
                     print(f"[Handoff] HINTED_HANDOFF_ACK received from {server.port}")
 
-                    for shop_list in shop_lists:
-                        self.storage.delete_list(shop_list.uuid, shop_list.replicaID)
-                    s.close(linger=0)
+                    self.storage.delete_lists([(shop_list.uuid, shop_list.replicaID) for shop_list in shop_lists])
                     return True
 
                 print(f"[Handoff] Unexpected reply: {reply.msg_type}")
@@ -636,27 +913,41 @@ class ServerCommunicator:
 
         # FAILED → queue it
         print(f"[Handoff] FAILED to send hinted handoff to {server.port}, queueing action")
-        s.close(linger=0)
         return False
 
+    def _merge_incoming(self, serialized_lists):
+        """
+        Groups handed-off lists by (uuid, replicaID) and folds each group with
+        merge_many, so every stored row is read and written once.
+        """
+        groups = {}
+        for shop_list in serialized_lists:
+            data = json.loads(shop_list)
+            obj = ShoppingList.from_dict(data)
+            groups.setdefault((obj.uuid, data.get('replicaID', 0)), []).append(obj)
+
+        merged = []
+        for (_, replica_id), objs in groups.items():
+            objs[0].merge_many(objs[1:])
+            merged.append((objs[0], replica_id))
+        return merged
+
+    def _handoff_entries(self, main_lists, replica_lists):
+        """save_lists entries for a handoff: main lists as primaries, the rest as replicas."""
+        entries = [(obj, obj.name, False, replica_id) for obj, replica_id in self._merge_incoming(main_lists)]
+        entries += [(obj, obj.name, True, replica_id) for obj, replica_id in self._merge_incoming(replica_lists)]
+        return entries
+
     def handle_hinted_handoff(self, identity, payload):
         print(f"[Network] Handling HINTED_HANDOFF from {identity}: {payload}")
 
         main_lists = payload["main_lists"]
         replica_lists = payload["replica_lists"]
 
-        for shop_list in main_lists:
-            obj = ShoppingList.from_json(shop_list)
-            replica_id = json.loads(shop_list).get('replicaID', 0)
-            self.storage.save_list(obj, is_replica=False, name=obj.name, replica_id=replica_id)
-
-        for shop_list in replica_lists:
-            obj = ShoppingList.from_json(shop_list)
-            replica_id = json.loads(shop_list).get('replicaID', 0)
-            self.storage.save_list(obj, is_replica=True, name=obj.name, replica_id=replica_id)
+        self.storage.save_lists(self._handoff_entries(main_lists, replica_lists))
             
         ack_message = Message(msg_type=MessageType.HINTED_HANDOFF_ACK, payload={})
-        self.server_interface_socket.send_multipart([identity, ack_message.serialize()])
+        self._reply(identity, ack_message)
 
         print(f"[Network] Sent HINTED_HANDOFF_ACK to {identity}")
 
@@ -2,15 +2,126 @@ import psycopg2
 import psycopg2.extras
 from psycopg2 import DataError
 import json
-
-from src.common.crdt.improved.ShoppingList import ShoppingList, PNCounter, ORSet
-from src.common.readWriteLock.read_write_lock import ReadWriteLock
+import itertools
+
+from src.common.crdt.improved.ShoppingList import ShoppingList, item_changes
+from src.common.readWriteLock.striped_lock import StripedLock, LOCK_STRIPES
+from src.common.merkleTree.merkle_tree import MerkleIndex
+from src.common.hashRing.placement import PlacementIndex
+from src.common.hashRing.hash_ring import key_hash
+from src.server.connectionPool import ConnectionPool, POOL_SIZE
+from src.server.listCache import ListCache, CACHE_BYTES
+from src.common.codec.binary_codec import JSON, encode_list
+
+# Rows a streaming cursor fetches per round trip
+FETCH_SIZE = 200
+_cursor_ids = itertools.count()
+
+# Hot statements, prepared once on every pooled connection
+STATEMENTS = {
+    "lock_list": "SELECT crdt, name FROM ShoppingList WHERE uuid=$1 AND replicaID=$2 FOR UPDATE",
+    "upsert_list": """
+        INSERT INTO ShoppingList (uuid, name, crdt, logical_clock, isReplica, replicaID, ring_token)
+        VALUES ($1, $2, $3, $4, $5, $6, $7)
+        ON CONFLICT(uuid, replicaID) DO UPDATE SET
+            crdt = excluded.crdt,
+            name = excluded.name,
+            logical_clock = excluded.logical_clock,
+            isReplica = excluded.isReplica
+    """,
+    "delete_items": "DELETE FROM ShoppingListItem WHERE shopping_list_uuid=$1 AND shopping_list_replicaID=$2",
+    # Deletes the removed item names and upserts the changed ones in one statement
+    "sync_items": """
+        WITH removed AS (
+            DELETE FROM ShoppingListItem
+            WHERE shopping_list_uuid=$1::uuid AND shopping_list_replicaID=$2::integer AND name = ANY($3::text[])
+        )
+        INSERT INTO ShoppingListItem (
+            shopping_list_uuid, shopping_list_replicaID, name, quantityNeeded, quantityAcquired, position
+        )
+        SELECT $1::uuid, $2::integer, item.name, item.needed, item.acquired, 0
+        FROM unnest($4::text[], $5::integer[], $6::integer[]) AS item(name, needed, acquired)
+        ON CONFLICT (shopping_list_uuid, shopping_list_replicaID, name) DO UPDATE SET
+            quantityNeeded = excluded.quantityNeeded,
+            quantityAcquired = excluded.quantityAcquired
+    """,
+    "select_row": """
+        SELECT uuid, name, crdt, logical_clock, isReplica, replicaID
+        FROM ShoppingList WHERE uuid=$1 AND replicaID=$2
+    """,
+    "select_rows": """
+        SELECT uuid, name, crdt, logical_clock, isReplica, replicaID
+        FROM ShoppingList WHERE uuid=$1
+    """,
+    "delete_list": "DELETE FROM ShoppingList WHERE uuid=$1 AND replicaID=$2",
+    # Batch forms taking one array per column, used by save_lists/delete_lists
+    "lock_lists": """
+        SELECT uuid, replicaID, crdt, name FROM ShoppingList
+        WHERE (uuid, replicaID) IN (SELECT key.uuid::uuid, key.replicaID FROM unnest($1::text[], $2::integer[]) AS key(uuid, replicaID))
+        FOR UPDATE
+    """,
+    "upsert_lists": """
+        INSERT INTO ShoppingList (uuid, name, crdt, logical_clock, isReplica, replicaID, ring_token)
+        SELECT list.uuid::uuid, list.name, list.crdt::jsonb, list.clock, list.isReplica, list.replicaID, list.token
+        FROM unnest($1::text[], $2::text[], $3::text[], $4::integer[], $5::boolean[], $6::integer[], $7::text[])
+            AS list(uuid, name, crdt, clock, isReplica, replicaID, token)
+        ON CONFLICT(uuid, replicaID) DO UPDATE SET
+            crdt = excluded.crdt,
+            name = excluded.name,
+            logical_clock = excluded.logical_clock,
+            isReplica = excluded.isReplica
+    """,
+    "sync_items_bulk": """
+        WITH removed AS (
+            DELETE FROM ShoppingListItem item
+            USING unnest($1::text[], $2::integer[], $3::text[]) AS gone(uuid, replicaID, name)
+            WHERE item.shopping_list_uuid = gone.uuid::uuid
+              AND item.shopping_list_replicaID = gone.replicaID
+              AND item.name = gone.name
+        )
+        INSERT INTO ShoppingListItem (
+            shopping_list_uuid, shopping_list_replicaID, name, quantityNeeded, quantityAcquired, position
+        )
+        SELECT item.uuid::uuid, item.replicaID, item.name, item.needed, item.acquired, 0
+        FROM unnest($4::text[], $5::integer[], $6::text[], $7::integer[], $8::integer[])
+            AS item(uuid, replicaID, name, needed, acquired)
+        ON CONFLICT (shopping_list_uuid, shopping_list_replicaID, name) DO UPDATE SET
+            quantityNeeded = excluded.quantityNeeded,
+            quantityAcquired = excluded.quantityAcquired
+    """,
+    "delete_lists": """
+        DELETE FROM ShoppingList
+        WHERE (uuid, replicaID) IN (SELECT key.uuid::uuid, key.replicaID FROM unnest($1::text[], $2::integer[]) AS key(uuid, replicaID))
+    """,
+}
+
+
+def _item_columns(upserts):
+    # unnest() takes one array per column
+    return ([row[0] for row in upserts], [row[1] for row in upserts], [row[2] for row in upserts])
+
+
+def _execute(cursor, statement, params):
+    cursor.execute(f"EXECUTE {statement} ({', '.join(['%s'] * len(params))})", params)
 
 
 class ShoppingListStorage:
-    def __init__(self, db_config):
+    def __init__(self, db_config, replica_name=None, pool_size=POOL_SIZE, lock_stripes=LOCK_STRIPES, cache_bytes=CACHE_BYTES):
         self.db_config = db_config
-        self.lock = ReadWriteLock()
+        # Serializes writers of one (uuid, replicaID) row. FOR UPDATE cannot
+        # lock a row that does not exist yet, so two first writes of a list
+        # would otherwise both insert and one merge would be lost. Readers
+        # take no lock: every read is a single statement on its own snapshot.
+        self.locks = StripedLock(lock_stripes)
+        # Name this node acknowledges list versions under, so tombstones can
+        # be purged once every replica has seen them (None disables that)
+        self.replica_name = replica_name
+        # Per token range hash trees of what is stored, for anti-entropy
+        self.merkle = MerkleIndex()
+        # Rows that belong on another server, kept current at write time
+        self.placement = PlacementIndex()
+        # Decoded and encoded lists for the proxy read path, dropped on every write
+        self.cache = ListCache(cache_bytes)
 
         try:
             conn = self._get_conn()
@@ -18,154 +129,170 @@ class ShoppingListStorage:
         except Exception as e:
             raise ConnectionError(f"Could not connect to Postgres: {e}")
 
+        # Opened lazily, so statements are prepared after initialize_schema
+        self.pool = ConnectionPool(self._get_conn, max_size=pool_size, on_connect=self._prepare)
+
     def _get_conn(self):
         conn = psycopg2.connect(**self.db_config)
         conn.autocommit = True
         return conn
 
-    def _crdt_to_dict(self, obj):
-        """Recursively converts CRDT objects to a dict for JSON."""
-        if hasattr(obj, "__dict__"):
-            data = {}
-            for key, val in obj.__dict__.items():
-                data[key] = self._crdt_to_dict(val)
-            return data
-
-        elif isinstance(obj, set):
-            return list(obj)
+    def _prepare(self, conn):
+        with conn.cursor() as cursor:
+            for name, sql in STATEMENTS.items():
+                cursor.execute(f"PREPARE {name} AS {sql}")
 
-        elif isinstance(obj, dict):
-            return {k: self._crdt_to_dict(v) for k, v in obj.items()}
-
-        else:
-            return obj
+    def _crdt_to_dict(self, obj):
+        """Converts a ShoppingList to a dict for JSON storage."""
+        return obj.to_dict()
 
     def _reconstruct_crdt(self, data):
         """Mirror of the client's reconstruction logic."""
-        sl = ShoppingList(data['uuid'])
-        sl.clock = data.get('clock', 0)
-        sl.name = data.get('name', None)
-
-        if 'uuid' in data:
-            sl.uuid = data['uuid']
+        return ShoppingList.from_dict(data)
 
-        for name, item_data in data.get('items', {}).items():
+    def replica_key(self, replica_id):
+        return f"{self.replica_name}/{replica_id}"
 
-            needed = PNCounter()
-            needed.positive.counts = item_data["needed"]["positive"]["counts"]
-            needed.negative.counts = item_data["needed"]["negative"]["counts"]
-
-            acquired = PNCounter()
-            acquired.positive.counts = item_data["acquired"]["positive"]["counts"]
-            acquired.negative.counts = item_data["acquired"]["negative"]["counts"]
-
-            existence = ORSet()
-            existence.elements = {tuple(x) for x in item_data["existence"]["elements"]}
-            existence.tombstones = {tuple(x) for x in item_data["existence"]["tombstones"]}
-
-            sl.items[name] = {
-                "needed": needed,
-                "acquired": acquired,
-                "existence": existence
-            }
-
-        return sl
-
-    def save_list(self, shop_list, name=None, is_replica=False, replica_id=0):
+    def save_list(self, shop_list, name=None, is_replica=False, replica_id=0, codec=JSON):
         """
         Removed intended_server_hash, since not present in SQL schema.
+        Merges into shop_list and returns (shop_list, encoded in `codec`), so
+        callers can reply and replicate without reading the row back.
         """
-        self.lock.acquire_write()
-        conn = self._get_conn()
+        list_uuid = shop_list.uuid
+        conn = self.pool.checkout()
+        row_lock = self.locks.lock_for((str(list_uuid), replica_id))
+        row_lock.acquire()
 
         try:
             with conn:
                 with conn.cursor() as cursor:
 
-                    list_uuid = shop_list.uuid
-
-                    cursor.execute(
-                        "SELECT crdt, name FROM ShoppingList WHERE uuid=%s AND replicaID=%s FOR UPDATE",
-                        (list_uuid, replica_id)
-                    )
-                    row = cursor.fetchone()
-
-                    if row:
-                        db_crdt_json, existing_name = row
-
-                        if name is None:
-                            name = existing_name
-
-                        if isinstance(db_crdt_json, str):
-                            db_crdt_json = json.loads(db_crdt_json)
-
-                        db_list = self._reconstruct_crdt(db_crdt_json)
-
-                        shop_list.merge(db_list)
-
-                    if name is None:
-                        name = "Unnamed List"
-
+                    _execute(cursor, "lock_list", (list_uuid, replica_id))
+                    name, stored_items = self._merge_stored(shop_list, cursor.fetchone(), name, replica_id)
+                    shop_list.name = name
                     crdt_blob = json.dumps(self._crdt_to_dict(shop_list))
 
-                    cursor.execute(
-                        """
-                        INSERT INTO ShoppingList (uuid, name, crdt, logical_clock, isReplica, replicaID)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                        ON CONFLICT(uuid, replicaID) DO UPDATE SET
-                            crdt = excluded.crdt,
-                            name = excluded.name,
-                            logical_clock = excluded.logical_clock,
-                            isReplica = excluded.isReplica
-                        """,
+                    _execute(
+                        cursor,
+                        "upsert_list",
                         (
                             list_uuid,
                             name,
                             crdt_blob,
                             shop_list.clock,
                             is_replica,
-                            replica_id
+                            replica_id,
+                            key_hash(str(list_uuid))
                         )
                     )
 
-                    cursor.execute(
-                        """
-                        DELETE FROM ShoppingListItem 
-                        WHERE shopping_list_uuid=%s AND shopping_list_replicaID=%s
-                        """,
-                        (list_uuid, replica_id)
-                    )
+                    upserts, removed = item_changes(stored_items, shop_list.stored_items())
+                    if upserts or removed:
+                        _execute(cursor, "sync_items", (list_uuid, replica_id, removed) + _item_columns(upserts))
 
-                    visible_items = shop_list.get_visible_items()
-                    items_to_insert = []
+            self.merkle.put(list_uuid, replica_id, shop_list.version, shop_list.base)
+            self.placement.record(list_uuid, replica_id, is_replica)
+            self.cache.invalidate([(list_uuid, replica_id)])
+        finally:
+            row_lock.release()
+            self.pool.checkin(conn)
 
-                    for item_name, counts in visible_items.items():
-                        display_needed = max(0, counts['needed'])
-                        display_acquired = max(0, counts['acquired'])
-                        
-                        items_to_insert.append(
-                            (list_uuid, replica_id, item_name, display_needed, display_acquired, 0)
-                        )
+        # The stored JSON is already the JSON encoding of the merged list
+        return shop_list, crdt_blob if codec == JSON else encode_list(shop_list, codec)
 
-                    if items_to_insert:
-                        cursor.executemany(
-                            """
-                            INSERT INTO ShoppingListItem (
-                                shopping_list_uuid, 
-                                shopping_list_replicaID, 
-                                name, 
-                                quantityNeeded, 
-                                quantityAcquired, 
-                                position
-                            )
-                            VALUES (%s, %s, %s, %s, %s, %s)
-                            """,
-                            items_to_insert
-                        )
+    def _merge_stored(self, shop_list, row, name, replica_id):
+        """
+        Merges the stored (crdt, name) row into shop_list. Returns the name
+        to store and the item rows as they were before the merge.
+        """
+        stored_items = {}
+
+        if row:
+            db_crdt_json, existing_name = row
+
+            if name is None:
+                name = existing_name
 
+            if isinstance(db_crdt_json, str):
+                db_crdt_json = json.loads(db_crdt_json)
+
+            db_list = self._reconstruct_crdt(db_crdt_json)
+            stored_items = db_list.stored_items()
+
+            shop_list.merge(db_list)
+
+        if self.replica_name is not None:
+            shop_list.acknowledge(self.replica_key(replica_id))
+            shop_list.collect_garbage()
+
+        if name is None:
+            name = "Unnamed List"
+
+        return name, stored_items
+
+    def save_lists(self, entries):
+        """
+        Batch save_list: `entries` are (shop_list, name, is_replica, replica_id).
+        Every row is fetched with one SELECT ... FOR UPDATE, merged, and
+        written back with one list upsert and one item statement, all in a
+        single transaction. Entries for the same row are merged first.
+        """
+        batch = {}
+        for shop_list, name, is_replica, replica_id in entries:
+            key = (str(shop_list.uuid), replica_id)
+            if key in batch:
+                first = batch[key]
+                first[0].merge(shop_list)
+                first[1] = first[1] or name
+                first[2] = is_replica
+            else:
+                batch[key] = [shop_list, name, is_replica]
+        if not batch:
+            return
+
+        conn = self.pool.checkout()
+        row_locks = self.locks.locks_for(batch)
+        for row_lock in row_locks:
+            row_lock.acquire()
+
+        try:
+            with conn:
+                with conn.cursor() as cursor:
+                    keys = list(batch)
+                    _execute(cursor, "lock_lists", ([key[0] for key in keys], [key[1] for key in keys]))
+                    stored = {(str(uuid), replica_id): (crdt, name) for uuid, replica_id, crdt, name in cursor.fetchall()}
+
+                    lists = ([], [], [], [], [], [], [])
+                    gone = ([], [], [])
+                    items = ([], [], [], [], [])
+                    for key, (shop_list, name, is_replica) in batch.items():
+                        list_uuid, replica_id = key
+                        name, stored_items = self._merge_stored(shop_list, stored.get(key), name, replica_id)
+                        row = (list_uuid, name, json.dumps(self._crdt_to_dict(shop_list)), shop_list.clock, is_replica, replica_id, key_hash(list_uuid))
+                        for column, value in zip(lists, row):
+                            column.append(value)
+
+                        upserts, removed = item_changes(stored_items, shop_list.stored_items())
+                        for item_name in removed:
+                            for column, value in zip(gone, (list_uuid, replica_id, item_name)):
+                                column.append(value)
+                        for upsert in upserts:
+                            for column, value in zip(items, (list_uuid, replica_id) + upsert):
+                                column.append(value)
+
+                    _execute(cursor, "upsert_lists", lists)
+                    if gone[0] or items[0]:
+                        _execute(cursor, "sync_items_bulk", gone + items)
+
+            for (list_uuid, replica_id), (shop_list, _, is_replica) in batch.items():
+                self.merkle.put(list_uuid, replica_id, shop_list.version, shop_list.base)
+                self.placement.record(list_uuid, replica_id, is_replica)
+            self.cache.invalidate(batch)
         finally:
-            conn.close()
-            self.lock.release_write()
+            for row_lock in reversed(row_locks):
+                row_lock.release()
+            self.pool.checkin(conn)
 
     def _row_to_shopping_list(self, row):
         """Convert SQL row → ShoppingList object with metadata."""
@@ -187,17 +314,12 @@ class ShoppingListStorage:
 
 
     def get_list_by_id(self, list_id, replica_id=None):
-        self.lock.acquire_read()
-        conn = self._get_conn()
+        conn = self.pool.checkout()
 
         try:
             with conn.cursor() as cursor:
                 if replica_id is not None:
-                    cursor.execute("""
-                        SELECT uuid, name, crdt, logical_clock, isReplica, replicaID
-                        FROM ShoppingList
-                        WHERE uuid=%s AND replicaID=%s
-                    """, (list_id, replica_id))
+                    _execute(cursor, "select_row", (list_id, replica_id))
                     
                     row = cursor.fetchone()
 
@@ -206,11 +328,7 @@ class ShoppingListStorage:
 
                     return self._row_to_shopping_list(row)
                 else:
-                    cursor.execute("""
-                        SELECT uuid, name, crdt, logical_clock, isReplica, replicaID
-                        FROM ShoppingList
-                        WHERE uuid=%s
-                    """, (list_id,))
+                    _execute(cursor, "select_rows", (list_id,))
                     
                     rows = cursor.fetchall()
 
@@ -224,107 +342,187 @@ class ShoppingListStorage:
                             return sl
                     return self._row_to_shopping_list(rows[0])
         finally:
-            conn.close()
-            self.lock.release_read()
-
+            self.pool.checkin(conn)
 
-    def get_all_non_replica_lists(self):
-        self.lock.acquire_read()
-        conn = self._get_conn()
-        lists = []
+    def read_list(self, list_id, codec=JSON, replica_id=None):
+        """
+        get_list_by_id through the cache, for the proxy read path. Returns
+        (shop_list, encoded in `codec`) or None. The list may be shared with
+        other readers, so it must not be modified.
+        """
+        if replica_id is None:
+            replica_id = self.placement.preferred_row(list_id)
+            if replica_id is None:
+                # Not in the index, read without caching
+                shop_list = self.get_list_by_id(list_id)
+                if shop_list is None:
+                    return None
+                delattr(shop_list, 'isReplica')
+                return shop_list, encode_list(shop_list, codec)
+
+        cached = self.cache.get(list_id, replica_id, codec)
+        if cached is not None:
+            return cached
+
+        generation = self.cache.generation(list_id, replica_id)
+        shop_list = self.get_list_by_id(list_id, replica_id)
+        if shop_list is None:
+            return None
+
+        # The replicaID travels with the list, the flag stays server side
+        delattr(shop_list, 'isReplica')
+        blob = encode_list(shop_list, codec)
+        self.cache.put(list_id, replica_id, shop_list, codec, blob, generation)
+        return shop_list, blob
+
+    def iter_list_batches(self, is_replica=None, fetch_size=FETCH_SIZE):
+        """
+        Streams stored lists in batches of at most fetch_size through a
+        server-side cursor, so memory stays bounded by one batch. `is_replica`
+        filters on the flag (None streams every row). A pooled connection is
+        held until the generator is exhausted or closed.
+        """
+        query = "SELECT uuid, name, crdt, logical_clock, isReplica, replicaID FROM ShoppingList"
+        params = ()
+        if is_replica is not None:
+            query += " WHERE isReplica=%s"
+            params = (is_replica,)
 
+        conn = self.pool.checkout()
         try:
-            with conn.cursor() as cursor:
-                cursor.execute("""
-                    SELECT uuid, name, crdt, logical_clock, isReplica, replicaID
-                    FROM ShoppingList
-                    WHERE isReplica=FALSE
-                """)
-                rows = cursor.fetchall()
-
-                for row in rows:
-                    lists.append(self._row_to_shopping_list(row))
-
-            return lists
-
+            # Named cursors only live inside a transaction
+            with conn:
+                with conn.cursor(name=f"stream_{next(_cursor_ids)}") as cursor:
+                    cursor.execute(query, params)
+                    while True:
+                        rows = cursor.fetchmany(fetch_size)
+                        if not rows:
+                            break
+                        yield [self._row_to_shopping_list(row) for row in rows]
         finally:
-            conn.close()
-            self.lock.release_read()
-
-
-    def get_all_replicas(self):
-        self.lock.acquire_read()
-        conn = self._get_conn()
-        lists = []
+            self.pool.checkin(conn)
+
+    def iter_all_lists(self, fetch_size=FETCH_SIZE):
+        for batch in self.iter_list_batches(fetch_size=fetch_size):
+            yield from batch
+
+    def iter_all_replicas(self, fetch_size=FETCH_SIZE):
+        for batch in self.iter_list_batches(is_replica=True, fetch_size=fetch_size):
+            yield from batch
+
+    def iter_all_non_replica_lists(self, fetch_size=FETCH_SIZE):
+        for batch in self.iter_list_batches(is_replica=False, fetch_size=fetch_size):
+            yield from batch
+
+    # --- Token ranges ---
+    #
+    # A range is the ring arc (low, high] between two tokens. When low >= high
+    # it wraps past the top of the hash space (one token spans the whole ring).
+
+    def _range_clause(self, low, high):
+        if low < high:
+            return "ring_token > %s AND ring_token <= %s", (low, high)
+        return "(ring_token > %s OR ring_token <= %s)", (low, high)
+
+    def iter_token_range(self, low, high, fetch_size=FETCH_SIZE):
+        """Streams the lists whose ring token is in (low, high], in batches."""
+        clause, params = self._range_clause(low, high)
+        conn = self.pool.checkout()
+        try:
+            with conn:
+                with conn.cursor(name=f"stream_{next(_cursor_ids)}") as cursor:
+                    cursor.execute(
+                        "SELECT uuid, name, crdt, logical_clock, isReplica, replicaID FROM ShoppingList WHERE " + clause + " ORDER BY ring_token",
+                        params
+                    )
+                    while True:
+                        rows = cursor.fetchmany(fetch_size)
+                        if not rows:
+                            break
+                        yield [self._row_to_shopping_list(row) for row in rows]
+        finally:
+            self.pool.checkin(conn)
 
+    def count_token_range(self, low, high):
+        clause, params = self._range_clause(low, high)
+        conn = self.pool.checkout()
         try:
             with conn.cursor() as cursor:
-                cursor.execute("""
-                    SELECT uuid, name, crdt, logical_clock, isReplica, replicaID
-                    FROM ShoppingList
-                    WHERE isReplica=TRUE
-                """)
-                rows = cursor.fetchall()
-
-                for row in rows:
-                    lists.append(self._row_to_shopping_list(row))
+                cursor.execute("SELECT count(*) FROM ShoppingList WHERE " + clause, params)
+                return cursor.fetchone()[0]
+        finally:
+            self.pool.checkin(conn)
 
-            return lists
+    def delete_token_range(self, low, high):
+        """Deletes every row in (low, high]; returns the (uuid, replicaID) rows removed."""
+        clause, params = self._range_clause(low, high)
+        conn = self.pool.checkout()
+        try:
+            with conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("DELETE FROM ShoppingList WHERE " + clause + " RETURNING uuid, replicaID", params)
+                    rows = cursor.fetchall()
 
+            for list_id, replica_id in rows:
+                self.merkle.remove(list_id, replica_id)
+                self.placement.forget(list_id, replica_id)
+            self.cache.invalidate(rows)
+            return rows
         finally:
-            conn.close()
-            self.lock.release_read()
+            self.pool.checkin(conn)
 
+    def get_all_non_replica_lists(self):
+        return list(self.iter_all_non_replica_lists())
 
-    def get_all_lists(self):
-        self.lock.acquire_read()
-        conn = self._get_conn()
-        lists = []
-
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute("""
-                    SELECT uuid, name, crdt, logical_clock, isReplica, replicaID
-                    FROM ShoppingList
-                """)
-                rows = cursor.fetchall()
+    def get_all_replicas(self):
+        return list(self.iter_all_replicas())
 
-                for row in rows:
-                    lists.append(self._row_to_shopping_list(row))
+    def get_all_lists(self):
+        return list(self.iter_all_lists())
 
-            for lst in lists:
-                print(f"[Storage] Loaded list {lst.uuid} (Replica: {lst.isReplica})")
+    def delete_list(self, list_id, replica_id=0):
+        conn = self.pool.checkout()
+        row_lock = self.locks.lock_for((str(list_id), replica_id))
+        row_lock.acquire()
 
-            return lists
+        try:
+            with conn:
+                with conn.cursor() as cursor:
+                    _execute(cursor, "delete_items", (list_id, replica_id))
+                    _execute(cursor, "delete_list", (list_id, replica_id))
 
+            self.merkle.remove(list_id, replica_id)
+            self.placement.forget(list_id, replica_id)
+            self.cache.invalidate([(list_id, replica_id)])
         finally:
-            conn.close()
-            self.lock.release_read()
+            row_lock.release()
+            self.pool.checkin(conn)
+    
+    def delete_lists(self, rows):
+        """Deletes (list_id, replica_id) rows in one statement; item rows go by cascade."""
+        rows = list({(str(list_id), replica_id) for list_id, replica_id in rows})
+        if not rows:
+            return
 
-    def delete_list(self, list_id, replica_id=0):
-        self.lock.acquire_write()
-        conn = self._get_conn()
+        conn = self.pool.checkout()
+        row_locks = self.locks.locks_for(rows)
+        for row_lock in row_locks:
+            row_lock.acquire()
 
         try:
             with conn:
                 with conn.cursor() as cursor:
-                    cursor.execute(
-                        """
-                        DELETE FROM ShoppingListItem 
-                        WHERE shopping_list_uuid=%s AND shopping_list_replicaID=%s
-                        """,
-                        (list_id, replica_id)
-                    )
-
-                    cursor.execute(
-                        "DELETE FROM ShoppingList WHERE uuid=%s AND replicaID=%s",
-                        (list_id, replica_id)
-                    )
+                    _execute(cursor, "delete_lists", ([row[0] for row in rows], [row[1] for row in rows]))
 
+            for list_id, replica_id in rows:
+                self.merkle.remove(list_id, replica_id)
+                self.placement.forget(list_id, replica_id)
+            self.cache.invalidate(rows)
         finally:
-            conn.close()
-            self.lock.release_write()
-    
+            for row_lock in reversed(row_locks):
+                row_lock.release()
+            self.pool.checkin(conn)
+
     def initialize_schema(self):
         """Creates tables if they don't exist."""
         conn = self._get_conn()
@@ -335,4 +533,23 @@ class ShoppingListStorage:
                         cur.execute(f.read())
                 print("[Storage] Schema initialized.")
         finally:
-            conn.close()
\ No newline at end of file
+            conn.close()
+
+    def load_indexes(self, fetch_size=FETCH_SIZE):
+        """Fills the Merkle and placement indexes from the rows already stored."""
+        conn = self.pool.checkout()
+
+        try:
+            with conn:
+                with conn.cursor(name=f"stream_{next(_cursor_ids)}") as cursor:
+                    cursor.execute("SELECT uuid, replicaID, isReplica, crdt->'version', crdt->'base' FROM ShoppingList")
+                    while True:
+                        rows = cursor.fetchmany(fetch_size)
+                        if not rows:
+                            break
+                        for list_id, replica_id, is_replica, version, base in rows:
+                            self.merkle.put(list_id, replica_id, version or {}, base or {})
+                            self.placement.record(list_id, replica_id, is_replica)
+            print(f"[Storage] Indexes loaded ({len(self.merkle.rows)} lists).")
+        finally:
+            self.pool.checkin(conn)